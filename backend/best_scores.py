@@ -0,0 +1,110 @@
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ScoreChange:
+    """How a submission changed a user's best score on a question"""
+
+    def __init__(self, previous: Optional[int], best: int):
+        self.previous = previous
+        self.best = best
+
+    @property
+    def first_solve(self) -> bool:
+        return self.previous is None
+
+    @property
+    def delta(self) -> int:
+        return self.best - (self.previous or 0)
+
+
+class BestScoreLedger:
+    """
+    Best successful score per (user, question).
+
+    Each successful submission is folded in with a single atomic `$max` upsert,
+    and the document as it was before the update tells by how much the best
+    score improved. user_progress is then changed by that delta only, so the
+    cost of a submission does not depend on the user's submission history.
+    scripts/rebuild_best_scores.py rebuilds the ledger and user_progress from
+    the submissions collection.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @staticmethod
+    def key(user_id: str, question_id: str) -> str:
+        return f"{user_id}:{question_id}"
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("user_id", ASCENDING), ("score", ASCENDING)])
+        await self.collection.create_index([("question_id", ASCENDING)])
+
+    async def record(self, user_id: str, question_id: str, score: int) -> ScoreChange:
+        """Fold a successful submission's score into the ledger"""
+        before = await self.collection.find_one_and_update(
+            {"_id": self.key(user_id, question_id)},
+            {
+                "$max": {"score": score},
+                "$set": {"updated_at": datetime.now(timezone.utc)},
+                "$setOnInsert": {
+                    "user_id": ObjectId(user_id),
+                    "question_id": ObjectId(question_id)
+                }
+            },
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            return ScoreChange(None, score)
+        previous = before.get("score", 0)
+        return ScoreChange(previous, max(previous, score))
+
+
+async def best_submissions(submissions, candidate_id: ObjectId, question_ids: list, with_questions: bool = False) -> dict:
+    """
+    Best successful submission of a user on each of the given questions, keyed by
+    question id string, from one aggregation over the submissions collection.
+    With `with_questions`, each entry also carries the question's title, category
+    and points under "question", and questions that no longer exist are left out.
+    """
+    pipeline = [
+        {"$match": {
+            "candidate_id": candidate_id,
+            "status": "success",
+            "question_id": {"$in": [ObjectId(q_id) for q_id in question_ids]}
+        }},
+        {"$sort": {"question_id": 1, "score": -1}},
+        {"$group": {
+            "_id": "$question_id",
+            "score": {"$first": "$score"},
+            "submitted_at": {"$first": "$submitted_at"}
+        }}
+    ]
+    if with_questions:
+        pipeline += [
+            {"$lookup": {
+                "from": "Q_bank",
+                "localField": "_id",
+                "foreignField": "_id",
+                "as": "question"
+            }},
+            {"$unwind": "$question"},
+            {"$project": {
+                "score": 1,
+                "submitted_at": 1,
+                "question.title": 1,
+                "question.category": 1,
+                "question.points": 1
+            }}
+        ]
+    results = await submissions.aggregate(pipeline).to_list(length=None)
+    return {str(result["_id"]): result for result in results}
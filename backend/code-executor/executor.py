@@ -1,30 +1,172 @@
 import sys
+import os
 import json
+import time
+import math
+import select
+import resource
+import signal
 import traceback
 import re
 from typing import List, Dict, Any
-from io import StringIO
+from types import CodeType
 from contextlib import redirect_stdout, redirect_stderr
 
+# Constants
+# Default per test case limits; a job may set its own in `limits`
+TEST_TIME_LIMIT = 10  # seconds of wall time
+TEST_CPU_LIMIT = 10  # seconds of CPU time
+TEST_MEMORY_LIMIT = 256  # MB of address space on top of the executor itself
+# What a test case writes to stderr is sent back with its result, up to this many characters
+DEBUG_OUTPUT_LIMIT = 16 * 1024
+# Characters a test case may print before it is stopped
+OUTPUT_LIMIT = 1024 * 1024
+# Characters of normalized output kept for the result
+DISPLAY_OUTPUT_LIMIT = 64 * 1024
+# Run every test case in a forked copy of this process
+FORK_TEST_CASES = hasattr(os, 'fork') and os.getenv('EXECUTOR_FORK', '1') == '1'
+# How many test cases run at the same time, each in its own child
+PARALLELISM = max(1, int(os.getenv('EXECUTOR_PARALLELISM', '1')))
+
+# Limits of the test case running in this (forked) process
+ACTIVE_LIMITS = {}
+
+LINE_BREAK = re.compile(r'\r\n|\r|\n')
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_line(line: str) -> str:
+    """Strip a line and standardize multiple spaces to a single space."""
+    return WHITESPACE.sub(' ', line.strip())
+
 def normalize_string(s: str) -> str:
     """Normalize a string by removing extra whitespace and standardizing line endings."""
-    # First, standardize all line endings to \n
-    s = s.replace('\r\n', '\n').replace('\r', '\n')
-    
-    # Split into lines, strip each line, and remove empty lines
-    lines = [line.strip() for line in s.split('\n')]
-    lines = [line for line in lines if line]
-    
-    # Standardize multiple spaces to single space within each line
-    lines = [re.sub(r'\s+', ' ', line) for line in lines]
+    # Split into lines on any line ending, normalize each line and remove empty lines
+    lines = [normalize_line(line) for line in LINE_BREAK.split(s)]
     
     # Join with single newlines
-    return '\n'.join(lines)
+    return '\n'.join(line for line in lines if line)
+
+class StopTestCase(BaseException):
+    """Raised into the user's code to end a test case early; `except Exception` does not catch it."""
+
+class OutputMismatch(StopTestCase):
+    pass
+
+class OutputLimitExceeded(StopTestCase):
+    pass
+
+class CappedBuffer:
+    """Write-only text stream that keeps the first `limit` characters and counts the rest."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts = []
+        self.kept = 0
+        self.dropped = 0
+
+    def write(self, text: str) -> int:
+        room = self.limit - self.kept
+        if room > 0:
+            self.parts.append(text[:room])
+            self.kept += min(room, len(text))
+        self.dropped += max(0, len(text) - max(room, 0))
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self) -> str:
+        text = ''.join(self.parts)
+        if self.dropped:
+            text += f"\n... ({self.dropped} more characters)"
+        return text
+
+class OutputComparator:
+    """Stdout of a test case, compared with the expected output line by line as it is written.
+
+    Lines are normalized like `normalize_string`. The first line that differs
+    from the expected output, and output beyond OUTPUT_LIMIT characters, stop
+    the test case by raising into the user's code, so a wrong answer or a print
+    loop does not run to completion. Only the first DISPLAY_OUTPUT_LIMIT
+    characters of the normalized output are kept.
+    """
 
-def run_test_case(code: str, test_input: str, expected_output: str) -> Dict[str, Any]:
-    """Run a single test case and return the result."""
-    output_buffer = StringIO()
-    error_buffer = StringIO()
+    def __init__(self, expected_output: str):
+        self.expected_lines = expected_output.split('\n') if expected_output else []
+        self.line_count = 0
+        # Text written after the last line break
+        self.partial = []
+        self.written = 0
+        self.mismatch_line = None
+        self.limit_exceeded = False
+        self.shown = []
+        self.shown_chars = 0
+        self.truncated = False
+
+    def _line(self, line: str):
+        line = normalize_line(line)
+        if not line:
+            return
+        self.line_count += 1
+        if self.shown_chars < DISPLAY_OUTPUT_LIMIT:
+            self.shown.append(line)
+            self.shown_chars += len(line) + 1
+        else:
+            self.truncated = True
+        if self.line_count > len(self.expected_lines) or line != self.expected_lines[self.line_count - 1]:
+            self.mismatch_line = self.line_count
+
+    def write(self, text: str) -> int:
+        if self.limit_exceeded:
+            raise OutputLimitExceeded()
+        if self.mismatch_line is not None:
+            raise OutputMismatch()
+        self.written += len(text)
+        if self.written > OUTPUT_LIMIT:
+            self.limit_exceeded = True
+            raise OutputLimitExceeded()
+        if '\n' not in text and '\r' not in text:
+            self.partial.append(text)
+            return len(text)
+        lines = LINE_BREAK.split(text)
+        self.partial.append(lines[0])
+        self._line(''.join(self.partial))
+        for line in lines[1:-1]:
+            if self.mismatch_line is None:
+                self._line(line)
+        self.partial = [lines[-1]]
+        if self.mismatch_line is not None:
+            raise OutputMismatch()
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def finish(self) -> bool:
+        """Compare the last unterminated line; True if exactly the expected output was printed."""
+        if self.mismatch_line is None and not self.limit_exceeded:
+            self._line(''.join(self.partial))
+            self.partial = []
+        return self.mismatch_line is None and not self.limit_exceeded and self.line_count == len(self.expected_lines)
+
+    def actual_output(self) -> str:
+        output = '\n'.join(self.shown)
+        if self.truncated:
+            output += '\n...'
+        return output
+
+def with_debug_output(result: Dict[str, Any], stderr: CappedBuffer) -> Dict[str, Any]:
+    """Attach the stderr output of a test case, at most DEBUG_OUTPUT_LIMIT characters, to its result."""
+    debug_output = stderr.getvalue()
+    if debug_output:
+        result["debug_output"] = debug_output
+    return result
+
+def run_test_case(code: CodeType, test_input: str, expected_output: str) -> Dict[str, Any]:
+    """Run a single test case against the compiled program and return the result."""
+    expected_output = normalize_string(expected_output)
+    output = OutputComparator(expected_output)
+    error_buffer = CappedBuffer(DEBUG_OUTPUT_LIMIT)
     
     try:
         # Split input into lines and create an input simulator
@@ -40,34 +182,264 @@ def run_test_case(code: str, test_input: str, expected_output: str) -> Dict[str,
         # Prepare the namespace for execution
         namespace = {'input': input_simulator}
         
-        # Execute the user's code
-        with redirect_stdout(output_buffer), redirect_stderr(error_buffer):
-            exec(code, namespace)
-            
-        # Get and normalize the output
-        actual_output = normalize_string(output_buffer.getvalue())
-        expected_output = normalize_string(expected_output)
-        
-        # Compare outputs
-        passed = actual_output == expected_output
-            
-        return {
+        # Execute the user's code; its output is compared while it is printed
+        try:
+            with redirect_stdout(output), redirect_stderr(error_buffer):
+                exec(code, namespace)
+        except OutputMismatch:
+            # The answer is already wrong, the rest of the output does not matter
+            pass
+        except OutputLimitExceeded:
+            pass
+
+        if output.limit_exceeded:
+            return with_debug_output({
+                "status": "error",
+                "passed": False,
+                "actual_output": output.actual_output(),
+                "expected_output": expected_output,
+                "error": f"OutputLimitExceeded: Output limit of {OUTPUT_LIMIT} characters exceeded",
+                "limit_exceeded": "output"
+            }, error_buffer)
+
+        passed = output.finish()
+        result = {
             "status": "success",
             "passed": passed,
-            "actual_output": actual_output,
+            "actual_output": output.actual_output(),
             "expected_output": expected_output,
             "error": None
         }
+        if output.mismatch_line is not None:
+            result["first_mismatch_line"] = output.mismatch_line
+        return with_debug_output(result, error_buffer)
         
+    except MemoryError:
+        return {
+            "status": "error",
+            "passed": False,
+            "actual_output": None,
+            "expected_output": expected_output,
+            "error": f"MemoryError: Memory limit of {ACTIVE_LIMITS.get('memory_mb')} MB exceeded",
+            "limit_exceeded": "memory"
+        }
+
     except Exception as e:
         error_msg = f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
-        return {
+        return with_debug_output({
             "status": "error",
             "passed": False,
             "actual_output": None,
             "expected_output": expected_output,
             "error": error_msg
-        }
+        }, error_buffer)
+
+def error_result(expected_output: str, error: str) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "passed": False,
+        "actual_output": None,
+        "expected_output": normalize_string(expected_output),
+        "error": error
+    }
+
+def skipped_result(expected_output: str, max_failures: int) -> Dict[str, Any]:
+    """Result of a test case that was not run because the job failed fast."""
+    result = error_result(expected_output, f"Skipped after {max_failures} failed test case(s)")
+    result["status"] = "skipped"
+    result["skipped"] = True
+    return result
+
+def test_limits(limits: Dict[str, Any]) -> Dict[str, Any]:
+    """Per test case limits of a job, with the defaults filled in."""
+    limits = limits or {}
+    return {
+        'time': float(limits.get('time') or TEST_TIME_LIMIT),
+        'cpu': float(limits.get('cpu') or TEST_CPU_LIMIT),
+        'memory_mb': int(limits.get('memory_mb') or TEST_MEMORY_LIMIT)
+    }
+
+def apply_limits(limits: Dict[str, Any]):
+    """Let the kernel enforce the CPU time and memory limits of the test case process.
+
+    The address space limit is counted from what the process already maps at
+    fork, so it is the memory the test case itself may add.
+    """
+    ACTIVE_LIMITS.update(limits)
+    cpu_seconds = max(1, math.ceil(limits['cpu']))
+    # SIGXCPU at the soft limit, SIGKILL one second later
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    with open('/proc/self/statm') as statm:
+        mapped = int(statm.read().split()[0]) * resource.getpagesize()
+    address_space = mapped + limits['memory_mb'] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (address_space, address_space))
+
+def _child_result(func, args: tuple, expected_output: str) -> bytes:
+    """Run func in the forked child and serialize what it returns."""
+    # Keep user code away from the parent's stdin and stdout
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, sys.stdin.fileno())
+    sys.stdin = open(os.devnull, 'r')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    try:
+        result = func(*args)
+    except BaseException as e:
+        result = error_result(expected_output, f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}")
+    try:
+        return json.dumps(result, ensure_ascii=False).encode('utf-8')
+    except Exception as e:
+        return json.dumps(error_result(expected_output, f"Could not serialize test result: {str(e)}")).encode('utf-8')
+
+def _start_child(args: tuple, inherited_fds: list, limits: Dict[str, Any]) -> tuple:
+    """Fork a child that runs one test case under the limits and writes its result to a pipe."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            os.close(read_fd)
+            # Pipes of the test cases running next to this one
+            for fd in inherited_fds:
+                os.close(fd)
+            apply_limits(limits)
+            payload = _child_result(run_test_case, args, args[2])
+            with os.fdopen(write_fd, 'wb') as pipe:
+                pipe.write(payload)
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    return pid, read_fd
+
+def _child_outcome(chunks: list, status: int, expected_output: str, cpu_time: float, limits: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return json.loads(b''.join(chunks).decode('utf-8'))
+    except ValueError:
+        if os.WIFSIGNALED(status) and (os.WTERMSIG(status) == signal.SIGXCPU or cpu_time >= limits['cpu']):
+            result = error_result(expected_output, f"TimeoutError: CPU time limit of {limits['cpu']:g} seconds exceeded")
+            result['limit_exceeded'] = 'cpu'
+            return result
+        if os.WIFSIGNALED(status):
+            reason = f"killed by signal {os.WTERMSIG(status)}"
+        else:
+            reason = f"exited with status {os.WEXITSTATUS(status)}"
+        return error_result(expected_output, f"Test case process {reason} without a result")
+
+def cpu_and_rss(usage) -> tuple:
+    """CPU time and peak RSS (kB) of a reaped child."""
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+def record_usage(result: Dict[str, Any], wall_time: float, cpu_time: float, max_rss_kb: int) -> Dict[str, Any]:
+    """Add wall time, CPU time and peak RSS of a test case to its result."""
+    result['wall_time'] = round(wall_time, 4)
+    result['cpu_time'] = round(cpu_time, 4)
+    # ru_maxrss is in kilobytes on Linux; it includes the interpreter itself
+    result['peak_memory_mb'] = round(max_rss_kb / 1024, 2)
+    return result
+
+def run_isolated(code: str, test_cases: List[Dict[str, Any]], limits: Dict[str, Any], parallelism: int = PARALLELISM, max_failures: int = None) -> List[Dict[str, Any]]:
+    """Run every test case in a forked child and collect the results over pipes.
+
+    Nothing the user's code does to interpreter state survives a test case. Up
+    to `parallelism` children run at once. Each one has the CPU time and memory
+    `limits` set by the kernel and is killed if it outlives the time limit; a
+    result that hit a limit names it in `limit_exceeded`. Results come back in
+    the order of `test_cases`.
+
+    With `max_failures`, no further children are started once that many results
+    have failed; the test cases that never ran are reported as skipped.
+    """
+    # Parse and compile once; every forked test case inherits the code object
+    try:
+        compiled = compile(code, '<user code>', 'exec')
+    except (SyntaxError, ValueError) as e:
+        return [
+            error_result(test_case['expected_output'], f"{type(e).__name__}: {str(e)}")
+            for test_case in test_cases
+        ]
+
+    args_list = [(compiled, test_case['input'], test_case['expected_output']) for test_case in test_cases]
+    timeout = limits['time']
+    if not FORK_TEST_CASES:
+        # In-process runs have no limits
+        results = []
+        for args in args_list:
+            if max_failures and sum(1 for result in results if not result.get('passed')) >= max_failures:
+                results.append(skipped_result(args[2], max_failures))
+                continue
+            started_at = time.monotonic()
+            cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+            result = run_test_case(*args)
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            # In-process runs share one process, so peak RSS is the process high-water mark
+            cpu_time = (usage.ru_utime + usage.ru_stime) - (cpu_before.ru_utime + cpu_before.ru_stime)
+            results.append(record_usage(result, time.monotonic() - started_at, cpu_time, usage.ru_maxrss))
+        return results
+
+    results = [None] * len(args_list)
+    pending = list(range(len(args_list)))
+    running = {}  # read fd -> (index, pid, started_at, chunks)
+    failures = 0
+    try:
+        while running or (pending and not (max_failures and failures >= max_failures)):
+            while pending and len(running) < max(1, parallelism) and not (max_failures and failures >= max_failures):
+                index = pending.pop(0)
+                pid, read_fd = _start_child(args_list[index], list(running), limits)
+                running[read_fd] = (index, pid, time.monotonic(), [])
+
+            nearest_deadline = min(started_at for _, _, started_at, _ in running.values()) + timeout
+            ready, _, _ = select.select(list(running), [], [], max(0, nearest_deadline - time.monotonic()))
+            for read_fd in ready:
+                index, pid, started_at, chunks = running[read_fd]
+                chunk = os.read(read_fd, 65536)
+                if chunk:
+                    chunks.append(chunk)
+                    continue
+                del running[read_fd]
+                os.close(read_fd)
+                _, status, usage = os.wait4(pid, 0)
+                cpu_time, max_rss_kb = cpu_and_rss(usage)
+                results[index] = record_usage(
+                    _child_outcome(chunks, status, args_list[index][2], cpu_time, limits),
+                    time.monotonic() - started_at, cpu_time, max_rss_kb
+                )
+                if not results[index].get('passed'):
+                    failures += 1
+
+            now = time.monotonic()
+            for read_fd, (index, pid, started_at, _) in list(running.items()):
+                if started_at + timeout > now:
+                    continue
+                del running[read_fd]
+                os.close(read_fd)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                _, _, usage = os.wait4(pid, 0)
+                results[index] = error_result(
+                    args_list[index][2], f"TimeoutError: Time limit of {timeout:g} seconds exceeded"
+                )
+                results[index]['limit_exceeded'] = 'time'
+                record_usage(results[index], now - started_at, *cpu_and_rss(usage))
+                failures += 1
+    finally:
+        # Only reached with children left if this process is being interrupted
+        for read_fd, (_, pid, _, _) in running.items():
+            os.close(read_fd)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+    for index in pending:
+        results[index] = skipped_result(args_list[index][2], max_failures)
+    return results
 
 def compare_outputs(expected: str, actual: str) -> bool:
     """Compare two strings after normalizing them."""
@@ -91,16 +463,13 @@ def main():
         if not test_cases:
             raise ValueError("No test cases provided")
 
-        # Run each test case
-        results = []
-        for i, test_case in enumerate(test_cases, 1):
-            result = run_test_case(
-                code=code,
-                test_input=test_case['input'],
-                expected_output=test_case['expected_output']
-            )
+        # Run the test cases, up to PARALLELISM of them at a time, stopping after
+        # `fail_fast` failures if the job asks for it
+        results = run_isolated(
+            code, test_cases, limits=test_limits(input_data.get('limits')), max_failures=input_data.get('fail_fast')
+        )
+        for i, result in enumerate(results, 1):
             result['test_case_number'] = i
-            results.append(result)
         
         # Return results
         output = {
@@ -0,0 +1,140 @@
+import pytest
+import executor
+from executor import CappedBuffer, OutputComparator, OutputLimitExceeded, OutputMismatch, normalize_string, run_test_case
+
+
+def test_normalize_string_drops_blank_lines_and_extra_whitespace():
+    assert normalize_string("  a   b \r\n\r\n\tc\rd\n\n") == "a b\nc\nd"
+
+
+def test_output_written_in_pieces_matches():
+    output = OutputComparator("hello world\n1 2 3")
+    output.write("hello ")
+    output.write("  world\n\n")
+    output.write("1 2")
+    output.write(" 3")
+    assert output.finish()
+    assert output.mismatch_line is None
+    assert output.actual_output() == "hello world\n1 2 3"
+
+
+def test_line_endings_and_blank_lines_are_normalized():
+    output = OutputComparator("a\nb")
+    output.write("a\r\n\r\n   \rb\r\n")
+    assert output.finish()
+
+
+def test_the_first_wrong_line_stops_the_test_case():
+    output = OutputComparator("1\n2\n3")
+    output.write("1\n")
+    with pytest.raises(OutputMismatch):
+        output.write("5\n3\n")
+    assert output.mismatch_line == 2
+    # Anything printed afterwards is not looked at
+    with pytest.raises(OutputMismatch):
+        output.write("3\n")
+    assert not output.finish()
+    assert output.actual_output() == "1\n5"
+
+
+def test_extra_and_missing_lines_do_not_match():
+    extra = OutputComparator("1")
+    extra.write("1\n")
+    with pytest.raises(OutputMismatch):
+        extra.write("2\n")
+    assert extra.mismatch_line == 2
+
+    missing = OutputComparator("1\n2")
+    missing.write("1\n")
+    assert not missing.finish()
+    assert missing.mismatch_line is None
+
+
+def test_an_unterminated_last_line_is_compared_on_finish():
+    output = OutputComparator("1\n2")
+    output.write("1\n3")
+    assert output.mismatch_line is None
+    assert not output.finish()
+    assert output.mismatch_line == 2
+
+
+def test_empty_expected_output():
+    assert OutputComparator("").finish()
+    output = OutputComparator("")
+    output.write("   \n")
+    assert output.finish()
+
+
+def test_output_beyond_the_limit_is_stopped(monkeypatch):
+    monkeypatch.setattr(executor, 'OUTPUT_LIMIT', 10)
+    output = OutputComparator("x" * 20)
+    output.write("x" * 10)
+    with pytest.raises(OutputLimitExceeded):
+        output.write("x")
+    assert output.limit_exceeded
+    with pytest.raises(OutputLimitExceeded):
+        output.write("x")
+    assert not output.finish()
+
+
+def test_only_the_start_of_the_output_is_kept(monkeypatch):
+    monkeypatch.setattr(executor, 'DISPLAY_OUTPUT_LIMIT', 4)
+    output = OutputComparator("a\nb\nc\nd")
+    output.write("a\nb\nc\nd\n")
+    assert output.finish()
+    assert output.actual_output() == "a\nb\n..."
+
+
+def test_capped_buffer_keeps_the_first_characters():
+    buffer = CappedBuffer(5)
+    assert buffer.write("abc") == 3
+    assert buffer.write("defgh") == 5
+    assert buffer.write("ij") == 2
+    assert buffer.getvalue() == "abcde\n... (5 more characters)"
+
+
+def test_capped_buffer_under_the_limit_is_unchanged():
+    buffer = CappedBuffer(5)
+    buffer.write("ab")
+    buffer.write("")
+    buffer.write("cde")
+    assert buffer.getvalue() == "abcde"
+
+
+def run(source: str, test_input: str, expected_output: str) -> dict:
+    return run_test_case(compile(source, '<submission>', 'exec'), test_input, expected_output)
+
+
+def test_run_test_case_passes_a_correct_program():
+    result = run("a, b = input().split()\nprint(int(a) + int(b))", "2 3", "5\n")
+    assert result['passed']
+    assert result['actual_output'] == "5"
+    assert 'first_mismatch_line' not in result
+
+
+def test_a_mismatch_is_not_caught_by_the_users_except():
+    source = "\n".join([
+        "for i in range(1000000):",
+        "    try:",
+        "        print(i)",
+        "    except Exception:",
+        "        pass",
+    ])
+    result = run(source, "", "0\n1\n7")
+    assert result['status'] == "success"
+    assert not result['passed']
+    assert result['first_mismatch_line'] == 3
+    assert result['actual_output'] == "0\n1\n2"
+
+
+def test_stderr_is_returned_as_debug_output():
+    result = run("import sys\nsys.stderr.write('debug')\nprint(1)", "", "1")
+    assert result['passed']
+    assert result['debug_output'] == "debug"
+
+
+def test_a_print_loop_stops_at_the_output_limit(monkeypatch):
+    monkeypatch.setattr(executor, 'OUTPUT_LIMIT', 100)
+    result = run("while True:\n    print('x')", "", "x\n" * 1000)
+    assert not result['passed']
+    assert result['limit_exceeded'] == "output"
@@ -0,0 +1,257 @@
+import copy
+import pytest
+from pymongo import ReturnDocument
+
+
+def _get(document: dict, path: str):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _set(document: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[last] = value
+
+
+def _matches_condition(value, condition) -> bool:
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        if isinstance(value, list) and not isinstance(condition, list):
+            return condition in value
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$gt" and not (value is not None and value > operand):
+            return False
+        if operator == "$gte" and not (value is not None and value >= operand):
+            return False
+        if operator == "$lt" and not (value is not None and value < operand):
+            return False
+        if operator == "$lte" and not (value is not None and value <= operand):
+            return False
+        if operator == "$ne" and value == operand:
+            return False
+        if operator == "$in":
+            values = value if isinstance(value, list) else [value]
+            if not any(v in operand for v in values):
+                return False
+        if operator == "$nin" and value in operand:
+            return False
+        if operator == "$exists" and (value is not None) != operand:
+            return False
+    return True
+
+
+def matches(document: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif not _matches_condition(_get(document, key), condition):
+            return False
+    return True
+
+
+def _project(document: dict, projection: dict) -> dict:
+    if not projection:
+        return copy.deepcopy(document)
+    result = {"_id": document.get("_id")}
+    for path, include in projection.items():
+        if not include:
+            continue
+        parts = path.split(".")
+        value = _get(document, path)
+        if value is None:
+            continue
+        target = result
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = copy.deepcopy(value)
+    return result
+
+
+class FakeCursor:
+    def __init__(self, documents: list):
+        self.documents = documents
+
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction)]
+        for key, key_direction in reversed(keys):
+            self.documents.sort(key=lambda document: _get(document, key), reverse=key_direction < 0)
+        return self
+
+    def skip(self, count: int):
+        self.documents = self.documents[count:]
+        return self
+
+    def limit(self, count: int):
+        if count:
+            self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents if length is None else self.documents[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self.documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        collection = FakeCollection(self)
+        self[name] = collection
+        return collection
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for the Motor collection methods the score and
+    leaderboard stores use, with the query, update and aggregation
+    operators they rely on.
+    """
+
+    def __init__(self, database: FakeDatabase = None):
+        self.database = database if database is not None else FakeDatabase()
+        self.documents = []
+
+    async def create_index(self, keys, **kwargs):
+        return None
+
+    def _find(self, query: dict) -> list:
+        return [document for document in self.documents if matches(document, query or {})]
+
+    def find(self, query: dict = None, projection: dict = None) -> FakeCursor:
+        return FakeCursor([_project(document, projection) for document in self._find(query)])
+
+    async def find_one(self, query: dict = None, projection: dict = None):
+        found = self._find(query)
+        return _project(found[0], projection) if found else None
+
+    async def insert_one(self, document: dict):
+        self.documents.append(copy.deepcopy(document))
+
+    async def replace_one(self, query: dict, document: dict, upsert: bool = False):
+        found = self._find(query)
+        if found:
+            self.documents[self.documents.index(found[0])] = copy.deepcopy(document)
+        elif upsert:
+            self.documents.append(copy.deepcopy(document))
+
+    @staticmethod
+    def _apply(document: dict, update: dict, inserted: bool):
+        for operator, fields in update.items():
+            if operator == "$setOnInsert" and not inserted:
+                continue
+            for key, value in fields.items():
+                if operator in ("$set", "$setOnInsert"):
+                    _set(document, key, value)
+                elif operator == "$inc":
+                    document[key] = document.get(key, 0) + value
+                elif operator == "$max":
+                    document[key] = value if key not in document else max(document[key], value)
+                elif operator == "$addToSet":
+                    values = document.setdefault(key, [])
+                    if value not in values:
+                        values.append(value)
+
+    def _upsert(self, query: dict, update: dict, upsert: bool):
+        found = self._find(query)
+        if found:
+            before = copy.deepcopy(found[0])
+            self._apply(found[0], update, inserted=False)
+            return before, found[0]
+        if not upsert:
+            return None, None
+        document = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+        self._apply(document, update, inserted=True)
+        self.documents.append(document)
+        return None, document
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        self._upsert(query, update, upsert)
+
+    async def find_one_and_update(self, query: dict, update: dict, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE):
+        before, after = self._upsert(query, update, upsert)
+        result = after if return_document == ReturnDocument.AFTER else before
+        return copy.deepcopy(result)
+
+    async def delete_many(self, query: dict):
+        self.documents = [document for document in self.documents if not matches(document, query)]
+
+    async def count_documents(self, query: dict) -> int:
+        return len(self._find(query))
+
+    async def estimated_document_count(self) -> int:
+        return len(self.documents)
+
+    async def distinct(self, key: str, query: dict = None) -> list:
+        values = []
+        for document in self._find(query):
+            value = _get(document, key)
+            for item in value if isinstance(value, list) else [value]:
+                if item not in values:
+                    values.append(item)
+        return values
+
+    def aggregate(self, pipeline: list, **kwargs) -> FakeCursor:
+        documents = [copy.deepcopy(document) for document in self.documents]
+        for stage in pipeline:
+            (operator, spec), = stage.items()
+            if operator == "$match":
+                documents = [document for document in documents if matches(document, spec)]
+            elif operator == "$sort":
+                documents = FakeCursor(documents).sort(list(spec.items())).documents
+            elif operator == "$group":
+                groups = {}
+                for document in documents:
+                    key = _get(document, spec["_id"][1:])
+                    group = groups.setdefault(key, {"_id": key})
+                    for field, accumulator in spec.items():
+                        if field == "_id":
+                            continue
+                        (accumulator_operator, path), = accumulator.items()
+                        value = _get(document, path[1:])
+                        if accumulator_operator == "$first":
+                            group.setdefault(field, value)
+                        elif accumulator_operator == "$max":
+                            group[field] = value if field not in group else max(group[field], value)
+                        elif accumulator_operator == "$sum":
+                            group[field] = group.get(field, 0) + value
+                documents = list(groups.values())
+            elif operator == "$lookup":
+                foreign = self.database[spec["from"]]
+                for document in documents:
+                    document[spec["as"]] = [
+                        copy.deepcopy(other) for other in foreign.documents
+                        if other.get(spec["foreignField"]) == _get(document, spec["localField"])
+                    ]
+            elif operator == "$unwind":
+                field = spec[1:]
+                documents = [
+                    dict(document, **{field: item})
+                    for document in documents
+                    for item in document.get(field, [])
+                ]
+            elif operator == "$project":
+                documents = [_project(document, spec) for document in documents]
+            else:
+                raise NotImplementedError(operator)
+        return FakeCursor(documents)
+
+
+@pytest.fixture
+def database():
+    return FakeDatabase()
@@ -0,0 +1,134 @@
+import os
+import io
+import re
+import asyncio
+import uuid
+import hashlib
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Content-addressed dataset files, mounted read-only into the executor containers
+DATASET_DIR = Path(os.getenv("DATASET_STORE_PATH", str(Path(__file__).parent / "datasets"))).resolve()
+
+# Where the executors find DATASET_DIR
+EXECUTOR_DATASET_DIR = "/datasets"
+
+DATASET_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+# Random id of the store at DATASET_DIR; judge workers report the one they see
+# so the API can tell whether they share its datasets and stored references
+STORE_ID_FILE = DATASET_DIR / ".store_id"
+
+PARQUET_MAGIC = b"PAR1"
+ARROW_MAGIC = b"ARROW1"
+
+
+class DatasetError(Exception):
+    pass
+
+
+def store_id(create: bool = False) -> Optional[str]:
+    """Id of the store at DATASET_DIR, or None if it has none; with `create` one is made"""
+    try:
+        return STORE_ID_FILE.read_text().strip() or None
+    except FileNotFoundError:
+        if not create:
+            return None
+    except OSError as e:
+        logger.warning(f"Cannot read the dataset store id: {str(e)}")
+        return None
+
+    DATASET_DIR.mkdir(parents=True, exist_ok=True)
+    temporary_path = STORE_ID_FILE.with_suffix(f".{os.getpid()}.tmp")
+    temporary_path.write_text(uuid.uuid4().hex)
+    try:
+        # Linking fails if another process created the id first; theirs is kept
+        os.link(temporary_path, STORE_ID_FILE)
+    except FileExistsError:
+        pass
+    finally:
+        temporary_path.unlink()
+    return STORE_ID_FILE.read_text().strip()
+
+
+class DatasetStore:
+    """
+    Stores test datasets as Arrow IPC files named by the sha256 of their content.
+
+    Uploads (Parquet or Arrow) are converted to uncompressed Arrow IPC files, which
+    the executors memory-map instead of parsing. A test case refers to its dataset
+    by hash, so the data never travels in the job JSON or in the question document.
+    """
+
+    def __init__(self, collection, root: Path = DATASET_DIR):
+        self.collection = collection
+        self.root = root
+
+    def path(self, dataset_hash: str) -> Path:
+        if not DATASET_HASH.match(dataset_hash or ""):
+            raise DatasetError(f"Invalid dataset hash: {dataset_hash}")
+        return self.root / f"{dataset_hash}.arrow"
+
+    @staticmethod
+    def _read_table(data: bytes) -> pa.Table:
+        if data[:4] == PARQUET_MAGIC:
+            return pq.read_table(io.BytesIO(data))
+        if data[:6] == ARROW_MAGIC:
+            return ipc.open_file(pa.BufferReader(data)).read_all()
+        try:
+            return ipc.open_stream(pa.BufferReader(data)).read_all()
+        except pa.ArrowInvalid:
+            raise DatasetError("Datasets must be uploaded as Parquet or Arrow IPC files")
+
+    def _write(self, data: bytes) -> dict:
+        """Convert an upload to an Arrow IPC file and store it under its hash"""
+        table = self._read_table(data)
+        sink = pa.BufferOutputStream()
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        encoded = sink.getvalue()
+        dataset_hash = hashlib.sha256(encoded).hexdigest()
+
+        path = self.path(dataset_hash)
+        if not path.exists():
+            self.root.mkdir(parents=True, exist_ok=True)
+            temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(temporary_path, "wb") as file:
+                file.write(encoded)
+            os.replace(temporary_path, path)
+            logger.info(f"Stored dataset {dataset_hash[:12]} ({encoded.size} bytes)")
+
+        return {
+            "_id": dataset_hash,
+            "rows": table.num_rows,
+            "columns": table.schema.names,
+            "size": encoded.size
+        }
+
+    async def add(self, data: bytes, filename: Optional[str] = None) -> dict:
+        """Store an uploaded dataset and record its metadata"""
+        loop = asyncio.get_event_loop()
+        document = await loop.run_in_executor(None, self._write, data)
+        document["filename"] = filename
+        document["created_at"] = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"_id": document["_id"]},
+            {"$setOnInsert": document},
+            upsert=True
+        )
+        return document
+
+    async def list(self) -> List[dict]:
+        return await self.collection.find().sort("created_at", -1).to_list(length=None)
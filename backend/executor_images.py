@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import logging
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from executor_pool import executor_pool, ExecutorConfig
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONTENT_HASH_LABEL = "algocrafters.content-hash"
+
+
+class ImageState:
+    def __init__(self, runner: str):
+        self.runner = runner
+        self.content_hash: Optional[str] = None
+        self.tag: Optional[str] = None
+        self.digest: Optional[str] = None
+        self.status = "pending"  # pending, ready, failed
+        self.built = False
+        self.checked_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "runner": self.runner,
+            "tag": self.tag,
+            "content_hash": self.content_hash,
+            "digest": self.digest,
+            "status": self.status,
+            "built": self.built,
+            "checked_at": self.checked_at,
+            "error": self.error
+        }
+
+
+class ExecutorImageManager:
+    """
+    Builds or verifies the executor images once at startup.
+
+    Every image is tagged with a hash of the files it is built from, so an
+    existing image is reused as is and `docker build` only runs when one of
+    those files changed.
+    """
+
+    def __init__(self):
+        self.images: Dict[str, ImageState] = {
+            runner: ImageState(runner) for runner in executor_pool.configs
+        }
+        # Known before the images are checked, and on API hosts that leave
+        # building them to remote judge workers
+        for runner, state in self.images.items():
+            try:
+                state.content_hash = self.content_hash(executor_pool.configs[runner])
+            except OSError as e:
+                logger.error(f"Failed to hash {runner} executor files: {str(e)}")
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def content_hash(config: ExecutorConfig) -> str:
+        """Hash the Dockerfile, requirements and executor script of a runner"""
+        digest = hashlib.sha256()
+        for filename in sorted(config.build_files):
+            digest.update(filename.encode('utf-8') + b'\0')
+            digest.update((config.executor_dir / filename).read_bytes())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def _inspect(tag: str) -> Optional[str]:
+        """Return the image id of a tag, or None if it does not exist"""
+        inspect_process = subprocess.run(
+            ['docker', 'image', 'inspect', '--format', '{{.Id}}', tag],
+            capture_output=True,
+            encoding='utf-8',
+            errors='replace'
+        )
+        if inspect_process.returncode != 0:
+            return None
+        return inspect_process.stdout.strip() or None
+
+    def _ensure_image(self, runner: str):
+        """Build the image of a runner unless an image for its current content exists"""
+        config = executor_pool.configs[runner]
+        state = self.images[runner]
+        try:
+            content_hash = self.content_hash(config)
+            tag = f"{config.image}:{content_hash[:12]}"
+
+            digest = self._inspect(tag)
+            built = False
+            if digest is None:
+                logger.info(f"Building {tag} from {config.executor_dir}")
+                build_process = subprocess.run(
+                    ['docker', 'build',
+                     '-t', tag,
+                     '-t', f"{config.image}:latest",
+                     '--label', f"{CONTENT_HASH_LABEL}={content_hash}",
+                     str(config.executor_dir)],
+                    capture_output=True,
+                    encoding='utf-8',
+                    errors='replace'
+                )
+                if build_process.returncode != 0:
+                    raise RuntimeError(f"docker build failed: {build_process.stderr[-2000:]}")
+                digest = self._inspect(tag)
+                built = True
+            else:
+                logger.info(f"Executor image {tag} is up to date")
+
+            state.content_hash = content_hash
+            state.tag = tag
+            state.digest = digest
+            state.built = built
+            state.status = "ready"
+            state.error = None
+            config.image_tag = tag
+        except Exception as e:
+            logger.error(f"Failed to prepare {config.image} image: {str(e)}")
+            state.status = "failed"
+            state.error = str(e)
+        finally:
+            state.checked_at = datetime.now(timezone.utc)
+
+    async def ensure_images(self):
+        """Build or verify all executor images, one thread per runner"""
+        async with self._lock:
+            loop = asyncio.get_event_loop()
+            await asyncio.gather(*[
+                loop.run_in_executor(None, self._ensure_image, runner)
+                for runner in self.images
+            ])
+
+    def is_ready(self, runner: str) -> bool:
+        state = self.images.get(runner)
+        return state is not None and state.status == "ready"
+
+    def status(self) -> Dict[str, dict]:
+        return {runner: state.to_dict() for runner, state in self.images.items()}
+
+
+executor_images = ExecutorImageManager()
@@ -0,0 +1,396 @@
+import os
+import asyncio
+import math
+import logging
+import uuid
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from dataset_store import DATASET_DIR, EXECUTOR_DATASET_DIR
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# docker_runner -> executor directory, image name, environment prefix, the
+# files that make up the image and, if supported, the long-lived worker command
+RUNNERS = {
+    "pandas": {
+        "dir": "pandas-executor",
+        "image": "pandas-executor",
+        "env_prefix": "PANDAS_EXECUTOR",
+        "build_files": ["Dockerfile", "requirements.txt", "pandas_executor.py"],
+        "worker_command": ["python", "pandas_executor.py", "--worker"],
+    },
+    "only_python": {
+        "dir": "code-executor",
+        "image": "code-executor",
+        "env_prefix": "CODE_EXECUTOR",
+        "build_files": ["Dockerfile", "requirements.txt", "executor.py"],
+    },
+}
+
+# How often the refill task re-checks the pools even if nobody asked it to
+REFILL_INTERVAL = 30  # seconds
+
+# Largest result line accepted from a worker container
+WORKER_LINE_LIMIT = 64 * 1024 * 1024  # bytes
+
+# How much of a worker's stderr is kept for error reporting
+STDERR_TAIL = 64 * 1024  # bytes
+
+# Container memory for the executor process itself (interpreter, pandas, the
+# decoded job) on top of the memory limits of its test case processes
+EXECUTOR_BASE_MEMORY_MB = 256
+
+MEMORY_UNITS = {"b": 1 / (1024 * 1024), "k": 1 / 1024, "m": 1, "g": 1024}
+
+# Time a job needs on top of its test cases: writing the job, decoding inputs
+# and sending the results back
+JOB_OVERHEAD = 5  # seconds
+
+
+def memory_mb(value: str) -> int:
+    """Megabytes in a docker memory value such as 512m or 2g"""
+    value = value.strip().lower()
+    unit = value[-1] if value[-1] in MEMORY_UNITS else "b"
+    number = value[:-1] if value[-1] in MEMORY_UNITS else value
+    return int(float(number) * MEMORY_UNITS[unit])
+
+
+class ExecutorConfig:
+    def __init__(self, runner: str, spec: dict):
+        prefix = spec["env_prefix"]
+        self.runner = runner
+        self.executor_dir = Path(__file__).parent / spec["dir"]
+        self.image = spec["image"]
+        self.build_files = spec["build_files"]
+        # Resolved to a content-addressed tag by the image manager at startup
+        self.image_tag = spec["image"]
+        self.pool_size = int(os.getenv(f"{prefix}_POOL_SIZE", "2"))
+        # Per test case limits, enforced by the executor in each test case process
+        self.test_time_limit = float(os.getenv(f"{prefix}_TEST_TIME_LIMIT", "10"))
+        self.test_cpu_limit = float(os.getenv(f"{prefix}_TEST_CPU_LIMIT", "10"))
+        self.test_memory_mb = int(os.getenv(f"{prefix}_TEST_MEMORY_MB", "256"))
+        # Test cases of one job run in up to `parallelism` processes at once, and the
+        # container's CPU quota is the per-process quota times that number
+        self.parallelism = max(1, int(os.getenv(f"{prefix}_PARALLELISM", "1")))
+        # The container must hold the executor and every test case process at its
+        # memory limit, or one job's children together get the whole container killed
+        configured_memory = os.getenv(f"{prefix}_MEMORY")
+        if configured_memory:
+            self.memory = configured_memory
+            fitting = max(1, (memory_mb(configured_memory) - EXECUTOR_BASE_MEMORY_MB) // self.test_memory_mb)
+            if fitting < self.parallelism:
+                logger.warning(f"Executor config '{runner}': {configured_memory} fits {fitting} test case(s) of {self.test_memory_mb}MB, lowering parallelism from {self.parallelism}")
+                self.parallelism = fitting
+        else:
+            self.memory = f"{EXECUTOR_BASE_MEMORY_MB + self.parallelism * self.test_memory_mb}m"
+        self.cpus_per_test = float(os.getenv(f"{prefix}_CPUS", "1"))
+        self.cpus = f"{self.cpus_per_test * self.parallelism:g}"
+        # Judge scheduling: concurrent jobs and how many may wait for a slot
+        self.slots = int(os.getenv(f"{prefix}_SLOTS", "2"))
+        self.max_queue = int(os.getenv(f"{prefix}_MAX_QUEUE", "20"))
+        self.queue_timeout = float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", "30"))
+        # Worker mode: one container process serves many jobs before it is replaced
+        self.worker_command = spec.get("worker_command")
+        self.worker_mode = bool(self.worker_command) and os.getenv(f"{prefix}_WORKER_MODE", "true").lower() == "true"
+        self.max_jobs = int(os.getenv(f"{prefix}_MAX_JOBS", "100"))
+
+        logger.info(f"Executor config '{runner}' initialized: image={self.image}, pool_size={self.pool_size}, memory={self.memory}, cpus={self.cpus}, parallelism={self.parallelism}, test_time_limit={self.test_time_limit:g}s, test_cpu_limit={self.test_cpu_limit:g}s, test_memory={self.test_memory_mb}MB, slots={self.slots}, max_queue={self.max_queue}, worker_mode={self.worker_mode}")
+
+    def limits(self) -> dict:
+        """Per test case limits, sent with every job"""
+        return {
+            "time": self.test_time_limit,
+            "cpu": self.test_cpu_limit,
+            "memory_mb": self.test_memory_mb
+        }
+
+    def job_timeout(self, test_count: int) -> float:
+        """Host-side budget of a job: its test cases run `parallelism` at a time"""
+        rounds = math.ceil(max(1, test_count) / self.parallelism)
+        return rounds * self.test_time_limit + JOB_OVERHEAD
+
+
+def with_job_id(input_bytes: bytes, job_id: str) -> bytes:
+    """The JSON job object with a job_id member added in front, without re-encoding the job"""
+    body = input_bytes.strip()
+    if not body.startswith(b'{'):
+        raise ValueError("An executor job must be a JSON object")
+    rest = body[1:].lstrip()
+    separator = b'' if rest.startswith(b'}') else b', '
+    return b'{"job_id": "' + job_id.encode('ascii') + b'"' + separator + rest
+
+
+def job_id_prefix(job_id: str) -> bytes:
+    """How a worker's result line for the job starts; the worker writes job_id first"""
+    return b'{"job_id": "' + job_id.encode('ascii') + b'"'
+
+
+class ExecutionTimeout(Exception):
+    pass
+
+
+class PooledContainer:
+    """A started executor container waiting for its job on stdin"""
+
+    def __init__(self, runner: str, name: str, process: asyncio.subprocess.Process):
+        self.runner = runner
+        self.name = name
+        self.process = process
+        self.started_at = time.time()
+        self.discarded = False
+        self.jobs_served = 0
+        self.stderr_tail = b''
+
+    def is_alive(self) -> bool:
+        return self.process.returncode is None
+
+
+class ExecutorPool:
+    """
+    Keeps a number of idle, already started executor containers per docker_runner.
+
+    The executors read their job from stdin, so a container started with `docker run -i`
+    sits with Python and its imports loaded until a job is written to it. Single-shot
+    containers serve exactly one job and are replaced by the background refill task.
+    Runners in worker mode read one JSON job per line and answer with one JSON line,
+    so their containers go back to the pool until they have served `max_jobs` jobs.
+
+    Containers are driven through asyncio subprocesses, so a running job never blocks
+    the event loop.
+    """
+
+    def __init__(self):
+        load_dotenv()
+        self.configs: Dict[str, ExecutorConfig] = {
+            runner: ExecutorConfig(runner, spec) for runner, spec in RUNNERS.items()
+        }
+        self._idle: Dict[str, List[PooledContainer]] = {runner: [] for runner in RUNNERS}
+        # Worker containers currently running a job; they come back to the pool
+        self._busy: Dict[str, int] = {runner: 0 for runner in RUNNERS}
+        self._refill_event = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+
+    def get_config(self, runner: str) -> Optional[ExecutorConfig]:
+        return self.configs.get(runner)
+
+    async def _start_container(self, runner: str) -> PooledContainer:
+        """Start a new executor container that blocks on its stdin"""
+        config = self.configs[runner]
+        name = f"{config.image}-{uuid.uuid4().hex[:12]}"
+
+        # Test datasets are shared read-only by all containers
+        DATASET_DIR.mkdir(parents=True, exist_ok=True)
+
+        command = [
+            'docker', 'run', '--rm', '-i', '--name', name,
+            '--network=none', f'--memory={config.memory}', f'--cpus={config.cpus}',
+            '-e', f'EXECUTOR_PARALLELISM={config.parallelism}',
+            '-v', f'{str(DATASET_DIR)}:{EXECUTOR_DATASET_DIR}:ro',
+            config.image_tag
+        ]
+        if config.worker_mode:
+            command += config.worker_command
+
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=WORKER_LINE_LIMIT
+        )
+        container = PooledContainer(runner, name, process)
+        if config.worker_mode:
+            # Nobody calls communicate() on a worker, so keep its stderr pipe drained
+            self._spawn(self._drain_stderr(container))
+        return container
+
+    async def _drain_stderr(self, container: PooledContainer):
+        while True:
+            chunk = await container.process.stderr.read(4096)
+            if not chunk:
+                break
+            container.stderr_tail = (container.stderr_tail + chunk)[-STDERR_TAIL:]
+
+    async def acquire(self, runner: str) -> PooledContainer:
+        """Hand out an idle container for one job, starting a cold one if the pool is empty"""
+        if runner not in self.configs:
+            raise ValueError(f"Unsupported docker runner: {runner}")
+
+        idle = self._idle[runner]
+        container = None
+        while idle:
+            candidate = idle.pop(0)
+            if candidate.is_alive():
+                container = candidate
+                break
+            logger.warning(f"Discarding dead pooled container {candidate.name}")
+
+        if container is None:
+            logger.info(f"Executor pool '{runner}' is empty, starting a cold container")
+            container = await self._start_container(runner)
+
+        if self.configs[runner].worker_mode:
+            self._busy[runner] += 1
+        # Replace what we just handed out
+        self._refill_event.set()
+        return container
+
+    def release(self, container: PooledContainer):
+        """Return a container after its job; single-use and worn out containers are removed"""
+        config = self.configs[container.runner]
+        if config.worker_mode:
+            self._busy[container.runner] -= 1
+        if container.discarded or not container.is_alive():
+            self._refill_event.set()
+            return
+        idle = self._idle[container.runner]
+        if config.worker_mode and container.jobs_served < config.max_jobs and len(idle) < config.pool_size:
+            idle.append(container)
+            return
+        self.discard(container)
+        self._refill_event.set()
+
+    def discard(self, container: PooledContainer):
+        """Force-remove a container, e.g. after a timeout or cancellation"""
+        container.discarded = True
+        try:
+            container.process.kill()
+        except ProcessLookupError:
+            pass
+        # The docker client being killed does not stop the container itself
+        self._spawn(self._remove_container(container))
+
+    def _spawn(self, coro):
+        """Run a coroutine in the background, keeping a reference until it is done"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _remove_container(self, container: PooledContainer):
+        try:
+            await container.process.wait()
+            remove_process = await asyncio.create_subprocess_exec(
+                'docker', 'rm', '-f', container.name,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            await remove_process.wait()
+        except Exception as e:
+            logger.error(f"Failed to remove container {container.name}: {str(e)}")
+
+    async def run(self, runner: str, input_bytes: bytes, timeout: float) -> Tuple[int, bytes, bytes]:
+        """
+        Run one job in a pooled container and return (returncode, stdout, stderr).
+
+        The container is killed and removed if the job exceeds `timeout` seconds
+        (raising ExecutionTimeout), if the awaiting request is cancelled, or on
+        any other error. A worker container only goes back to the pool after it
+        answered with a complete result line for this job.
+        """
+        container = await self.acquire(runner)
+        try:
+            if self.configs[runner].worker_mode:
+                return await asyncio.wait_for(self._run_on_worker(container, input_bytes), timeout=timeout)
+            stdout, stderr = await asyncio.wait_for(
+                container.process.communicate(input=input_bytes),
+                timeout=timeout
+            )
+            return container.process.returncode, stdout, stderr
+        except asyncio.TimeoutError:
+            self.discard(container)
+            raise ExecutionTimeout(f"Execution exceeded {timeout} seconds")
+        except BaseException:
+            # Whatever is left in its pipes belongs to this job; never reuse the worker
+            self.discard(container)
+            raise
+        finally:
+            self.release(container)
+
+    async def _run_on_worker(self, container: PooledContainer, input_bytes: bytes) -> Tuple[int, bytes, bytes]:
+        """
+        Send one job line to a worker container and read its one result line.
+
+        Every job carries a fresh job id that the worker puts first in its result
+        line. A line that is incomplete or answers another job means the worker is
+        out of step with its job stream, so the container is discarded.
+        """
+        process = container.process
+        container.jobs_served += 1
+        job_id = uuid.uuid4().hex
+        try:
+            process.stdin.write(with_job_id(input_bytes, job_id) + b'\n')
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        try:
+            line = await process.stdout.readline()
+        except ValueError:
+            # The result line is longer than WORKER_LINE_LIMIT
+            self.discard(container)
+            return 1, b'', f"Executor result exceeded {WORKER_LINE_LIMIT} bytes".encode('utf-8')
+        if not line:
+            # The worker exited instead of answering
+            returncode = await process.wait()
+            return returncode or 1, b'', container.stderr_tail
+        if not line.endswith(b'\n') or not line.startswith(job_id_prefix(job_id)):
+            logger.error(f"Worker container {container.name} answered out of step, discarding it")
+            self.discard(container)
+            return 1, b'', b'Executor worker returned a result for another job'
+        return 0, line, b''
+
+    async def _refill(self):
+        """Drop dead idle containers and top every pool up to its configured size"""
+        for runner, config in self.configs.items():
+            idle = self._idle[runner]
+            idle[:] = [c for c in idle if c.is_alive()]
+            # Containers may be handed out or returned while we await a start;
+            # busy workers count towards the pool because they come back
+            while len(idle) + self._busy[runner] < config.pool_size:
+                try:
+                    idle.append(await self._start_container(runner))
+                except Exception as e:
+                    logger.error(f"Failed to start {config.image} container: {str(e)}")
+                    break
+
+    async def _refill_loop(self):
+        while True:
+            try:
+                await self._refill()
+            except Exception as e:
+                logger.error(f"Error in executor pool refill: {str(e)}")
+            try:
+                await asyncio.wait_for(self._refill_event.wait(), timeout=REFILL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._refill_event.clear()
+
+    def start(self):
+        """Start the background refill task"""
+        if self._refill_task is None:
+            self._refill_task = asyncio.create_task(self._refill_loop())
+            logger.info("Executor pool started")
+
+    async def stop(self):
+        """Stop refilling and remove all idle containers"""
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+        for runner in self._idle:
+            for container in self._idle[runner]:
+                self.discard(container)
+            self._idle[runner] = []
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        logger.info("Executor pool stopped")
+
+
+executor_pool = ExecutorPool()
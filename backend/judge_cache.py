@@ -0,0 +1,130 @@
+import os
+import io
+import copy
+import json
+import time
+import hashlib
+import logging
+import tokenize
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+from executor_images import executor_images
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Token types that do not change what a program does
+IGNORED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING}
+
+
+def normalize_code(code: str) -> str:
+    """
+    Code with comments, blank lines and insignificant whitespace removed.
+
+    Indentation only matters as block structure, so it is reduced to the
+    INDENT/DEDENT tokens. Code that does not tokenize is kept as it is, minus
+    trailing whitespace.
+    """
+    try:
+        tokens = []
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in IGNORED_TOKENS:
+                continue
+            if token.type in (tokenize.INDENT, tokenize.DEDENT, tokenize.NEWLINE):
+                tokens.append(tokenize.tok_name[token.type])
+            else:
+                tokens.append(token.string)
+        return "\0".join(tokens)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return "\n".join(line.rstrip() for line in code.strip().splitlines())
+
+
+class JudgeCache:
+    """
+    Executor results of recently judged code, kept in memory.
+
+    Entries are keyed by the normalized code, the version of the question (its
+    test cases, working driver and judging settings) and the executor image and
+    limits, so a Run or Submit of unchanged code skips the container. Entries
+    expire after `ttl` seconds and the least recently used ones are evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self):
+        load_dotenv()
+        self.max_entries = int(os.getenv("JUDGE_CACHE_SIZE", "1000"))
+        self.ttl = float(os.getenv("JUDGE_CACHE_TTL", "600"))
+        # key -> (question_id, stored_at, results)
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(f"Judge cache initialized: max_entries={self.max_entries}, ttl={self.ttl:g}s")
+
+    @staticmethod
+    def key(code: str, question: dict, is_submission: bool, limits: dict) -> str:
+        runner = question.get('docker_runner', 'only_python')
+        image = executor_images.images.get(runner)
+        payload = json.dumps({
+            "code": hashlib.sha256(normalize_code(code).encode('utf-8')).hexdigest(),
+            "question": [
+                question.get('testCases', []),
+                question.get('working_driver', ''),
+                question.get('comparison'),
+                question.get('fail_fast', 0)
+            ],
+            "runner": runner,
+            "image": image.content_hash if image else None,
+            "limits": limits,
+            # A Run only executes the visible test cases
+            "is_submission": is_submission
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[dict]:
+        """Cached results for a key, or None if there are none or they expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        _, stored_at, results = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # Callers update the results they get back
+        return copy.deepcopy(results)
+
+    def put(self, key: str, question_id: str, results: dict):
+        if not self.enabled:
+            return
+        self._entries[key] = (question_id, time.monotonic(), copy.deepcopy(results))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, question_id: str):
+        """Drop all results of a question, e.g. after it was edited"""
+        stale = [key for key, entry in self._entries.items() if entry[0] == question_id]
+        for key in stale:
+            del self._entries[key]
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+judge_cache = JudgeCache()
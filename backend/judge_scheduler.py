@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Dict, Tuple
+from executor_pool import executor_pool, ExecutionTimeout
+from executor_images import executor_images
+from remote_judges import remote_judges, WorkerBusy
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of recent jobs the latency percentiles are computed over
+METRICS_WINDOW = 500
+
+
+class JudgeQueueFull(Exception):
+    """Raised when a job is not admitted; retry_after is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def summarize(samples: deque) -> dict:
+    """Average, p50, p95 and max of a window of durations in seconds"""
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {
+        "avg": round(sum(ordered) / len(ordered), 4),
+        "p50": round(ordered[int(0.50 * (len(ordered) - 1))], 4),
+        "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 4),
+        "max": round(ordered[-1], 4)
+    }
+
+
+class RunnerQueue:
+    """Slots, waiting jobs and metrics of one docker_runner"""
+
+    def __init__(self, runner: str, slots: int, max_queue: int, queue_timeout: float):
+        self.runner = runner
+        self.slots = max(1, slots)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(self.slots)
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.queue_times = deque(maxlen=METRICS_WINDOW)
+        self.run_times = deque(maxlen=METRICS_WINDOW)
+
+    def retry_after(self) -> int:
+        """Rough time until a queued job would get a slot"""
+        recent = list(self.run_times)[-50:]
+        average_run_time = sum(recent) / len(recent) if recent else 5.0
+        return max(1, math.ceil(average_run_time * (self.waiting + 1) / self.slots))
+
+    def snapshot(self) -> dict:
+        return {
+            "slots": self.slots,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "queue_time": summarize(self.queue_times),
+            "run_time": summarize(self.run_times)
+        }
+
+
+class JudgeScheduler:
+    """
+    Admission control in front of the executor pool.
+
+    Each docker_runner gets a fixed number of concurrent slots and a bounded
+    wait queue. When the queue is full a job is rejected immediately with
+    JudgeQueueFull instead of piling more containers onto the host.
+
+    With JUDGE_WORKER_URLS set, admitted jobs are sent to remote judge workers
+    instead of the local executor pool, and the slots cap the jobs this API
+    process has in flight across all of them.
+    """
+
+    def __init__(self):
+        self.queues: Dict[str, RunnerQueue] = {
+            runner: RunnerQueue(runner, config.slots, config.max_queue, config.queue_timeout)
+            for runner, config in executor_pool.configs.items()
+        }
+        # Where admitted jobs run: remote judge workers, or the local pool if None
+        self.remote = remote_judges if remote_judges.enabled else None
+
+    def is_ready(self, runner: str) -> bool:
+        """Whether jobs of the runner can be run right now"""
+        if self.remote is not None:
+            return self.remote.is_ready(runner)
+        return executor_images.is_ready(runner)
+
+    def shares_dataset_store(self, runner: str) -> bool:
+        """Whether the executors of the runner can read the API's datasets and stored references"""
+        if self.remote is not None:
+            return self.remote.shares_store(runner)
+        return True
+
+    async def run(self, runner: str, input_bytes: bytes, timeout: float) -> Tuple[int, bytes, bytes]:
+        """Wait for a slot of the runner, then run the job in the executor pool"""
+        queue = self.queues.get(runner)
+        if queue is None:
+            raise ValueError(f"Unsupported docker runner: {runner}")
+
+        if queue.waiting + queue.running >= queue.slots + queue.max_queue:
+            queue.rejected += 1
+            raise JudgeQueueFull(f"Judge queue for {runner} is full", queue.retry_after())
+
+        queued_at = time.monotonic()
+        queue.waiting += 1
+        try:
+            await asyncio.wait_for(queue.semaphore.acquire(), timeout=queue.queue_timeout)
+        except asyncio.TimeoutError:
+            queue.rejected += 1
+            raise JudgeQueueFull(f"Timed out waiting for a {runner} judge slot", queue.retry_after())
+        finally:
+            queue.waiting -= 1
+
+        started_at = time.monotonic()
+        queue.queue_times.append(started_at - queued_at)
+        queue.running += 1
+        try:
+            if self.remote is not None:
+                result = await self.remote.run(runner, input_bytes, timeout=timeout)
+            else:
+                result = await executor_pool.run(runner, input_bytes, timeout=timeout)
+            queue.completed += 1
+            return result
+        except ExecutionTimeout:
+            queue.timed_out += 1
+            raise
+        except WorkerBusy as e:
+            queue.rejected += 1
+            raise JudgeQueueFull(str(e), e.retry_after)
+        except Exception:
+            queue.failed += 1
+            raise
+        finally:
+            queue.run_times.append(time.monotonic() - started_at)
+            queue.running -= 1
+            queue.semaphore.release()
+
+    def metrics(self) -> Dict[str, dict]:
+        return {runner: queue.snapshot() for runner, queue in self.queues.items()}
+
+
+judge_scheduler = JudgeScheduler()
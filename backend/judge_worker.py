@@ -0,0 +1,145 @@
+import os
+import hmac
+import json
+import signal
+import asyncio
+import argparse
+import logging
+from dotenv import load_dotenv
+from executor_pool import executor_pool, ExecutionTimeout, WORKER_LINE_LIMIT
+from executor_images import executor_images
+from dataset_store import store_id
+from judge_scheduler import judge_scheduler, JudgeQueueFull
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DEFAULT_HOST = os.getenv("JUDGE_WORKER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("JUDGE_WORKER_PORT", "8101"))
+
+
+class JudgeWorkerServer:
+    """
+    Runs executor jobs sent by the API over TCP.
+
+    Each worker has its own executor pool and judge slots. The protocol is one
+    JSON request line and one JSON response line per connection, and every
+    request must carry the worker's JUDGE_WORKER_TOKEN.
+    """
+
+    def __init__(self, token: str):
+        self.token = token
+
+    def authorized(self, token) -> bool:
+        return hmac.compare_digest(str(token or ""), self.token)
+
+    def health(self) -> dict:
+        """Image readiness and current load per runner, and the dataset store the executors mount"""
+        return {
+            "status": "ok",
+            "dataset_store": store_id(),
+            "runners": {
+                runner: {
+                    "ready": executor_images.is_ready(runner),
+                    "content_hash": executor_images.images[runner].content_hash,
+                    "slots": queue.slots,
+                    "running": queue.running,
+                    "waiting": queue.waiting
+                }
+                for runner, queue in judge_scheduler.queues.items()
+            }
+        }
+
+    async def respond(self, request: dict) -> dict:
+        if not self.authorized(request.get("token")):
+            return {"error": "unauthorized"}
+
+        op = request.get("op")
+        if op == "health":
+            return self.health()
+        if op != "run":
+            return {"error": "bad_request", "detail": f"Unknown operation: {op}"}
+
+        try:
+            returncode, stdout, stderr = await judge_scheduler.run(
+                request["runner"], request["job"].encode("utf-8"), timeout=float(request["timeout"])
+            )
+        except JudgeQueueFull as e:
+            return {"error": "busy", "detail": str(e), "retry_after": e.retry_after}
+        except ExecutionTimeout as e:
+            return {"error": "timeout", "detail": str(e)}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"error": "bad_request", "detail": str(e)}
+        return {
+            "returncode": returncode,
+            "stdout": stdout.decode("utf-8", errors="replace"),
+            "stderr": stderr.decode("utf-8", errors="replace")
+        }
+
+    async def respond_to_line(self, line: bytes) -> dict:
+        try:
+            return await self.respond(json.loads(line))
+        except ValueError as e:
+            return {"error": "bad_request", "detail": f"Invalid request: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Error handling judge request: {str(e)}")
+            return {"error": "failed", "detail": str(e)}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # readline raises ValueError, not LimitOverrunError, for a line over the stream limit
+                response = {"error": "bad_request", "detail": f"Request exceeds {WORKER_LINE_LIMIT} bytes"}
+            else:
+                if not line:
+                    return
+                response = await self.respond_to_line(line)
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            logger.warning(f"Judge connection dropped: {str(e)}")
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int):
+    token = os.getenv("JUDGE_WORKER_TOKEN", "")
+    if not token:
+        logger.warning("JUDGE_WORKER_TOKEN is not set; any client that can connect may run jobs")
+
+    # A worker runs its jobs itself, even if it shares the API's environment
+    judge_scheduler.remote = None
+
+    await executor_images.ensure_images()
+    executor_pool.start()
+
+    # Stop on SIGTERM or SIGINT so the pooled containers are removed
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(stop_signal, stopping.set)
+
+    server = await asyncio.start_server(JudgeWorkerServer(token).handle, host, port, limit=WORKER_LINE_LIMIT)
+    logger.info(f"Judge worker listening on {host}:{port}")
+    try:
+        async with server:
+            await stopping.wait()
+    finally:
+        await executor_pool.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run executor jobs for the API")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import base64
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rendered pages kept per process; a write makes all of them unreachable
+PAGE_CACHE_SIZE = 256
+
+VERSION_ID = "leaderboard"
+
+
+class LeaderboardCursorError(Exception):
+    pass
+
+
+class Leaderboard:
+    """
+    Materialized leaderboard: one document per user with a successful submission,
+    holding the display name, total score and number of solved questions.
+
+    The submission write path changes an entry by the best-score delta and bumps
+    a version number. Pages are read in (total_score desc, _id asc) order, either
+    by page number or with a keyset cursor, and cached whole under the version
+    they were built for, so any write invalidates every cached page in every
+    process. scripts/rebuild_leaderboard.py rebuilds the collection from
+    user_progress.
+    """
+
+    def __init__(self, collection, meta_collection):
+        self.collection = collection
+        self.meta_collection = meta_collection
+        self._pages: OrderedDict = OrderedDict()
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("total_score", DESCENDING), ("_id", ASCENDING)])
+
+    async def version(self) -> int:
+        document = await self.meta_collection.find_one({"_id": VERSION_ID})
+        return document.get("version", 0) if document else 0
+
+    async def _bump_version(self):
+        await self.meta_collection.update_one({"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+    async def record(self, user_id: str, user_name: str, delta: int, first_solve: bool):
+        """Apply an improved best score of a user to their entry"""
+        increments = {"total_score": delta}
+        if first_solve:
+            increments["questions_solved"] = 1
+        await self.collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$inc": increments, "$set": {"user_name": user_name}},
+            upsert=True
+        )
+        await self._bump_version()
+
+    @staticmethod
+    def encode_cursor(entry: dict) -> str:
+        raw = f"{entry['total_score']}:{entry['_id']}".encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[int, ObjectId]:
+        try:
+            score, user_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split(":")
+            return int(score), ObjectId(user_id)
+        except (ValueError, InvalidId, UnicodeError) as e:
+            raise LeaderboardCursorError(f"Invalid leaderboard cursor: {str(e)}")
+
+    @staticmethod
+    def _after(score: int, user_id: ObjectId) -> dict:
+        """Entries that come after (score, user_id) in leaderboard order"""
+        return {"$or": [
+            {"total_score": {"$lt": score}},
+            {"total_score": score, "_id": {"$gt": user_id}}
+        ]}
+
+    async def _position(self, score: int, user_id: ObjectId) -> int:
+        """Number of entries that come before (score, user_id) in leaderboard order"""
+        higher = await self.collection.count_documents({"total_score": {"$gt": score}})
+        tied_before = await self.collection.count_documents({"total_score": score, "_id": {"$lt": user_id}})
+        return higher + tied_before
+
+    async def _ranked(self, entries: List[dict], position: int) -> List[dict]:
+        """Entries with their rank, the first one being at `position`; users with equal scores share a rank"""
+        if not entries:
+            return []
+        higher = await self.collection.count_documents({"total_score": {"$gt": entries[0]["total_score"]}})
+        rankings = []
+        rank = higher + 1
+        for i, entry in enumerate(entries):
+            if i and entry["total_score"] != entries[i - 1]["total_score"]:
+                rank = position + i + 1
+            rankings.append({
+                "rank": rank,
+                "user_id": str(entry["_id"]),
+                "user_name": entry.get("user_name", ""),
+                "total_score": entry.get("total_score", 0),
+                "questions_solved": entry.get("questions_solved", 0)
+            })
+        return rankings
+
+    async def _build_page(self, page: int, limit: int, cursor: Optional[str]) -> dict:
+        query = self._after(*self.decode_cursor(cursor)) if cursor else {}
+        find = self.collection.find(query).sort([("total_score", DESCENDING), ("_id", ASCENDING)])
+        if not cursor:
+            find = find.skip((page - 1) * limit)
+        # One extra entry tells whether there is a next page
+        entries = await find.limit(limit + 1).to_list(length=None)
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        total_users = await self.collection.estimated_document_count()
+        if not cursor:
+            position = (page - 1) * limit
+        else:
+            # A cursor page starts wherever its first entry stands now
+            position = await self._position(entries[0]["total_score"], entries[0]["_id"]) if entries else total_users
+            page = position // limit + 1
+
+        return {
+            "rankings": await self._ranked(entries, position),
+            "total_users": total_users,
+            "page": page,
+            "total_pages": (total_users + limit - 1) // limit,
+            "next_cursor": self.encode_cursor(entries[-1]) if has_more else None
+        }
+
+    async def page(self, page: int = 1, limit: int = 10, cursor: Optional[str] = None) -> dict:
+        """One leaderboard page, from the page cache if nothing changed since it was built"""
+        page = max(1, page)
+        limit = max(1, limit)
+        key = (await self.version(), cursor or page, limit)
+        cached = self._pages.get(key)
+        if cached is not None:
+            self._pages.move_to_end(key)
+            return cached
+
+        result = await self._build_page(page, limit, cursor)
+        self._pages[key] = result
+        while len(self._pages) > PAGE_CACHE_SIZE:
+            self._pages.popitem(last=False)
+        return result
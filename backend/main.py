@@ -10,7 +10,7 @@ from datetime import datetime, timezone, timedelta
 import uvicorn
 from helper import hash_password, verify_password,  generate_verification_token
 from bson import ObjectId
-import subprocess
+from pymongo import ASCENDING, DESCENDING
 import json
 import os
 from pathlib import Path
@@ -26,6 +26,17 @@ from models import (Submission,
                     Question,
                     CodeExecutionRequest)
 from email_service import email_service
+from executor_pool import executor_pool, ExecutionTimeout
+from executor_images import executor_images
+from judge_scheduler import judge_scheduler, JudgeQueueFull
+from judge_cache import judge_cache
+from remote_judges import remote_judges
+from reference_outputs import ReferenceOutputStore
+from runtime_stats import RuntimeStats
+from best_scores import BestScoreLedger, best_submissions
+from score_index import ModuleScores, ProfileScores
+from leaderboard import Leaderboard, LeaderboardCursorError
+from dataset_store import DatasetStore, DatasetError
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 import secrets
@@ -53,6 +64,9 @@ if not JWT_SECRET:
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 30  # 30 days to match NextAuth default
 
+# Code execution configuration
+DEBUG_OUTPUT_LIMIT = 64 * 1024  # characters of debug output returned per execution
+
 # Rate limiting configuration
 limiter = Limiter(key_func=get_remote_address)
 
@@ -77,6 +91,37 @@ submissions_collection = db['submissions']
 user_progress_collection = db['user_progress']
 profile_collection = db['User_info']
 modules_collection = db['modules']
+reference_outputs_collection = db['reference_outputs']
+
+best_scores_collection = db['best_scores']
+
+# Best successful score per user and question, maintained incrementally
+best_scores = BestScoreLedger(best_scores_collection)
+
+module_scores_collection = db['module_scores']
+
+# Score of every user per module, with an in-memory rank index per module
+module_scores = ModuleScores(module_scores_collection)
+
+# Total score of every profile, with an in-memory rank index for top percentages
+profile_scores = ProfileScores(profile_collection)
+
+leaderboard_collection = db['leaderboard']
+leaderboard_meta_collection = db['leaderboard_meta']
+
+# Leaderboard read model, kept current by submit_solution
+leaderboard = Leaderboard(leaderboard_collection, leaderboard_meta_collection)
+
+# Stored working_driver outputs, keyed by question version
+reference_outputs = ReferenceOutputStore(reference_outputs_collection)
+test_runtimes_collection = db['test_runtimes']
+
+# Average wall time of each test case, used to run cheap test cases first
+runtime_stats = RuntimeStats(test_runtimes_collection)
+datasets_collection = db['datasets']
+
+# Large pandas test inputs, stored as Arrow files and referenced by hash
+dataset_store = DatasetStore(datasets_collection)
 
 # Initialize profile collection
 # profile_collection = db['profiles']
@@ -98,8 +143,29 @@ async def lifespan(app: FastAPI):
         print(f"Failed to connect to MongoDB: {e}")
         raise
 
+    await best_scores.ensure_indexes()
+    await reference_outputs.ensure_indexes()
+    # Backs best_submissions: a user's successful submissions per question, best first
+    await submissions_collection.create_index([
+        ("candidate_id", ASCENDING),
+        ("status", ASCENDING),
+        ("question_id", ASCENDING),
+        ("score", DESCENDING)
+    ])
+    await module_scores.start()
+    await profile_scores.start()
+    await leaderboard.ensure_indexes()
+
     # Start cleanup task
     cleanup_task = asyncio.create_task(cleanup_unverified_users())
+
+    if remote_judges.enabled:
+        # Judge workers build their own images and run the containers
+        remote_judges.start()
+    else:
+        # Build or verify executor images, then start warming containers from them
+        await executor_images.ensure_images()
+        executor_pool.start()
     
     yield  # Server is running
     
@@ -109,6 +175,12 @@ async def lifespan(app: FastAPI):
         await cleanup_task
     except asyncio.CancelledError:
         pass
+    if remote_judges.enabled:
+        await remote_judges.stop()
+    else:
+        await executor_pool.stop()
+    await module_scores.stop()
+    await profile_scores.stop()
     print("Shutting down application")
 
 # Initialize FastAPI app with lifespan
@@ -343,6 +415,7 @@ async def signup(request: Request, user: UserSignup):
             "contribution_data": []
         }
         await profile_collection.insert_one(profile_data)
+        profile_scores.set(profile_data["user_id"], 0)
 
         # Send OTP email
         try:
@@ -552,6 +625,8 @@ async def create_question(question: Question):
         result = await questions_collection.insert_one(question_dict)
         if result.inserted_id:
             created_question = await questions_collection.find_one({'_id': result.inserted_id})
+            # Run the working driver once now instead of on every submission
+            reference_outputs.refresh_in_background(created_question)
             return serialize_question(created_question)
         else:
             raise HTTPException(status_code=500, detail="Failed to create question")
@@ -647,6 +722,10 @@ async def update_question(question_id: str, question: Question):
         if result.modified_count:
             updated_question = await questions_collection.find_one({'_id': ObjectId(question_id)})
             if updated_question:
+                # A changed driver or changed test inputs give a new version; outputs of
+                # the old one are removed once the new ones are stored
+                reference_outputs.refresh_in_background(updated_question)
+                judge_cache.invalidate(question_id)
                 return serialize_question(updated_question)
             else:
                 raise HTTPException(status_code=404, detail="Question not found after update")
@@ -661,6 +740,8 @@ async def delete_question(question_id: str):
     try:
         result = await questions_collection.delete_one({'_id': ObjectId(question_id)})
         if result.deleted_count:
+            await reference_outputs.delete(question_id)
+            judge_cache.invalidate(question_id)
             return {"message": "Question deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Question not found")
@@ -735,6 +816,29 @@ async def get_question(question_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def summarize_usage(results: List[dict]) -> dict:
+    """Total wall and CPU time and the highest peak memory over the test cases that ran"""
+    measured = [result for result in results if result.get('wall_time') is not None]
+    if not measured:
+        return {"execution_time": None, "cpu_time": None, "memory_used": None}
+    return {
+        "execution_time": round(sum(result['wall_time'] for result in measured), 4),
+        "cpu_time": round(sum(result.get('cpu_time') or 0 for result in measured), 4),
+        "memory_used": max(result.get('peak_memory_mb') or 0 for result in measured)
+    }
+
+def collect_debug_output(results: List[dict], test_cases: List[dict]) -> str:
+    """Debug output of the visible test cases, labelled by test case and capped at DEBUG_OUTPUT_LIMIT"""
+    sections = []
+    for number, (result, test_case) in enumerate(zip(results, test_cases), 1):
+        output = result.pop('debug_output', None)
+        if output and not test_case.get('is_hidden', False):
+            sections.append(f"--- Test case {number} ---\n{output.rstrip()}")
+    debug_output = "\n".join(sections)
+    if len(debug_output) > DEBUG_OUTPUT_LIMIT:
+        debug_output = debug_output[:DEBUG_OUTPUT_LIMIT] + "\n... (truncated)"
+    return debug_output
+
 @app.post("/api/execute-code", dependencies=[Depends(require_user)])
 async def execute_code(execution_request: CodeExecutionRequest, authorization: str = Header(None)):
     try:
@@ -774,145 +878,197 @@ async def execute_code(execution_request: CodeExecutionRequest, authorization: s
         input_data = {
             'code': execution_request.code,
             'test_cases': test_cases,
-            'working_driver': question.get('working_driver', '')  # Include working code solution
+            'working_driver': question.get('working_driver', ''),  # Include working code solution
+            'comparison': question.get('comparison') or {}
         }
 
-        # Choose the appropriate docker executor based on docker_runner
-        if docker_runner == "pandas":
-            executor_dir = Path(__file__).parent / 'pandas-executor'
-            docker_image = 'pandas-executor'
-        elif docker_runner == "only_python":
-            executor_dir = Path(__file__).parent / 'code-executor'
-            docker_image = 'code-executor'
+        # A Run only executes the test cases the user can see; submissions run all of them
+        judged = list(range(len(test_cases)))
+        if not execution_request.is_submission:
+            judged = [i for i in judged if not test_cases[i].get('is_hidden', False)]
+            if not judged:
+                return {
+                    "status": "success",
+                    "results": [],
+                    "score": 0,
+                    "test_cases_passed": 0,
+                    "total_test_cases": 0,
+                    "is_submission": False,
+                    "debug_output": "",
+                    "cached": False
+                }
+        # The question's own test cases, for runtimes and debug output
+        run_test_cases = [test_cases[i] for i in judged]
+        input_data['test_cases'] = run_test_cases
+
+        # Compare against stored working_driver outputs when they match this version of the
+        # question, unless the job may go to a judge worker that cannot read them
+        reference = await reference_outputs.lookup(question)
+        if reference_outputs.usable(reference):
+            if judge_scheduler.shares_dataset_store(docker_runner):
+                attached = reference_outputs.attach(test_cases, reference)
+                input_data['test_cases'] = [attached[i] for i in judged]
+                input_data['reference_format'] = reference['reference_format']
         else:
+            reference_outputs.refresh_in_background(question, reference)
+
+        # Fail-fast submissions run the historically cheapest test cases first and
+        # stop after `fail_fast` failures; results are put back in question order.
+        # Runtimes are only measured and used for submissions, never for a Run
+        runtimes = await runtime_stats.load(execution_request.question_id) if execution_request.is_submission else {}
+        run_order = list(range(len(input_data['test_cases'])))
+        fail_fast = question.get('fail_fast', 0) if execution_request.is_submission else 0
+        if fail_fast:
+            run_order = runtime_stats.cheapest_first(run_test_cases, runtimes)
+            input_data['fail_fast'] = fail_fast
+        input_data['test_cases'] = [input_data['test_cases'][i] for i in run_order]
+
+        # Choose the appropriate docker executor based on docker_runner
+        executor_config = executor_pool.get_config(docker_runner)
+        if not executor_config:
             raise HTTPException(status_code=400, detail=f"Unsupported docker runner: {docker_runner}")
 
-        if not executor_dir.exists():
+        if not executor_config.executor_dir.exists():
             raise HTTPException(status_code=500, detail=f"{docker_runner} executor not found")
 
-        try:
-            # Build the Docker image if it doesn't exist
-            build_process = subprocess.run(
-                ['docker', 'build', '-t', docker_image, str(executor_dir)],
-                capture_output=True,
-                encoding='utf-8',
-                errors='replace'
-            )
-            
-            if build_process.returncode != 0:
-                raise HTTPException(status_code=500, detail=f"Failed to build {docker_image} Docker image")
+        # Images are built once at startup, not per request; with remote judge
+        # workers at least one of them must have the image ready
+        if not judge_scheduler.is_ready(docker_runner):
+            raise HTTPException(status_code=503, detail=f"{executor_config.image} Docker image is not available")
 
-            # Convert input data to JSON string and encode to bytes
-            input_json = json.dumps(input_data)
-            input_bytes = input_json.encode('utf-8') + b'\n'
+        # Per test case limits are enforced by the executor; the job as a whole
+        # gets the time its test cases may take
+        input_data['limits'] = executor_config.limits()
+        job_timeout = executor_config.job_timeout(len(input_data['test_cases']))
 
-            # Run the code in Docker container with volume mount for debug log
-            debug_log_dir = executor_dir / 'debug_logs'
-            debug_log_dir.mkdir(exist_ok=True)
-            debug_log_file = debug_log_dir / 'debug.log'
-            
-            # Clear previous debug log
-            debug_log_file.write_text('')
-            
-            process = subprocess.Popen(
-                ['docker', 'run', '--rm', '-i', '--network=none', '--memory=512m', '--cpus=1',
-                 '-v', f'{str(debug_log_file)}:/tmp/debug.log',
-                 docker_image],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=False
-            )
+        # Unchanged code on an unchanged question gives the same results
+        cache_key = judge_cache.key(
+            execution_request.code, question, execution_request.is_submission, input_data['limits']
+        )
+        cached = judge_cache.get(cache_key)
+
+        try:
+            if cached:
+                results = {'results': cached['results']}
+                debug_output = cached['debug_output']
+            else:
+                # Convert input data to JSON string and encode to bytes
+                input_json = json.dumps(input_data)
+                input_bytes = input_json.encode('utf-8') + b'\n'
+
+                # Wait for a judge slot, then run the job in an already started container;
+                # the container is killed if the job times out or the request is cancelled
+                try:
+                    returncode, stdout, stderr = await judge_scheduler.run(
+                        docker_runner, input_bytes, timeout=job_timeout
+                    )
+                except JudgeQueueFull as e:
+                    raise HTTPException(
+                        status_code=503,
+                        detail="The judge is busy. Please try again shortly.",
+                        headers={"Retry-After": str(e.retry_after)}
+                    )
+                except ExecutionTimeout:
+                    raise HTTPException(status_code=408, detail="Code execution timed out")
 
-            try:
-                # Send input and get output with proper encoding
-                stdout, stderr = process.communicate(input=input_bytes, timeout=25)
-                
                 # Check return code
-                if process.returncode != 0:
+                if returncode != 0:
                     error_message = stderr.decode('utf-8', errors='replace')
                     raise HTTPException(status_code=500, detail=f"Code execution failed: {error_message}")
 
                 # Parse output with proper decoding
                 output_str = stdout.decode('utf-8', errors='replace').strip()
-                
-                # Read debug log
-                debug_output = debug_log_file.read_text() if debug_log_file.exists() else ""
-                
+
                 try:
                     results = json.loads(output_str)
                 except json.JSONDecodeError:
                     raise HTTPException(status_code=500, detail="Failed to parse execution results")
 
-                # Calculate score based on test cases passed
-                total_test_cases = len(test_cases)
-                test_cases_passed = sum(1 for result in results['results'] if result.get('passed', False))
-                score = int((test_cases_passed / total_test_cases) * question.get('points', 0))
-
-                # If this is a submission, record it
-                if execution_request.is_submission:
-                    print(f"Recording submission with score: {score}")  # Debug log
-                    submission = Submission(
-                        candidate_id=user_id,
-                        question_id=execution_request.question_id,
-                        code_solve=execution_request.code,
-                        score=score,
-                        status="success" if test_cases_passed > 0 else "failed",
-                        test_cases_passed=test_cases_passed,
-                        total_test_cases=total_test_cases
-                    )
-                    await submit_solution(submission)
-
-                # Filter results based on submission type
-                if not execution_request.is_submission:
-                    visible_results = [
-                        result for i, result in enumerate(results['results'])
-                        if not test_cases[i].get('is_hidden', False)
-                    ]
-                else:
-                    visible_results = results['results']
-
-                # If the submission is successful and it's a final submission
-                if execution_request.is_submission and test_cases_passed == total_test_cases:
-                    # Calculate points earned
-                    points_earned = question.get("points", 0)
-                    # Update user's total score
-                    new_score = user.get("total_score", 0) + points_earned
-                    await candidate_collection.update_one(
-                        {"_id": user["_id"]},
-                        {"$set": {"total_score": new_score}}
-                    )
-                # Send challenge completed email
-                try:
-                    email_sent = await email_service.send_challenge_completed_email(
-                        to_email=token_data["email"],
-                        name=user.get("firstName") or user.get("lastName"),
-                            challenge_title=question.get("title", "Unknown Challenge"),
-                            points=points_earned,
-                        total_score=new_score
+                # A job level error comes back as a single result and is left as it is
+                debug_output = ""
+                if len(results['results']) == len(run_order):
+                    results['results'] = runtime_stats.in_question_order(results['results'], run_order)
+                    if execution_request.is_submission:
+                        await runtime_stats.record(execution_request.question_id, run_test_cases, results['results'], runtimes)
+                    # Debug output comes back with each result instead of through a shared file
+                    debug_output = collect_debug_output(results['results'], run_test_cases)
+
+                # Wall time depends on the load of the host, so a timed out run is not reused
+                if not any(result.get('limit_exceeded') == 'time' for result in results['results']):
+                    judge_cache.put(
+                        cache_key,
+                        execution_request.question_id,
+                        {'results': results['results'], 'debug_output': debug_output}
                     )
-                    if not email_sent:
-                        print(f"Failed to send challenge completion email to {token_data['email']}")
-                except Exception as e:
-                    print(f"Error sending challenge completion email: {str(e)}")
 
-                return {
-                    "status": "success",
-                    "results": visible_results,
-                    "score": score,
-                    "test_cases_passed": test_cases_passed,
-                    "total_test_cases": total_test_cases,
-                    "is_submission": execution_request.is_submission,
-                    "debug_output": debug_output
-                }
+            # Calculate score based on the test cases that were run; skipped ones count as failed
+            total_test_cases = len(run_test_cases)
+            test_cases_passed = sum(1 for result in results['results'] if result.get('passed', False))
+            score = int((test_cases_passed / total_test_cases) * question.get('points', 0))
+            usage = summarize_usage(results['results'])
+
+            # If this is a submission, record it
+            if execution_request.is_submission:
+                print(f"Recording submission with score: {score}")  # Debug log
+                # A cache hit measured nothing; its usage belongs to the submission that ran
+                recorded_usage = summarize_usage([]) if cached else usage
+                submission = Submission(
+                    candidate_id=user_id,
+                    question_id=execution_request.question_id,
+                    code_solve=execution_request.code,
+                    score=score,
+                    status="success" if test_cases_passed > 0 else "failed",
+                    test_cases_passed=test_cases_passed,
+                    total_test_cases=total_test_cases,
+                    execution_time=recorded_usage["execution_time"],
+                    cpu_time=recorded_usage["cpu_time"],
+                    memory_used=recorded_usage["memory_used"]
+                )
+                await submit_solution(submission)
+
+            # A Run only executed visible test cases, so all of its results can be shown
+            visible_results = results['results']
+
+            # If the submission is successful and it's a final submission
+            if execution_request.is_submission and test_cases_passed == total_test_cases:
+                # Calculate points earned
+                points_earned = question.get("points", 0)
+                # Update user's total score
+                new_score = user.get("total_score", 0) + points_earned
+                await candidate_collection.update_one(
+                    {"_id": user["_id"]},
+                    {"$set": {"total_score": new_score}}
+                )
+            # Send challenge completed email
+            try:
+                email_sent = await email_service.send_challenge_completed_email(
+                    to_email=token_data["email"],
+                    name=user.get("firstName") or user.get("lastName"),
+                        challenge_title=question.get("title", "Unknown Challenge"),
+                        points=points_earned,
+                    total_score=new_score
+                )
+                if not email_sent:
+                    print(f"Failed to send challenge completion email to {token_data['email']}")
+            except Exception as e:
+                print(f"Error sending challenge completion email: {str(e)}")
 
-            except subprocess.TimeoutExpired:
-                process.kill()
-                raise HTTPException(status_code=408, detail="Code execution timed out")
+            return {
+                "status": "success",
+                "results": visible_results,
+                "score": score,
+                "test_cases_passed": test_cases_passed,
+                "total_test_cases": total_test_cases,
+                "is_submission": execution_request.is_submission,
+                "execution_time": usage["execution_time"],
+                "cpu_time": usage["cpu_time"],
+                "memory_used": usage["memory_used"],
+                "debug_output": debug_output,
+                "cached": bool(cached)
+            }
 
-        except subprocess.CalledProcessError as e:
-            error_message = e.stderr.decode('utf-8', errors='replace') if e.stderr else str(e)
-            raise HTTPException(status_code=500, detail=f"Docker execution failed: {error_message}")
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
@@ -1081,21 +1237,16 @@ async def get_user_progress(candidate_id: str, authorization: str = Header(None)
         progress["user_id"] = str(progress["user_id"])
         progress["question_ids"] = [str(q_id) for q_id in progress.get("question_ids", [])]
 
-        # Get submission details for each question
-        submissions_by_question = {}
-        for question_id in progress["question_ids"]:
-            cursor = submissions_collection.find({
-                "candidate_id": ObjectId(candidate_id),
-                "question_id": ObjectId(question_id),
-                "status": "success"
-            }).sort("score", -1).limit(1)
-            
-            best_submission = await cursor.to_list(length=1)
-            if best_submission:
-                submissions_by_question[question_id] = {
-                    "score": best_submission[0].get("score", 0),
-                    "submitted_at": best_submission[0].get("submitted_at")
-                }
+        # Get the best submission for every question in one aggregation
+        best = await best_submissions(submissions_collection, ObjectId(candidate_id), progress["question_ids"])
+        submissions_by_question = {
+            question_id: {
+                "score": best[question_id].get("score", 0),
+                "submitted_at": best[question_id].get("submitted_at")
+            }
+            for question_id in progress["question_ids"]
+            if question_id in best
+        }
 
         progress["submissions"] = submissions_by_question
         return progress
@@ -1134,44 +1285,12 @@ async def get_submissions(candidate_id: str, question_id: str, authorization: st
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/leaderboard", dependencies=[Depends(require_user)])
-async def get_leaderboard(page: int = 1, limit: int = 10):
+async def get_leaderboard(page: int = 1, limit: int = 10, cursor: Optional[str] = None):
+    """Leaderboard page by page number, or after `cursor` (the `next_cursor` of the previous page)"""
     try:
-        # Calculate skip value for pagination
-        skip = (page - 1) * limit
-        
-        # Get total count of users with progress
-        total_users = await user_progress_collection.count_documents({})
-        
-        # Get top users by total score with pagination
-        cursor = user_progress_collection.find(
-            {},
-            {"user_id": 1, "total_score": 1, "question_ids": 1}
-        ).sort("total_score", -1).skip(skip).limit(limit)
-        
-        leaderboard = await cursor.to_list(length=None)
-
-        # Get user details for each user in leaderboard
-        result = []
-        for entry in leaderboard:
-            user = await candidate_collection.find_one(
-                {"_id": entry["user_id"]},
-                {"firstName": 1, "lastName": 1}
-            )
-            if user:
-                result.append({
-                    "user_id": str(entry["user_id"]),
-                    "user_name": f"{user.get('firstName', '')} {user.get('lastName', '')}".strip(),
-                    "total_score": entry.get("total_score", 0),
-                    "questions_solved": len(entry.get("question_ids", [])),
-                })
-
-        return {
-            "rankings": result,
-            "total_users": total_users,
-            "page": page,
-            "total_pages": (total_users + limit - 1) // limit
-        }
-
+        return await leaderboard.page(page=page, limit=min(limit, 100), cursor=cursor)
+    except LeaderboardCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error in get_leaderboard: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1309,30 +1428,21 @@ async def get_user_performance(user_id: str, authorization: str = Header(None)):
                 "questions": []
             }
 
-        # Get all solved questions with their details
+        # Get all solved questions with their details and best submission in one aggregation
+        best = await best_submissions(submissions_collection, ObjectId(user_id), progress.get("question_ids", []), with_questions=True)
         questions = []
         for question_id in progress.get("question_ids", []):
-            # Get question details
-            question = await questions_collection.find_one({"_id": question_id})
-            if not question:
+            submission = best.get(str(question_id))
+            if not submission:
                 continue
-
-            # Get best submission for this question
-            cursor = submissions_collection.find({
-                "candidate_id": ObjectId(user_id),
-                "question_id": question_id,
-                "status": "success"
-            }).sort("score", -1).limit(1)
-            
-            best_submission = await cursor.to_list(length=1)
-            if best_submission:
-                questions.append({
-                    "title": question.get("title", ""),
-                    "tags": question.get("category", []),
-                    "solved_at": best_submission[0].get("submitted_at"),
-                    "points_earned": best_submission[0].get("score", 0),
-                    "total_points": question.get("points", 0)
-                })
+            question = submission["question"]
+            questions.append({
+                "title": question.get("title", ""),
+                "tags": question.get("category", []),
+                "solved_at": submission.get("submitted_at"),
+                "points_earned": submission.get("score", 0),
+                "total_points": question.get("points", 0)
+            })
 
         return {
             "user_name": f"{user.get('firstName', '')} {user.get('lastName', '')}".strip(),
@@ -1538,85 +1648,47 @@ async def submit_solution(submission: Submission) -> dict:
         if submission.status == "success":
             print("Processing successful submission")  # Debug log
             
-            # Get all submissions for this question by this candidate
-            cursor = submissions_collection.find({
-                "candidate_id": ObjectId(submission.candidate_id),
-                "question_id": ObjectId(submission.question_id),
-                "status": "success"
-            })
-            submissions = await cursor.to_list(length=None)
-            print(f"Found {len(submissions)} previous submissions")  # Debug log
-            
-            # Calculate max score for this question
-            max_score = max([s.get("score", 0) for s in submissions])
-            print(f"Max score for this question: {max_score}")  # Debug log
+            # Fold the score into the user's best score for this question; the
+            # ledger returns by how much that best score improved
+            change = await best_scores.record(submission.candidate_id, submission.question_id, submission.score)
+            print(f"Best score for this question: {change.best} (was {change.previous})")  # Debug log
             
-            # Update user progress
-            user_progress = await user_progress_collection.find_one({
-                "user_id": ObjectId(submission.candidate_id)  # Using candidate_id as user_id
-            })
-            
-            if not user_progress:
-                print("Creating new user progress")  # Debug log
-                # Create new progress document
-                user_progress = {
-                    "user_id": ObjectId(submission.candidate_id),  # Using candidate_id as user_id
-                    "question_ids": [],
-                    "total_score": 0,
-                    "last_submission": submission.submitted_at
-                }
-            
-            # Add question to solved list if not already present
-            question_id_str = str(submission.question_id)
-            if question_id_str not in [str(q_id) for q_id in user_progress.get("question_ids", [])]:
-                print(f"Adding new question {question_id_str} to solved list")  # Debug log
-                user_progress["question_ids"].append(ObjectId(submission.question_id))
-            
-            # Calculate total score by getting the best score for each unique question
-            pipeline = [
-                {
-                    "$match": {
-                        "candidate_id": ObjectId(submission.candidate_id),
-                        "status": "success"
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": "$question_id",
-                        "max_score": {"$max": "$score"}
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": None,
-                        "total_score": {"$sum": "$max_score"}
-                    }
-                }
-            ]
+            # Change the progress by the improvement only, instead of re-aggregating all submissions
+            progress_update = {"$set": {"last_submission": submission.submitted_at}}
+            if change.delta:
+                progress_update["$inc"] = {"total_score": change.delta}
+            if change.first_solve:
+                progress_update["$addToSet"] = {"question_ids": ObjectId(submission.question_id)}
             
-            aggregation_result = await submissions_collection.aggregate(pipeline).to_list(length=1)
-            total_score = aggregation_result[0]["total_score"] if aggregation_result else 0
-            
-            print(f"Total score calculated: {total_score}")  # Debug log
-            
-            # Update progress
-            user_progress["total_score"] = total_score
-            user_progress["last_submission"] = submission.submitted_at
-            
-            print(f"Updating user progress: {user_progress}")  # Debug log
-            
-            # Update or insert user progress
             update_result = await user_progress_collection.update_one(
                 {"user_id": ObjectId(submission.candidate_id)},  # Using candidate_id as user_id
-                {"$set": user_progress},
+                progress_update,
                 upsert=True
             )
             print(f"User progress updated: {update_result.modified_count} documents modified")
 
-            # Update user profile stats
+            # Keep the leaderboard entry in step with the progress document
+            if change.delta or change.first_solve:
+                candidate = await candidate_collection.find_one(
+                    {"_id": ObjectId(submission.candidate_id)}, {"firstName": 1, "lastName": 1}
+                ) or {}
+                await leaderboard.record(
+                    submission.candidate_id,
+                    f"{candidate.get('firstName', '')} {candidate.get('lastName', '')}".strip(),
+                    change.delta,
+                    change.first_solve
+                )
+
+            # The module score is the sum of best scores, so it changes by the same delta
+            if change.delta:
+                question = await questions_collection.find_one(
+                    {"_id": ObjectId(submission.question_id)}, {"Q_type": 1}
+                )
+                if question and question.get("Q_type"):
+                    await module_scores.add(question["Q_type"], submission.candidate_id, change.delta)
+
+            # Update user profile stats, including the per-module percentiles
             await update_user_profile_stats(str(submission.candidate_id))
-            # Update per-module percentiles
-            await update_user_module_percentiles(str(submission.candidate_id))
 
         return {
             "status": "success",
@@ -1653,6 +1725,13 @@ def bucket_top_percentage(top_percentage: float) -> str:
     else:
         return top_percentage
 
+def top_percentage_of(profile: dict) -> str:
+    """Bucketed top percentage of a profile's total score among all profiles"""
+    user_score = profile.get("total_score", 0)
+    # Keep the index in step with what was just read
+    profile_scores.set(profile["user_id"], user_score)
+    return bucket_top_percentage(profile_scores.top_percentage(user_score))
+
 @app.get("/api/profiles/{user_id}", dependencies=[Depends(require_user)])
 async def get_profile(user_id: str):
     profile = await profile_collection.find_one({"user_id": user_id})
@@ -1664,15 +1743,9 @@ async def get_profile(user_id: str):
     social_links = profile.get("social_links", {})
     profile["linkedin_url"] = social_links.get("linkedin", "")
     profile["website_url"] = social_links.get("portfolio", "")
-    # Calculate top_percentage (same as private profile)
+    # Calculate top_percentage from the profile score index
     try:
-        all_profiles = await profile_collection.find({}, {"total_score": 1, "user_id": 1}).to_list(length=None)
-        scores = sorted([p.get("total_score", 0) for p in all_profiles], reverse=True)
-        user_score = profile.get("total_score", 0)
-        user_rank = scores.index(user_score) + 1 if user_score in scores else len(scores)
-        total_users = len(scores)
-        top_percentage = round((user_rank / total_users) * 100, 2) if total_users > 0 else 100.0
-        profile["top_percentage"] = bucket_top_percentage(top_percentage)
+        profile["top_percentage"] = top_percentage_of(profile)
     except Exception as e:
         profile["top_percentage"] = "Top 100%"
     # After fetching profile ...
@@ -1760,6 +1833,8 @@ async def update_private_profile(
             {"$set": profile_data},
             upsert=True
         )
+        # The update may create the profile and always rewrites its total score
+        profile_scores.set(user_id, total_score)
         # Return updated profile
         updated_profile = await profile_collection.find_one({"user_id": user_id})
         if updated_profile and "_id" in updated_profile:
@@ -1841,45 +1916,22 @@ async def update_user_profile_stats(user_id: str):
         {"$set": profile_data},
         upsert=True
     )
+    profile_scores.set(user_id, total_score)
     # Update per-module percentiles
     await update_user_module_percentiles(user_id)
 
 async def update_user_module_percentiles(user_id: str):
-    modules = await modules_collection.find({}).to_list(length=None)
+    modules = await modules_collection.find({}, {"name": 1}).to_list(length=None)
     module_names = [m['name'] for m in modules]
     module_percentiles = {}
 
+    # Module scores are read from the persisted index; percentiles are O(log n) lookups
+    user_scores = await module_scores.scores_of(user_id)
+    total_users = await profile_collection.estimated_document_count()
+
     for module in module_names:
-        # Get all users' scores for this module
-        user_scores = []
-        async for user in profile_collection.find({}):
-            uid = user.get('user_id')
-            # Aggregate user's score for this module
-            pipeline = [
-                {"$match": {"candidate_id": ObjectId(uid), "status": "success"}},
-                {"$lookup": {
-                    "from": "Q_bank",
-                    "localField": "question_id",
-                    "foreignField": "_id",
-                    "as": "question"
-                }},
-                {"$unwind": "$question"},
-                {"$match": {"question.Q_type": module}},
-                {"$group": {"_id": None, "score": {"$sum": "$score"}}}
-            ]
-            agg = await submissions_collection.aggregate(pipeline).to_list(length=None)
-            score = agg[0]['score'] if agg else 0
-            user_scores.append((uid, score))
-
-        # Now, for each user, calculate ranking percentile
-        total_users = len(user_scores)
-        user_score = 0
-        for uid, score in user_scores:
-            if uid == user_id:
-                user_score = score
-                break
-        lower_count = sum(1 for _, s in user_scores if s < user_score)
-        percentile = 100 - (lower_count / total_users) * 100 if total_users > 0 else 100.0
+        user_score = user_scores.get(module, 0)
+        percentile = module_scores.percentile(module, user_score, total_users)
         # Always include all modules
         module_percentiles[module] = {
             'score': user_score,
@@ -1908,15 +1960,9 @@ async def get_private_profile(authorization: str = Header(None)):
     profile["linkedin_url"] = social_links.get("linkedin", "")
     profile["website_url"] = social_links.get("portfolio", "")
 
-    # Calculate top_percentage
+    # Calculate top_percentage from the profile score index
     try:
-        all_profiles = await profile_collection.find({}, {"total_score": 1, "user_id": 1}).to_list(length=None)
-        scores = sorted([p.get("total_score", 0) for p in all_profiles], reverse=True)
-        user_score = profile.get("total_score", 0)
-        user_rank = scores.index(user_score) + 1 if user_score in scores else len(scores)
-        total_users = len(scores)
-        top_percentage = round((user_rank / total_users) * 100, 2) if total_users > 0 else 100.0
-        profile["top_percentage"] = bucket_top_percentage(top_percentage)
+        profile["top_percentage"] = top_percentage_of(profile)
     except Exception as e:
         profile["top_percentage"] = "Top 100%"
     # After fetching profile ...
@@ -1952,6 +1998,51 @@ async def delete_module(module_id: str):
     await modules_collection.delete_one({"_id": ObjectId(module_id)})
     return {"id": module_id, "status": "deleted"}
 
+@app.get("/api/admin/executor-images", dependencies=[Depends(require_admin)])
+async def get_executor_images():
+    """Current executor images with their content hashes and digests"""
+    return executor_images.status()
+
+@app.get("/api/admin/judge/metrics", dependencies=[Depends(require_admin)])
+async def get_judge_metrics():
+    """Slots, queue depth and queue/run time percentiles per docker runner"""
+    return judge_scheduler.metrics()
+
+@app.get("/api/admin/judge/cache", dependencies=[Depends(require_admin)])
+async def get_judge_cache():
+    """Size and hit rate of the judge result cache"""
+    return judge_cache.metrics()
+
+@app.get("/api/admin/judge/workers", dependencies=[Depends(require_admin)])
+async def get_judge_workers():
+    """Health and load of the remote judge workers, if any are configured"""
+    return remote_judges.status()
+
+@app.post("/api/admin/datasets", dependencies=[Depends(require_admin)])
+async def upload_dataset(file: UploadFile = File(...)):
+    try:
+        data = await file.read()
+        dataset = await dataset_store.add(data, filename=file.filename)
+        return {
+            "message": "Dataset uploaded",
+            "hash": dataset["_id"],
+            "rows": dataset["rows"],
+            "columns": dataset["columns"],
+            "size": dataset["size"]
+        }
+    except DatasetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error uploading dataset: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/admin/datasets", dependencies=[Depends(require_admin)])
+async def list_datasets():
+    datasets = await dataset_store.list()
+    for dataset in datasets:
+        dataset["hash"] = dataset.pop("_id")
+    return datasets
+
 @app.get("/api/admin/questions", dependencies=[Depends(require_admin)])
 async def get_admin_questions():
     try:
@@ -31,8 +31,9 @@ class Submission(BaseModel):
     score: int = 0
     submitted_at: datetime = Field(default_factory=datetime.utcnow)
     status: str = "pending"  # pending, success, failed
-    execution_time: Optional[float] = None
-    memory_used: Optional[float] = None
+    execution_time: Optional[float] = None  # Wall time of all test cases, seconds
+    cpu_time: Optional[float] = None  # CPU time of all test cases, seconds
+    memory_used: Optional[float] = None  # Highest peak RSS of a test case, MB
     test_cases_passed: Optional[int] = None
     total_test_cases: Optional[int] = None
 
@@ -148,6 +149,13 @@ class TestCase(BaseModel):
     is_hidden: bool = False
     order: int
     points: int = 0
+    dtypes: Optional[Dict[str, str]] = None  # Column dtypes applied to a pandas test input
+    dataset: Optional[str] = None  # Hash of a stored dataset used as the pandas test input instead of `input`
+
+class ComparisonOptions(BaseModel):
+    rtol: float = 0.0  # Relative tolerance for numeric values
+    atol: float = 0.0  # Absolute tolerance for numeric values
+    check_dtype: bool = False  # Also require matching dtypes (int64 vs float64)
 
 class Example(BaseModel):
     input: str
@@ -180,6 +188,8 @@ class Question(BaseModel):
     images: List[ImageData] = []
     Q_type: str = "pandas"  # Module type: pandas, sklearn, ai
     working_driver: str = ""  # Working code solution
+    fail_fast: int = 0  # Stop a submission after this many failed test cases (0 runs all of them)
+    comparison: ComparisonOptions = ComparisonOptions()  # How pandas results are compared with the working driver
 
 class QuestionCreate(Question):
     pass
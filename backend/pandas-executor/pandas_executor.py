@@ -1,26 +1,62 @@
 import sys
+import ast
 import json
 import pandas as pd
 import numpy as np
 import io
+import base64
+import pickle
+import hashlib
 from contextlib import redirect_stdout
 import traceback
 import signal
 import time
-import psutil
+import math
 import os
+import gc
+import random
+import select
+import resource
+import warnings
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
 
 # Constants
-EXECUTION_TIMEOUT = 25  # seconds
-MAX_MEMORY_USAGE = 512  # MB
+# Default per test case limits; a job may set its own in `limits`
+TEST_TIME_LIMIT = 10  # seconds of wall time
+TEST_CPU_LIMIT = 10  # seconds of CPU time
+TEST_MEMORY_LIMIT = 256  # MB of address space on top of the preloaded executor
+# Version of the encoded reference outputs this executor can read
+REFERENCE_FORMAT = 3
+# Results with more cells than this are shown in pandas' truncated form
+DISPLAY_CELLS = 1000
+# Test inputs at least this long are stored encoded next to the reference outputs
+BULK_INPUT_CHARS = 10000
+# Printed output kept per test case and sent back with its result
+DEBUG_OUTPUT_LIMIT = 16 * 1024  # characters
+# Read-only mount of the content-addressed dataset store
+DATASET_DIR = os.getenv('EXECUTOR_DATASET_DIR', '/datasets')
+DATASET_HASH_LENGTH = 64
+# Stored reference outputs and encoded inputs, named by the sha256 of their content
+REFERENCE_DIR = os.path.join(DATASET_DIR, 'references')
+# Run every test case in a forked copy of this process (copy-on-write, pandas already imported)
+FORK_TEST_CASES = hasattr(os, 'fork') and os.getenv('EXECUTOR_FORK', '1') == '1'
+# How many test cases of a job run at the same time, each in its own child
+PARALLELISM = max(1, int(os.getenv('EXECUTOR_PARALLELISM', '1')))
+# pandas 3 (and pandas 2 with the option set) copies a column only when it is
+# written to, so a shallow copy is a private, lazily copied view of the input
+PANDAS_MAJOR = int(pd.__version__.split('.')[0])
+COPY_ON_WRITE = PANDAS_MAJOR >= 3 or (PANDAS_MAJOR == 2 and pd.options.mode.copy_on_write is True)
+# Upper bound of the descriptors a forked test case closes
+MAX_FD = os.sysconf('SC_OPEN_MAX') if hasattr(os, 'sysconf') else 1024
 
 
-class TimeoutError(Exception):
-    pass
-
-
-def timeout_handler(signum, frame):
-    raise TimeoutError("Execution time limit reached")
+# Limits of the test case running in this (forked) process, and whether one was hit
+ACTIVE_LIMITS = {}
+LIMIT_EXCEEDED = None
 
 
 def format_output(passed: bool, error: str=None, output: str=None, expected: str=None, execution_time: float=None) -> dict:
@@ -34,15 +70,24 @@ def format_output(passed: bool, error: str=None, output: str=None, expected: str
     }
 
 
+def with_debug_output(result: dict, printed: str) -> dict:
+    """Attach what the user code printed to its result, cut to DEBUG_OUTPUT_LIMIT characters"""
+    if printed:
+        if len(printed) > DEBUG_OUTPUT_LIMIT:
+            printed = printed[:DEBUG_OUTPUT_LIMIT] + f"\n... ({len(printed) - DEBUG_OUTPUT_LIMIT} more characters)"
+        result['debug_output'] = printed
+    return result
+
+
 def format_result_for_comparison(result) -> tuple[str, any]:
-    """Convert any result type to a comparable string format"""
+    """Tag a result with its kind; pandas and numpy results are kept as native objects"""
     try:
         if isinstance(result, pd.DataFrame):
-            return 'dataframe', result.to_dict('list')
+            return 'dataframe', result
         elif isinstance(result, pd.Series):
-            return 'series', result.to_dict()
+            return 'series', result
         elif isinstance(result, np.ndarray):
-            return 'ndarray', result.tolist()
+            return 'ndarray', result
         elif isinstance(result, (list, dict, str, int, float, bool)):
             return 'basic', result
         elif result is None:
@@ -53,27 +98,48 @@ def format_result_for_comparison(result) -> tuple[str, any]:
         return 'error', f"Error formatting result: {str(e)}"
 
 
-def check_memory_usage():
-    """Check if memory usage exceeds the limit"""
-    process = psutil.Process(os.getpid())
-    memory_info = process.memory_info()
-    memory_usage_mb = memory_info.rss / 1024 / 1024  # Convert to MB
-    if memory_usage_mb > MAX_MEMORY_USAGE:
-        raise MemoryError(f"Memory usage ({memory_usage_mb:.2f}MB) exceeded limit of {MAX_MEMORY_USAGE}MB")
+def display_result(result_type: str, result) -> str:
+    """Text shown to the user for a result"""
+    if result_type == 'dataframe':
+        return str(result.to_dict('list')) if result.size <= DISPLAY_CELLS else str(result)
+    if result_type == 'series':
+        return str(result.to_dict()) if result.size <= DISPLAY_CELLS else str(result)
+    if result_type == 'ndarray':
+        return str(result.tolist()) if result.size <= DISPLAY_CELLS else str(result)
+    return str(result)
+
+
+def input_frame(test_input: 'DecodedInput', private: bool) -> pd.DataFrame:
+    """The input DataFrame handed to one run of a function.
 
+    The decoded input may be used again after this run: by the user code after
+    the driver, or by the next test case when test cases run in-process. With
+    copy-on-write a shallow copy keeps it intact for free. Otherwise it is copied,
+    unless the run is `private` (the last use in a forked child, whose writes the
+    kernel keeps to itself) and its data is writable. Memory-mapped datasets are
+    read-only, so code that changes them in place needs the copy.
+    """
+    if COPY_ON_WRITE:
+        return test_input.df.copy(deep=False)
+    if private and not test_input.read_only:
+        return test_input.df
+    return test_input.df.copy()
 
-def execute_function(code: str, function_name: str, test_input: str) -> tuple[tuple[str, any], str, float]:
-    """Execute a function and return its result"""
+
+def execute_function(compiled: 'CompiledCode', test_input: 'DecodedInput', private: bool=False) -> tuple[tuple[str, any], str, float, str]:
+    """Run the compiled code in a fresh namespace and call its function on the input.
+
+    Returns the formatted result, an error, the elapsed time and what the code printed.
+    """
+    global LIMIT_EXCEEDED
     start_time = time.time()
+    # Capture the output
+    output_buffer = io.StringIO()
     try:
-        # Set up timeout handler
-        signal.signal(signal.SIGALRM, timeout_handler)
-        signal.alarm(EXECUTION_TIMEOUT)
-        
-        # Convert input string to dictionary and create DataFrame
-        test_input = test_input.replace('nan', 'float("nan")')
-        input_dict = eval(test_input, {'float': float, 'nan': float('nan')})
-        df = pd.DataFrame(input_dict)
+        # The decoded input is shared by every run of the job; each run gets its own view
+        if test_input.error:
+            raise ValueError(test_input.error)
+        df = input_frame(test_input, private)
         
         # Create a namespace for execution
         namespace = {
@@ -82,90 +148,163 @@ def execute_function(code: str, function_name: str, test_input: str) -> tuple[tu
             'df': df
         }
         
-        # Execute the function definition
-        exec(code, namespace)
-        
-        # Capture the output
-        output_buffer = io.StringIO()
         with redirect_stdout(output_buffer):
+            # Execute the function definition
+            exec(compiled.code_object, namespace)
+
             try:
-                # Check memory before execution
-                check_memory_usage()
-                
-                # Call the function with the input DataFrame
-                result = namespace[function_name](df)
-                
-                # Check memory after execution
-                check_memory_usage()
+                # Call the function with the input DataFrame; time, CPU and memory
+                # limits are enforced on the whole test case process
+                result = namespace[compiled.function_name](df)
                 
                 # Convert result to comparable format
                 result_type, formatted_result = format_result_for_comparison(result)
                 
-                # Disable alarm
-                signal.alarm(0)
-                
-                return (result_type, formatted_result), None, time.time() - start_time
-            except TimeoutError:
-                signal.alarm(0)  # Disable alarm
-                return None, f"Execution time limit of {EXECUTION_TIMEOUT} seconds reached", time.time() - start_time
-            except MemoryError as e:
-                signal.alarm(0)  # Disable alarm
-                return None, str(e), time.time() - start_time
+                return (result_type, formatted_result), None, time.time() - start_time, output_buffer.getvalue()
+            except MemoryError:
+                LIMIT_EXCEEDED = 'memory'
+                return None, f"Memory limit of {ACTIVE_LIMITS.get('memory_mb')} MB exceeded", time.time() - start_time, output_buffer.getvalue()
             except Exception as e:
-                signal.alarm(0)  # Disable alarm
-                return None, f'Error executing function: {str(e)}', time.time() - start_time
+                return None, f'Error executing function: {str(e)}', time.time() - start_time, output_buffer.getvalue()
+    except MemoryError:
+        LIMIT_EXCEEDED = 'memory'
+        return None, f"Memory limit of {ACTIVE_LIMITS.get('memory_mb')} MB exceeded", time.time() - start_time, output_buffer.getvalue()
     except Exception as e:
-        signal.alarm(0)  # Disable alarm
-        return None, f'Error preparing input DataFrame: {str(e)}', time.time() - start_time
+        return None, f'Error preparing input DataFrame: {str(e)}', time.time() - start_time, output_buffer.getvalue()
+
+
+def comparison_options(options: dict) -> dict:
+    """Tolerances and dtype handling of a job, with the defaults filled in"""
+    options = options or {}
+    return {
+        'rtol': float(options.get('rtol') or 0.0),
+        'atol': float(options.get('atol') or 0.0),
+        'check_dtype': bool(options.get('check_dtype', False))
+    }
+
+
+def preview(values, limit: int=20) -> list:
+    values = list(values)
+    return values if len(values) <= limit else values[:limit] + ['...']
+
+
+def to_comparable(values) -> np.ndarray:
+    """1-d numpy view of a column, with nullable numeric types as float and NaN"""
+    if isinstance(values, pd.Series):
+        if pd.api.types.is_extension_array_dtype(values.dtype) and pd.api.types.is_numeric_dtype(values.dtype):
+            return values.to_numpy(dtype='float64', na_value=np.nan)
+        return values.to_numpy()
+    return np.asarray(values).ravel()
 
 
-def compare_results(type1: str, result1: any, type2: str, result2: any) -> tuple[bool, str]:
-    """Compare two results and return if they match and any error message"""
+def _scalar_equal(actual, expected) -> bool:
+    try:
+        if pd.isna(actual) and pd.isna(expected):
+            return True
+    except (TypeError, ValueError):
+        pass
+    try:
+        return bool(actual == expected)
+    except Exception:
+        return False
+
+
+def equal_mask(actual: np.ndarray, expected: np.ndarray, rtol: float, atol: float) -> np.ndarray:
+    """Element-wise equality of two same-length arrays; NaN equals NaN"""
+    if actual.dtype.kind in 'iuf' and expected.dtype.kind in 'iuf':
+        if rtol or atol or actual.dtype.kind == 'f' or expected.dtype.kind == 'f':
+            return np.isclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True)
+        return actual == expected
+
+    try:
+        with np.errstate(all='ignore'):
+            mask = np.asarray(actual == expected, dtype=bool)
+        if mask.shape != expected.shape:
+            raise ValueError("elementwise comparison failed")
+        if actual.dtype.kind in 'fcOmM' or expected.dtype.kind in 'fcOmM':
+            mask |= np.asarray(pd.isna(actual), dtype=bool) & np.asarray(pd.isna(expected), dtype=bool)
+        return mask
+    except (TypeError, ValueError):
+        return np.fromiter(
+            (_scalar_equal(act, exp) for act, exp in zip(actual, expected)),
+            dtype=bool,
+            count=len(expected)
+        )
+
+
+def first_mismatch(actual, expected, options: dict):
+    """Position of the first differing element, or None if all match"""
+    mask = equal_mask(to_comparable(actual), to_comparable(expected), options['rtol'], options['atol'])
+    if mask.all():
+        return None
+    return int(np.argmin(mask))
+
+
+def compare_results(type1: str, result1: any, type2: str, result2: any, options: dict=None) -> tuple[bool, str]:
+    """Compare two results and return if they match and any error message.
+
+    DataFrames, Series and arrays are compared column-wise with vectorized,
+    NaN-aware equality (within rtol/atol if set). Element-level details are
+    only worked out for the first mismatch.
+    """
+    options = comparison_options(options)
     try:
         if type1 != type2:
             return False, f"Return type mismatch. Expected {type2}, got {type1}"
             
         if type1 == 'dataframe':
-            # Compare DataFrames
-            if set(result1.keys()) != set(result2.keys()):
-                return False, f"Column mismatch. Expected columns: {list(result2.keys())}, Got: {list(result1.keys())}"
+            # Compare DataFrames; the index is ignored, columns are matched by name
+            if set(result1.columns) != set(result2.columns):
+                return False, f"Column mismatch. Expected columns: {preview(result2.columns)}, Got: {preview(result1.columns)}"
             
-            for key in result2:
-                expected_values = result2[key]
+            if len(result1) != len(result2):
+                return False, f"Length mismatch. Expected {len(result2)} rows, got {len(result1)}"
+            
+            for position, key in enumerate(result2.columns):
+                expected_values = result2.iloc[:, position]
                 actual_values = result1[key]
+                if isinstance(actual_values, pd.DataFrame):
+                    # Duplicate column names; fall back to the column at the same position
+                    actual_values = result1.iloc[:, position]
                 
-                if len(expected_values) != len(actual_values):
-                    return False, f"Length mismatch for column '{key}'. Expected {len(expected_values)} rows, got {len(actual_values)}"
+                if options['check_dtype'] and actual_values.dtype != expected_values.dtype:
+                    return False, f"Dtype mismatch for column '{key}'. Expected {expected_values.dtype}, got {actual_values.dtype}"
                 
-                for i, (exp, act) in enumerate(zip(expected_values, actual_values)):
-                    if pd.isna(exp) and pd.isna(act):
-                        continue
-                    if exp != act:
-                        return False, f"Value mismatch in column '{key}' at row {i}. Expected {exp}, got {act}"
+                row = first_mismatch(actual_values, expected_values, options)
+                if row is not None:
+                    return False, f"Value mismatch in column '{key}' at row {row}. Expected {expected_values.iloc[row]}, got {actual_values.iloc[row]}"
             
             return True, None
             
         elif type1 == 'series':
-            if set(result1.keys()) != set(result2.keys()):
-                return False, f"Index mismatch. Expected: {list(result2.keys())}, Got: {list(result1.keys())}"
+            # Series are matched by index label
+            if not result1.index.equals(result2.index):
+                if set(result1.index) != set(result2.index):
+                    return False, f"Index mismatch. Expected: {preview(result2.index)}, Got: {preview(result1.index)}"
+                if result1.index.is_unique:
+                    result1 = result1.reindex(result2.index)
             
-            for key in result2:
-                if pd.isna(result1[key]) and pd.isna(result2[key]):
-                    continue
-                if result1[key] != result2[key]:
-                    return False, f"Value mismatch at index {key}. Expected {result2[key]}, got {result1[key]}"
+            if options['check_dtype'] and result1.dtype != result2.dtype:
+                return False, f"Dtype mismatch. Expected {result2.dtype}, got {result1.dtype}"
+            
+            position = first_mismatch(result1, result2, options)
+            if position is not None:
+                key = result2.index[position]
+                return False, f"Value mismatch at index {key}. Expected {result2.iloc[position]}, got {result1.iloc[position]}"
             
             return True, None
             
         elif type1 == 'ndarray':
-            if len(result1) != len(result2):
-                return False, f"Length mismatch. Expected length {len(result2)}, got {len(result1)}"
+            if result1.shape != result2.shape:
+                return False, f"Shape mismatch. Expected shape {result2.shape}, got {result1.shape}"
             
-            for i, (exp, act) in enumerate(zip(result2, result1)):
-                if np.isnan(exp) and np.isnan(act):
-                    continue
-                if exp != act:
-                    return False, f"Value mismatch at index {i}. Expected {exp}, got {act}"
+            if options['check_dtype'] and result1.dtype != result2.dtype:
+                return False, f"Dtype mismatch. Expected {result2.dtype}, got {result1.dtype}"
+            
+            position = first_mismatch(result1, result2, options)
+            if position is not None:
+                index = tuple(int(i) for i in np.unravel_index(position, result2.shape)) if result2.ndim > 1 else position
+                return False, f"Value mismatch at index {index}. Expected {result2.ravel()[position]}, got {result1.ravel()[position]}"
             
             return True, None
             
@@ -173,63 +312,624 @@ def compare_results(type1: str, result1: any, type2: str, result2: any) -> tuple
             # For basic types, direct comparison
             if result1 == result2:
                 return True, None
-            else:
-                return False, f"Value mismatch. Expected {result2}, got {result1}"
+            numbers = (int, float)
+            if (options['rtol'] or options['atol']) and isinstance(result1, numbers) and isinstance(result2, numbers) \
+                    and not isinstance(result1, bool) and not isinstance(result2, bool) \
+                    and np.isclose(result1, result2, rtol=options['rtol'], atol=options['atol']):
+                return True, None
+            return False, f"Value mismatch. Expected {result2}, got {result1}"
             
     except Exception as e:
         return False, f"Error comparing results: {str(e)}"
 
 
-def run_test_case(user_code: str, working_code: str, test_input: str) -> dict:
+class DecodedInput:
+    """The DataFrame of one test case, decoded once per job"""
+
+    def __init__(self, df: pd.DataFrame=None, error: str=None, read_only: bool=False):
+        self.df = df
+        self.error = error
+        # Columns backed by a read-only memory map
+        self.read_only = read_only
+
+
+# Names and float() arguments allowed in test input literals
+LITERAL_NAMES = {
+    'nan': float('nan'), 'NaN': float('nan'), 'inf': float('inf'),
+    'None': None, 'True': True, 'False': False
+}
+LITERAL_MODULES = ('np', 'numpy', 'math', 'pd')
+
+
+def _literal(node: ast.AST):
+    """Evaluate one node of a test input literal; anything but plain data is rejected"""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Dict):
+        return {_literal(key): _literal(value) for key, value in zip(node.keys, node.values)}
+    if isinstance(node, ast.List):
+        return [_literal(element) for element in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(_literal(element) for element in node.elts)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _literal(node.operand)
+        if isinstance(operand, (int, float)) and not isinstance(operand, bool):
+            return -operand if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.Name) and node.id in LITERAL_NAMES:
+        return LITERAL_NAMES[node.id]
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) \
+            and node.value.id in LITERAL_MODULES and node.attr in ('nan', 'NaN', 'inf', 'NA'):
+        return float('inf') if node.attr == 'inf' else float('nan')
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'float' \
+            and len(node.args) == 1 and not node.keywords and isinstance(node.args[0], ast.Constant) \
+            and isinstance(node.args[0].value, str):
+        return float(node.args[0].value)
+    raise ValueError(f"Unsupported expression in test input at line {getattr(node, 'lineno', '?')}: {type(node).__name__}")
+
+
+def parse_input_literal(test_input: str):
+    """Parse a test input literal such as "{'a': [1, nan, None]}" without eval()"""
+    return _literal(ast.parse(test_input.strip(), mode='eval').body)
+
+
+# Dataset files whose content was checked against their hash: hash -> (inode, size, mtime)
+VERIFIED_DATASETS = {}
+
+
+def verify_dataset(dataset_hash: str, path: str):
+    """Check that a dataset file has the content its name promises.
+
+    A long-lived worker checks each file once and again only if it changes, so
+    a stale or partly written file is never used.
+    """
+    stat = os.stat(path)
+    signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if VERIFIED_DATASETS.get(dataset_hash) == signature:
+        return
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    if digest.hexdigest() != dataset_hash:
+        raise ValueError(f"Dataset {dataset_hash[:12]} does not match its hash")
+    VERIFIED_DATASETS[dataset_hash] = signature
+
+
+def load_dataset(dataset_hash: str) -> pd.DataFrame:
+    """Memory-map a dataset of the store and convert it to a DataFrame"""
+    if pa is None:
+        raise ValueError("pyarrow is not installed in this executor")
+    if len(dataset_hash) != DATASET_HASH_LENGTH or any(c not in '0123456789abcdef' for c in dataset_hash):
+        raise ValueError(f"Invalid dataset hash: {dataset_hash}")
+    path = os.path.join(DATASET_DIR, f"{dataset_hash}.arrow")
+    if not os.path.exists(path):
+        raise ValueError(f"Dataset {dataset_hash[:12]} not found")
+    verify_dataset(dataset_hash, path)
+    with pa.memory_map(path, 'r') as source:
+        table = ipc.open_file(source).read_all()
+    # Columns without nulls are handed to pandas without copying out of the mapping
+    return table.to_pandas(split_blocks=True)
+
+
+def decode_input(test_case: dict, input_ref: str=None) -> DecodedInput:
+    """Build the input DataFrame of a test case.
+
+    A test case either names a dataset of the store by hash or has a literal
+    input. `input_ref` names a stored, already encoded DataFrame of the same
+    literal; it is used instead of parsing it, unless it cannot be read. The
+    optional `dtypes` of the test case are applied to the columns.
+    """
     try:
-        # Get the function names
-        user_function_name = None
-        working_function_name = None
-        
-        for line in user_code.split('\n'):
-            if line.startswith('def '):
-                user_function_name = line[4:line.index('(')]
-                break
-        
-        for line in working_code.split('\n'):
-            if line.startswith('def'):
-                working_function_name = line[4:line.index('(')]
-                break
-                
-        if not user_function_name:
-            return format_output(False, error='No function definition found in user code')
-        if not working_function_name:
-            return format_output(False, error='No function definition found in working code')
-        
-        # Execute working code to get expected output
-        working_result, working_error, working_time = execute_function(working_code, working_function_name, test_input)
+        if test_case.get('dataset'):
+            df = load_dataset(test_case['dataset'])
+            if test_case.get('dtypes'):
+                df = df.astype(test_case['dtypes'])
+            return DecodedInput(df=df, read_only=True)
+        if input_ref is not None:
+            try:
+                return DecodedInput(df=load_reference(input_ref))
+            except (OSError, ValueError, pickle.UnpicklingError) as e:
+                print(f"Parsing the input literal instead: {str(e)}", file=sys.stderr)
+        df = pd.DataFrame(parse_input_literal(test_case['input']))
+        if test_case.get('dtypes'):
+            df = df.astype(test_case['dtypes'])
+        return DecodedInput(df=df)
+    except Exception as e:
+        return DecodedInput(error=str(e))
+
+
+class CompiledCode:
+    """A submission parsed and compiled once, reused for every test case of a job"""
+
+    def __init__(self, code_object=None, function_name: str=None, error: str=None):
+        self.code_object = code_object
+        self.function_name = function_name
+        self.error = error
+
+
+def find_function_names(tree: ast.Module) -> list:
+    """Names of the functions defined at module level, including under if/try/with, in order"""
+    names = []
+    statements = list(tree.body)
+    while statements:
+        node = statements.pop(0)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names.append(node.name)
+        elif isinstance(node, (ast.If, ast.Try, ast.With)):
+            statements[:0] = [child for child in ast.iter_child_nodes(node) if isinstance(child, ast.stmt)]
+    return names
+
+
+def compile_submission(code: str, label: str, entry_point: str=None) -> CompiledCode:
+    """Parse the code once, find its function and compile it to a code object.
+
+    The function called is `entry_point` if the code defines it, otherwise the
+    first function defined.
+    """
+    try:
+        tree = ast.parse(code, filename=f'<{label}>')
+    except SyntaxError as e:
+        return CompiledCode(error=f'Syntax error in {label} at line {e.lineno}: {e.msg}')
+
+    function_names = find_function_names(tree)
+    if not function_names:
+        return CompiledCode(error=f'No function definition found in {label}')
+    function_name = entry_point if entry_point in function_names else function_names[0]
+    return CompiledCode(compile(tree, f'<{label}>', 'exec'), function_name)
+
+
+def encode_reference(formatted_result: tuple) -> str:
+    """Serialize a (type, value) result so it can be stored and sent back later"""
+    return base64.b64encode(pickle.dumps(formatted_result, protocol=pickle.HIGHEST_PROTOCOL)).decode('ascii')
+
+
+def load_reference(ref: str):
+    """Read a stored reference file, checking that it has the content its name promises"""
+    if len(ref) != DATASET_HASH_LENGTH or any(c not in '0123456789abcdef' for c in ref):
+        raise ValueError(f"Invalid reference: {ref}")
+    path = os.path.join(REFERENCE_DIR, f"{ref}.pickle")
+    if not os.path.exists(path):
+        raise ValueError(f"Stored reference {ref[:12]} not found")
+    with open(path, 'rb') as file:
+        data = file.read()
+    if hashlib.sha256(data).hexdigest() != ref:
+        raise ValueError(f"Stored reference {ref[:12]} does not match its hash")
+    return pickle.loads(data)
+
+
+def compute_reference(working: CompiledCode, test_input: DecodedInput, encode_input: bool=False) -> dict:
+    """Run only the working driver on one test input and encode its result.
+
+    With `encode_input` the decoded input DataFrame is returned encoded as well,
+    so later jobs can skip parsing a large literal.
+    """
+    try:
+        if working.error:
+            return {'result': None, 'error': working.error}
+
+        working_result, working_error, _, _ = execute_function(working, test_input)
         if working_error:
-            return format_output(False, error=f'Error in working code: {working_error}')
+            return {'result': None, 'error': f'Error in working code: {working_error}'}
+        reference = {'result': encode_reference(working_result), 'error': None}
+        if encode_input:
+            reference['input'] = encode_reference(test_input.df)
+        return reference
+    except Exception as e:
+        return {'result': None, 'error': f"Error: {str(e)}\n{traceback.format_exc()}"}
+
+
+def run_test_case(user: CompiledCode, working: CompiledCode, test_input: DecodedInput, expected_ref: str=None, comparison: dict=None) -> dict:
+    """Run the user's function on one input and compare it with the expected result.
+
+    `expected_ref` names the stored output of the working driver for this
+    input. Without it, or if it cannot be read, the working driver is executed
+    here as well.
+    `comparison` holds the question's rtol, atol and check_dtype settings.
+    """
+    try:
+        if user.error:
+            return format_output(False, error=user.error)
+        
+        working_result = None
+        if expected_ref is not None:
+            try:
+                working_result = load_reference(expected_ref)
+            except (OSError, ValueError, pickle.UnpicklingError) as e:
+                print(f"Running the working driver instead: {str(e)}", file=sys.stderr)
+        if working_result is None:
+            if working.error:
+                return format_output(False, error=working.error)
+            
+            # Execute working code to get expected output
+            working_result, working_error, working_time, _ = execute_function(working, test_input)
+            if working_error:
+                return format_output(False, error=f'Error in working code: {working_error}')
         
-        # Execute user code
-        user_result, user_error, user_time = execute_function(user_code, user_function_name, test_input)
+        # Execute user code; in a forked child nothing uses the input after it
+        user_result, user_error, user_time, printed = execute_function(user, test_input, private=FORK_TEST_CASES)
         if user_error:
-            return format_output(False, error=user_error, execution_time=user_time)
+            return with_debug_output(format_output(False, error=user_error, execution_time=user_time), printed)
             
         if not user_result:
-            return format_output(False, error="No output produced by the function", execution_time=user_time)
+            return with_debug_output(format_output(False, error="No output produced by the function", execution_time=user_time), printed)
         
         # Compare results
         user_type, user_formatted = user_result
         working_type, working_formatted = working_result
         
-        matches, error_msg = compare_results(user_type, user_formatted, working_type, working_formatted)
+        matches, error_msg = compare_results(user_type, user_formatted, working_type, working_formatted, comparison)
         
+        output = display_result(user_type, user_formatted)
+        expected = display_result(working_type, working_formatted)
         if matches:
-            return format_output(True, output=str(user_formatted), expected=str(working_formatted), execution_time=user_time)
+            result = format_output(True, output=output, expected=expected, execution_time=user_time)
         else:
-            return format_output(False, error=error_msg, output=str(user_formatted), expected=str(working_formatted), execution_time=user_time)
+            result = format_output(False, error=error_msg, output=output, expected=expected, execution_time=user_time)
+        return with_debug_output(result, printed)
         
     except Exception as e:
         error_msg = f"Error: {str(e)}\n{traceback.format_exc()}"
         return format_output(False, error=error_msg)
 
 
+def skipped_result(max_failures: int) -> dict:
+    """Result of a test case that was not run because the job failed fast"""
+    result = format_output(False, error=f"Skipped after {max_failures} failed test case(s)")
+    result['skipped'] = True
+    return result
+
+
+def test_limits(limits: dict) -> dict:
+    """Per test case limits of a job, with the defaults filled in"""
+    limits = limits or {}
+    return {
+        'time': float(limits.get('time') or TEST_TIME_LIMIT),
+        'cpu': float(limits.get('cpu') or TEST_CPU_LIMIT),
+        'memory_mb': int(limits.get('memory_mb') or TEST_MEMORY_LIMIT)
+    }
+
+
+def apply_limits(limits: dict):
+    """Let the kernel enforce the CPU time and memory limits of the test case process.
+
+    The address space limit is counted from what the process already maps at
+    fork, so it is the memory the test case itself may add.
+    """
+    ACTIVE_LIMITS.update(limits)
+    cpu_seconds = max(1, math.ceil(limits['cpu']))
+    # SIGXCPU at the soft limit, SIGKILL one second later
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    with open('/proc/self/statm') as statm:
+        mapped = int(statm.read().split()[0]) * resource.getpagesize()
+    address_space = mapped + limits['memory_mb'] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (address_space, address_space))
+
+
+def _child_result(func, args: tuple) -> bytes:
+    """Run func in the forked child and serialize what it returns"""
+    # Keep user code away from the parent's stdin (queued jobs) and stdout (results)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, sys.stdin.fileno())
+    sys.stdin = open(os.devnull, 'r')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    try:
+        result = func(*args)
+    except MemoryError:
+        result = format_output(False, error=f"Memory limit of {ACTIVE_LIMITS.get('memory_mb')} MB exceeded")
+        result['limit_exceeded'] = 'memory'
+    except BaseException as e:
+        result = format_output(False, error=f"Error: {str(e)}\n{traceback.format_exc()}")
+    if LIMIT_EXCEEDED:
+        result['limit_exceeded'] = LIMIT_EXCEEDED
+    try:
+        return json.dumps(result).encode('utf-8')
+    except Exception as e:
+        return json.dumps(format_output(False, error=f"Could not serialize test result: {str(e)}")).encode('utf-8')
+
+
+def _start_child(func, args: tuple, limits: dict) -> tuple:
+    """Fork a child that runs func(*args) under the limits and writes its result to a pipe"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            # Close every inherited descriptor but stdio and our own pipe: the worker's
+            # private result stream and the pipes of the test cases running next to this one
+            os.closerange(3, write_fd)
+            os.closerange(write_fd + 1, MAX_FD)
+            apply_limits(limits)
+            payload = _child_result(func, args)
+            with os.fdopen(write_fd, 'wb') as pipe:
+                pipe.write(payload)
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    return pid, read_fd
+
+
+def _child_outcome(chunks: list, status: int, cpu_time: float, limits: dict) -> dict:
+    try:
+        return json.loads(b''.join(chunks).decode('utf-8'))
+    except ValueError:
+        if os.WIFSIGNALED(status) and (os.WTERMSIG(status) == signal.SIGXCPU or cpu_time >= limits['cpu']):
+            result = format_output(False, error=f"CPU time limit of {limits['cpu']:g} seconds exceeded")
+            result['limit_exceeded'] = 'cpu'
+            return result
+        if os.WIFSIGNALED(status):
+            reason = f"killed by signal {os.WTERMSIG(status)}"
+        else:
+            reason = f"exited with status {os.WEXITSTATUS(status)}"
+        return format_output(False, error=f"Test case process {reason} without a result")
+
+
+def cpu_and_rss(usage) -> tuple:
+    """CPU time and peak RSS (kB) of a reaped child"""
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+
+def record_usage(result: dict, wall_time: float, cpu_time: float, max_rss_kb: int) -> dict:
+    """Add wall time, CPU time and peak RSS of a test case to its result"""
+    result['wall_time'] = round(wall_time, 4)
+    result['cpu_time'] = round(cpu_time, 4)
+    # ru_maxrss is in kilobytes on Linux; it includes the preloaded interpreter
+    result['peak_memory_mb'] = round(max_rss_kb / 1024, 2)
+    return result
+
+
+def run_isolated(func, args_list: list, limits: dict, parallelism: int=PARALLELISM, max_failures: int=None) -> list:
+    """
+    Run func(*args) for every args in args_list, each in a forked child.
+
+    The children start as copy-on-write clones of this process, so pandas and
+    numpy are already imported, and nothing user code does to module state
+    survives a test case. Up to `parallelism` children run at once. Each one
+    has the CPU time and memory `limits` set by the kernel and is killed if it
+    outlives the time limit; a result that hit a limit names it in
+    `limit_exceeded`. Results come back in the order of args_list.
+
+    With `max_failures`, no further children are started once that many results
+    have failed; the test cases that never ran are reported as skipped.
+    """
+    timeout = limits['time']
+    if not FORK_TEST_CASES:
+        # In-process runs have no limits
+        results = []
+        for args in args_list:
+            if max_failures and sum(1 for result in results if not result.get('passed')) >= max_failures:
+                results.append(skipped_result(max_failures))
+                continue
+            started_at = time.monotonic()
+            cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+            result = func(*args)
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            # In-process runs share one process, so peak RSS is the process high-water mark
+            cpu_time = (usage.ru_utime + usage.ru_stime) - (cpu_before.ru_utime + cpu_before.ru_stime)
+            results.append(record_usage(result, time.monotonic() - started_at, cpu_time, usage.ru_maxrss))
+        return results
+
+    results = [None] * len(args_list)
+    pending = list(range(len(args_list)))
+    running = {}  # read fd -> (index, pid, started_at, chunks)
+    failures = 0
+    try:
+        while running or (pending and not (max_failures and failures >= max_failures)):
+            while pending and len(running) < max(1, parallelism) and not (max_failures and failures >= max_failures):
+                index = pending.pop(0)
+                pid, read_fd = _start_child(func, args_list[index], limits)
+                running[read_fd] = (index, pid, time.monotonic(), [])
+
+            nearest_deadline = min(started_at for _, _, started_at, _ in running.values()) + timeout
+            ready, _, _ = select.select(list(running), [], [], max(0, nearest_deadline - time.monotonic()))
+            for read_fd in ready:
+                index, pid, started_at, chunks = running[read_fd]
+                chunk = os.read(read_fd, 65536)
+                if chunk:
+                    chunks.append(chunk)
+                    continue
+                del running[read_fd]
+                os.close(read_fd)
+                _, status, usage = os.wait4(pid, 0)
+                cpu_time, max_rss_kb = cpu_and_rss(usage)
+                results[index] = record_usage(
+                    _child_outcome(chunks, status, cpu_time, limits), time.monotonic() - started_at, cpu_time, max_rss_kb
+                )
+                if not results[index].get('passed'):
+                    failures += 1
+
+            now = time.monotonic()
+            for read_fd, (index, pid, started_at, _) in list(running.items()):
+                if started_at + timeout > now:
+                    continue
+                del running[read_fd]
+                os.close(read_fd)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                _, _, usage = os.wait4(pid, 0)
+                results[index] = format_output(False, error=f"Time limit of {timeout:g} seconds exceeded")
+                results[index]['limit_exceeded'] = 'time'
+                record_usage(results[index], now - started_at, *cpu_and_rss(usage))
+                failures += 1
+    finally:
+        # Only reached with children left if this process is being interrupted
+        for read_fd, (_, pid, _, _) in running.items():
+            os.close(read_fd)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+    for index in pending:
+        results[index] = skipped_result(max_failures)
+    return results
+
+
+def process_reference_job(input_data: dict) -> dict:
+    """Compute the encoded working driver output for every test case"""
+    if 'working_driver' not in input_data or 'test_cases' not in input_data:
+        return {'references': [], 'error': "A reference job needs a working driver and test cases"}
+
+    # Compiled and decoded once here, the children inherit the code object and inputs
+    working = compile_submission(input_data['working_driver'], 'working code')
+    references = run_isolated(
+        compute_reference,
+        [
+            (working, decode_input(test_case), not test_case.get('dataset') and len(test_case['input']) >= BULK_INPUT_CHARS)
+            for test_case in input_data['test_cases']
+        ],
+        limits=test_limits(input_data.get('limits'))
+    )
+    # run_isolated reports a crashed or timed out child in the test result format
+    references = [
+        reference if 'result' in reference else {'result': None, 'error': reference.get('error')}
+        for reference in references
+    ]
+
+    return {'references': references, 'reference_format': REFERENCE_FORMAT}
+
+
+def process_job(input_data: dict) -> dict:
+    """Validate one job and run all of its test cases"""
+    if input_data.get('mode') == 'reference':
+        return process_reference_job(input_data)
+
+    if 'code' not in input_data:
+        return {'results': [format_output(False, error="No code provided in input")]}
+        
+    if 'test_cases' not in input_data:
+        return {'results': [format_output(False, error="No test cases provided in input")]}
+        
+    if 'working_driver' not in input_data:
+        return {'results': [format_output(False, error="No working driver provided in input")]}
+
+    # Stored reference outputs are only trusted if they were written in a format we read
+    use_references = input_data.get('reference_format') == REFERENCE_FORMAT
+        
+    expected_refs = [
+        test_case.get('expected_ref') if use_references else None
+        for test_case in input_data['test_cases']
+    ]
+
+    # Parse and compile once per job; every forked test case inherits the code objects
+    working = compile_submission(input_data['working_driver'], 'working code')
+    # Helpers may come before the solution, so prefer the function the driver defines
+    user = compile_submission(input_data['code'], 'user code', entry_point=working.function_name)
+
+    # Every input is decoded once and shared, read-only, by the driver and user runs
+    inputs = [
+        decode_input(test_case, test_case.get('input_ref') if use_references else None)
+        for test_case in input_data['test_cases']
+    ]
+
+    comparison = comparison_options(input_data.get('comparison'))
+    args_list = [
+        (user, working, test_input, expected_ref, comparison)
+        for test_input, expected_ref in zip(inputs, expected_refs)
+    ]
+    results = run_isolated(
+        run_test_case, args_list, limits=test_limits(input_data.get('limits')), max_failures=input_data.get('fail_fast')
+    )
+    
+    return {'results': results}
+
+
+def handle_line(input_json: str) -> dict:
+    """Parse one JSON job line and process it"""
+    try:
+        input_data = json.loads(input_json)
+    except json.JSONDecodeError as e:
+        return {'results': [format_output(False, error=f"Invalid JSON input: {str(e)}")]}
+
+    try:
+        output = process_job(input_data)
+    except Exception as e:
+        output = {'results': [format_output(False, error=f"Unexpected error: {str(e)}")]}
+
+    if isinstance(input_data, dict) and 'job_id' in input_data:
+        # First in the line, so the pool can match it without parsing the results
+        output = {'job_id': input_data['job_id'], **output}
+    return output
+
+
+class JobState:
+    """Interpreter state captured after startup and restored after every job"""
+
+    def __init__(self):
+        self.path = list(sys.path)
+        self.cwd = os.getcwd()
+        self.numpy_errors = np.geterr()
+        self.numpy_print_options = np.get_printoptions()
+        self.warning_filters = list(warnings.filters)
+        self.pandas_options = self._pandas_options()
+
+    @staticmethod
+    def _pandas_options() -> dict:
+        options = {}
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for key in pd._config.config._registered_options:
+                try:
+                    options[key] = pd.get_option(key)
+                except Exception:
+                    pass
+        return options
+
+    def reset(self):
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        # Do not let one job's seeds leak into the next
+        random.seed()
+        np.random.seed()
+        sys.path[:] = self.path
+        os.chdir(self.cwd)
+        # Only restore what changed; resetting every option runs all option callbacks
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for key, value in self._pandas_options().items():
+                if key in self.pandas_options and value is not self.pandas_options[key] and value != self.pandas_options[key]:
+                    pd.set_option(key, self.pandas_options[key])
+        np.seterr(**self.numpy_errors)
+        np.set_printoptions(**self.numpy_print_options)
+        warnings.filters[:] = self.warning_filters
+        gc.collect()
+
+
+def worker():
+    """
+    Serve many jobs from one process.
+
+    Reads newline-delimited job envelopes from stdin until EOF and writes one
+    JSON result line per job. Results go to a private copy of stdout; the real
+    stdout is pointed at stderr so stray prints cannot corrupt the framing.
+    """
+    result_stream = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    state = JobState()
+    for line in sys.stdin:
+        input_json = line.strip()
+        if not input_json:
+            continue
+        output = handle_line(input_json)
+        result_stream.write(json.dumps(output) + '\n')
+        result_stream.flush()
+        try:
+            state.reset()
+        except Exception as e:
+            # Never serve another job from a process we could not clean up
+            print(f"Failed to reset worker state: {str(e)}", file=sys.stderr)
+            break
+
+
 def main():
     try:
         # Read input JSON
@@ -238,38 +938,14 @@ def main():
             print(json.dumps({'results': [format_output(False, error="No input received")]}))
             return
             
-        try:
-            input_data = json.loads(input_json)
-        except json.JSONDecodeError as e:
-            print(json.dumps({'results': [format_output(False, error=f"Invalid JSON input: {str(e)}")]}))
-            return
-        
-        if 'code' not in input_data:
-            print(json.dumps({'results': [format_output(False, error="No code provided in input")]}))
-            return
-            
-        if 'test_cases' not in input_data:
-            print(json.dumps({'results': [format_output(False, error="No test cases provided in input")]}))
-            return
-            
-        if 'working_driver' not in input_data:
-            print(json.dumps({'results': [format_output(False, error="No working driver provided in input")]}))
-            return
-            
-        results = []
-        for test_case in input_data['test_cases']:
-            result = run_test_case(
-                input_data['code'],
-                input_data['working_driver'],
-                test_case['input']
-            )
-            results.append(result)
-        
-        print(json.dumps({'results': results}))
+        print(json.dumps(handle_line(input_json)))
         
     except Exception as e:
         print(json.dumps({'results': [format_output(False, error=f"Unexpected error: {str(e)}")]}))
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if '--worker' in sys.argv[1:]:
+        worker()
+    else:
+        main()
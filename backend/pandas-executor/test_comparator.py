@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from pandas_executor import compare_results, format_result_for_comparison
+
+
+def compare(actual, expected, **options):
+    return compare_results(*format_result_for_comparison(actual), *format_result_for_comparison(expected), options)
+
+
+def test_equal_dataframes_match_regardless_of_column_order_and_index():
+    expected = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']})
+    actual = pd.DataFrame({'b': ['x', 'y', 'z'], 'a': [1, 2, 3]}, index=[10, 11, 12])
+    assert compare(actual, expected) == (True, None)
+
+
+def test_nan_matches_nan_and_none_in_every_column_kind():
+    expected = pd.DataFrame({'f': [1.0, np.nan], 'o': ['a', None], 't': pd.to_datetime(['2024-01-01', None])})
+    actual = pd.DataFrame({'f': [1.0, np.nan], 'o': ['a', np.nan], 't': pd.to_datetime(['2024-01-01', None])})
+    assert compare(actual, expected) == (True, None)
+
+
+def test_nullable_dtypes_compare_with_their_numpy_counterparts():
+    expected = pd.DataFrame({'a': [1.0, np.nan, 3.0]})
+    actual = pd.DataFrame({'a': pd.array([1, None, 3], dtype='Int64')})
+    assert compare(actual, expected) == (True, None)
+    assert compare(actual, expected, check_dtype=True)[0] is False
+
+
+def test_the_first_differing_row_is_reported():
+    expected = pd.DataFrame({'a': [1, 2, 3, 4]})
+    actual = pd.DataFrame({'a': [1, 2, 30, 40]})
+    matches, error = compare(actual, expected)
+    assert not matches
+    assert error == "Value mismatch in column 'a' at row 2. Expected 3, got 30"
+
+
+def test_nan_does_not_match_a_number():
+    matches, error = compare(pd.DataFrame({'a': [1.0, np.nan]}), pd.DataFrame({'a': [1.0, 2.0]}))
+    assert not matches
+    assert "at row 1" in error
+
+
+def test_floats_compare_exactly_unless_a_tolerance_is_set():
+    expected = pd.DataFrame({'a': [0.1 + 0.2, 100.0]})
+    actual = pd.DataFrame({'a': [0.3, 100.001]})
+    assert compare(actual, expected)[0] is False
+    assert compare(actual, expected, atol=1e-9)[0] is False
+    assert compare(actual, expected, atol=0.01) == (True, None)
+    assert compare(actual, expected, rtol=1e-4) == (True, None)
+
+
+def test_integers_compare_with_floats_by_value():
+    assert compare(pd.DataFrame({'a': [1, 2]}), pd.DataFrame({'a': [1.0, 2.0]})) == (True, None)
+    assert compare(pd.DataFrame({'a': [1, 2]}), pd.DataFrame({'a': [1.0, 2.0]}), check_dtype=True)[0] is False
+
+
+def test_column_and_length_mismatches():
+    expected = pd.DataFrame({'a': [1, 2]})
+    assert compare(pd.DataFrame({'b': [1, 2]}), expected)[1].startswith("Column mismatch")
+    assert compare(pd.DataFrame({'a': [1]}), expected)[1] == "Length mismatch. Expected 2 rows, got 1"
+
+
+def test_series_are_matched_by_index_label():
+    expected = pd.Series([1, 2, 3], index=['x', 'y', 'z'])
+    assert compare(pd.Series([3, 1, 2], index=['z', 'x', 'y']), expected) == (True, None)
+    matches, error = compare(pd.Series([1, 5, 3], index=['x', 'y', 'z']), expected)
+    assert not matches
+    assert error == "Value mismatch at index y. Expected 2, got 5"
+    assert compare(pd.Series([1, 2, 3], index=['x', 'y', 'w']), expected)[1].startswith("Index mismatch")
+
+
+def test_arrays_report_the_position_of_the_first_mismatch():
+    expected = np.array([[1, 2], [3, 4]])
+    assert compare(np.array([[1, 2], [3, 4]]), expected) == (True, None)
+    assert compare(np.array([[1, 2], [5, 4]]), expected)[1] == "Value mismatch at index (1, 0). Expected 3, got 5"
+    assert compare(np.array([1, 2, 3, 4]), expected)[1].startswith("Shape mismatch")
+
+
+def test_mixed_object_columns_fall_back_to_element_comparison():
+    expected = pd.DataFrame({'a': [[1, 2], {'k': 1}, 'text']})
+    assert compare(pd.DataFrame({'a': [[1, 2], {'k': 1}, 'text']}), expected) == (True, None)
+    assert compare(pd.DataFrame({'a': [[1, 2], {'k': 2}, 'text']}), expected)[1].startswith("Value mismatch in column 'a' at row 1")
+
+
+def test_basic_values_and_tolerances():
+    assert compare(3, 3) == (True, None)
+    assert compare(0.1 + 0.2, 0.3)[0] is False
+    assert compare(0.1 + 0.2, 0.3, atol=1e-9) == (True, None)
+    # Booleans are never compared within a tolerance
+    assert compare(True, 1.5, atol=1)[0] is False
+    assert compare(1, 'a')[0] is False
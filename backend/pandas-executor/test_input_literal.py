@@ -0,0 +1,100 @@
+import hashlib
+import math
+import pickle
+import pandas as pd
+import pytest
+import pandas_executor
+from pandas_executor import decode_input, parse_input_literal
+
+
+def test_plain_data_is_parsed():
+    parsed = parse_input_literal("{'a': [1, -2.5, +3], 'b': ('x', True, None), 'c': {'nested': [[]]}}")
+    assert parsed == {'a': [1, -2.5, 3], 'b': ('x', True, None), 'c': {'nested': [[]]}}
+
+
+@pytest.mark.parametrize('literal', ['nan', 'NaN', 'np.nan', 'numpy.NaN', 'math.nan', 'pd.NA', "float('nan')"])
+def test_missing_value_spellings_are_nan(literal):
+    assert math.isnan(parse_input_literal(literal))
+
+
+@pytest.mark.parametrize('literal, expected', [
+    ('inf', math.inf), ('-inf', -math.inf), ('np.inf', math.inf), ("float('-inf')", -math.inf)
+])
+def test_infinity_spellings(literal, expected):
+    assert parse_input_literal(literal) == expected
+
+
+def test_surrounding_whitespace_is_ignored():
+    assert parse_input_literal("\n  {'a': [1]}\n") == {'a': [1]}
+
+
+@pytest.mark.parametrize('literal', [
+    "__import__('os').system('true')",
+    "open('/etc/passwd')",
+    "{'a': print(1)}",
+    "float(1)",
+    "float(x='nan')",
+    "np.array([1, 2])",
+    "pd.DataFrame({'a': [1]})",
+    "(lambda: 1)()",
+])
+def test_calls_are_rejected(literal):
+    with pytest.raises(ValueError, match="Unsupported expression"):
+        parse_input_literal(literal)
+
+
+@pytest.mark.parametrize('literal', [
+    "os.system", "np.ones", "pd.read_csv", "().__class__", "nan.real", "np.random.nan"
+])
+def test_attributes_are_rejected(literal):
+    with pytest.raises(ValueError, match="Unsupported expression"):
+        parse_input_literal(literal)
+
+
+@pytest.mark.parametrize('literal', [
+    "x", "[i for i in range(3)]", "1 + 1", "-'a'", "-True", "{'a': [1]}['a']", "f'{1}'"
+])
+def test_other_expressions_are_rejected(literal):
+    with pytest.raises(ValueError):
+        parse_input_literal(literal)
+
+
+def test_decode_input_applies_dtypes():
+    decoded = decode_input({'input': "{'a': [1, None, 3], 'b': ['x', 'y', 'z']}", 'dtypes': {'a': 'Int64', 'b': 'category'}})
+    assert decoded.error is None
+    assert not decoded.read_only
+    assert str(decoded.df['a'].dtype) == 'Int64'
+    assert decoded.df['a'].isna().tolist() == [False, True, False]
+    assert isinstance(decoded.df['b'].dtype, pd.CategoricalDtype)
+
+
+def test_decode_input_reports_a_rejected_literal():
+    decoded = decode_input({'input': "{'a': __import__('os').getpid()}"})
+    assert decoded.df is None
+    assert "Unsupported expression" in decoded.error
+
+
+def store_reference(directory, value) -> str:
+    data = pickle.dumps(value)
+    ref = hashlib.sha256(data).hexdigest()
+    (directory / f"{ref}.pickle").write_bytes(data)
+    return ref
+
+
+def test_decode_input_loads_a_stored_input(tmp_path, monkeypatch):
+    monkeypatch.setattr(pandas_executor, 'REFERENCE_DIR', str(tmp_path))
+    ref = store_reference(tmp_path, pd.DataFrame({'a': [7, 8]}))
+    decoded = decode_input({'input': "{'a': [1, 2]}"}, ref)
+    assert decoded.df['a'].tolist() == [7, 8]
+
+
+def test_decode_input_parses_the_literal_when_the_stored_input_cannot_be_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(pandas_executor, 'REFERENCE_DIR', str(tmp_path))
+    missing = '0' * 64
+    decoded = decode_input({'input': "{'a': [1, 2]}"}, missing)
+    assert decoded.error is None
+    assert decoded.df['a'].tolist() == [1, 2]
+
+    # A file whose content does not match its name is not used either
+    (tmp_path / f"{missing}.pickle").write_bytes(pickle.dumps(pd.DataFrame({'a': [9]})))
+    assert decode_input({'input': "{'a': [1, 2]}"}, missing).df['a'].tolist() == [1, 2]
@@ -0,0 +1,265 @@
+import os
+import time
+import base64
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Set
+from pymongo import ASCENDING
+from dataset_store import DATASET_DIR
+from executor_images import executor_images
+from executor_pool import executor_pool
+from judge_scheduler import judge_scheduler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Only the pandas executor compares against a working driver
+REFERENCE_RUNNER = "pandas"
+
+# Encoded outputs and inputs, stored as files named by the sha256 of their content
+# inside the dataset store, which the executors already mount read-only
+REFERENCE_DIR = DATASET_DIR / "references"
+
+# A failed reference run of a question version is retried after this long,
+# doubling with every further failure
+RETRY_AFTER = 60  # seconds
+MAX_RETRY_AFTER = 3600  # seconds
+
+
+class ReferenceOutputStore:
+    """
+    Stores the output of a question's working_driver for each of its test cases.
+
+    A set of outputs is keyed by a hash of the working driver, the test inputs and
+    the pandas executor image, so a changed driver, changed test cases or a new
+    executor build simply miss the stored version and get recomputed. The outputs
+    are opaque to the backend: they are produced and read by the executor.
+
+    The encoded outputs and inputs are files in REFERENCE_DIR named by their
+    sha256; the document of a version only holds those hashes, so its size does
+    not depend on the size of the data. A version whose run failed is recorded as
+    failed and not run again before its `retry_at`.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        # Questions whose outputs are currently being computed
+        self._pending: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def version(question: dict) -> str:
+        """Hash of everything the reference outputs of a question depend on"""
+        image_hash = executor_images.images[REFERENCE_RUNNER].content_hash or ""
+        payload = json.dumps({
+            "working_driver": question.get('working_driver', ''),
+            "inputs": [
+                [test_case.get('input'), test_case.get('dtypes'), test_case.get('dataset')]
+                for test_case in question.get('testCases', [])
+            ],
+            "image": image_hash
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def applies_to(question: dict) -> bool:
+        return (
+            question.get('docker_runner') == REFERENCE_RUNNER
+            and bool(question.get('working_driver'))
+            and bool(question.get('testCases'))
+        )
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([('question_id', ASCENDING)])
+        # Finds the versions that still use a stored file before it is removed
+        await self.collection.create_index([('outputs', ASCENDING)])
+        await self.collection.create_index([('inputs', ASCENDING)])
+
+    async def lookup(self, question: dict) -> Optional[dict]:
+        """Stored outputs (or a recorded failure) for the current version of a question"""
+        if not self.applies_to(question):
+            return None
+        return await self.collection.find_one({'_id': self.version(question)})
+
+    @staticmethod
+    def usable(reference: Optional[dict]) -> bool:
+        return bool(reference) and not reference.get('failed')
+
+    @staticmethod
+    def _write_files(encoded: List[Optional[str]]) -> List[Optional[str]]:
+        """Store base64 encoded executor output as files named by their sha256"""
+        REFERENCE_DIR.mkdir(parents=True, exist_ok=True)
+        refs = []
+        for blob in encoded:
+            if blob is None:
+                refs.append(None)
+                continue
+            data = base64.b64decode(blob)
+            ref = hashlib.sha256(data).hexdigest()
+            path = REFERENCE_DIR / f"{ref}.pickle"
+            if not path.exists():
+                temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+                with open(temporary_path, 'wb') as file:
+                    file.write(data)
+                os.replace(temporary_path, path)
+            refs.append(ref)
+        return refs
+
+    @staticmethod
+    def _remove_files(refs: Iterable[str]):
+        for ref in refs:
+            try:
+                (REFERENCE_DIR / f"{ref}.pickle").unlink()
+            except FileNotFoundError:
+                pass
+
+    async def _delete_versions(self, query: dict):
+        """Delete stored versions and the files no other version refers to"""
+        documents = await self.collection.find(query, {'outputs': 1, 'inputs': 1}).to_list(length=None)
+        if not documents:
+            return
+        await self.collection.delete_many({'_id': {'$in': [document['_id'] for document in documents]}})
+        refs = {
+            ref
+            for document in documents
+            for ref in document.get('outputs', []) + document.get('inputs', [])
+            if ref
+        }
+        if not refs:
+            return
+        # Files are content-addressed, so other questions may share them
+        still_used = set(await self.collection.distinct('outputs', {'outputs': {'$in': list(refs)}}))
+        still_used.update(await self.collection.distinct('inputs', {'inputs': {'$in': list(refs)}}))
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._remove_files, refs - still_used)
+
+    async def _record_failure(self, question: dict, error: str):
+        """Remember that the current version failed, so lookups back off instead of rerunning it"""
+        version = self.version(question)
+        previous = await self.collection.find_one({'_id': version}, {'failed': 1, 'attempts': 1})
+        if previous and not previous.get('failed'):
+            # Outputs of this version were stored in the meantime
+            return
+        attempts = (previous or {}).get('attempts', 0) + 1
+        retry_after = min(RETRY_AFTER * 2 ** (attempts - 1), MAX_RETRY_AFTER)
+        await self.collection.replace_one({'_id': version}, {
+            '_id': version,
+            'question_id': str(question['_id']),
+            'failed': True,
+            'error': error[-2000:],
+            'attempts': attempts,
+            'retry_at': time.time() + retry_after,
+            'created_at': datetime.now(timezone.utc)
+        }, upsert=True)
+
+    async def compute(self, question: dict) -> Optional[dict]:
+        """Run the working driver on all test inputs and store the outputs"""
+        if not self.applies_to(question) or not judge_scheduler.is_ready(REFERENCE_RUNNER):
+            return None
+
+        question_id = str(question['_id'])
+        version = self.version(question)
+        # The working driver gets the same limits as a judge run
+        config = executor_pool.get_config(REFERENCE_RUNNER)
+        input_data = {
+            'mode': 'reference',
+            'working_driver': question['working_driver'],
+            'limits': config.limits(),
+            'test_cases': [
+                {
+                    'input': test_case.get('input'),
+                    'dtypes': test_case.get('dtypes'),
+                    'dataset': test_case.get('dataset')
+                }
+                for test_case in question['testCases']
+            ]
+        }
+        returncode, stdout, stderr = await judge_scheduler.run(
+            REFERENCE_RUNNER, json.dumps(input_data).encode('utf-8') + b'\n',
+            timeout=config.job_timeout(len(input_data['test_cases']))
+        )
+        if returncode != 0:
+            raise RuntimeError(f"Reference run failed: {stderr.decode('utf-8', errors='replace')[-2000:]}")
+
+        output = json.loads(stdout.decode('utf-8', errors='replace').strip())
+        if output.get('error'):
+            raise RuntimeError(output['error'])
+
+        loop = asyncio.get_event_loop()
+        outputs = await loop.run_in_executor(
+            None, self._write_files, [reference.get('result') for reference in output['references']]
+        )
+        # Large inputs come back encoded so later jobs need not parse them again
+        inputs = await loop.run_in_executor(
+            None, self._write_files, [reference.get('input') for reference in output['references']]
+        )
+        document = {
+            '_id': version,
+            'question_id': question_id,
+            'reference_format': output['reference_format'],
+            'outputs': outputs,
+            'inputs': inputs,
+            'created_at': datetime.now(timezone.utc)
+        }
+        await self.collection.replace_one({'_id': version}, document, upsert=True)
+        # Outputs of earlier versions of this question can never be looked up again
+        await self._delete_versions({'question_id': question_id, '_id': {'$ne': version}})
+        logger.info(f"Stored reference outputs for question {question_id} ({version[:12]})")
+        return document
+
+    async def _compute_quietly(self, question: dict):
+        question_id = str(question['_id'])
+        try:
+            await self.compute(question)
+        except Exception as e:
+            logger.error(f"Failed to compute reference outputs for question {question_id}: {str(e)}")
+            try:
+                await self._record_failure(question, str(e))
+            except Exception as record_error:
+                logger.error(f"Failed to record reference failure for question {question_id}: {str(record_error)}")
+        finally:
+            self._pending.discard(question_id)
+
+    def refresh_in_background(self, question: dict, reference: Optional[dict] = None):
+        """
+        Compute the outputs of a question without holding up the request.
+
+        `reference` is what a lookup found for the current version; a recorded
+        failure is only retried once its back-off has passed.
+        """
+        question_id = str(question['_id'])
+        if not self.applies_to(question) or question_id in self._pending:
+            return
+        if reference and reference.get('failed') and reference.get('retry_at', 0) > time.time():
+            return
+        self._pending.add(question_id)
+        task = asyncio.create_task(self._compute_quietly(question))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def delete(self, question_id: str):
+        await self._delete_versions({'question_id': question_id})
+
+    @staticmethod
+    def attach(test_cases: List[dict], reference: dict) -> List[dict]:
+        """
+        Copy of the test cases for the executor, with the refs of their stored
+        expected results and encoded inputs. The literal input stays with the
+        test case, so an executor that cannot read a stored input still parses it.
+        """
+        outputs = reference.get('outputs', [])
+        inputs = reference.get('inputs', [])
+        attached = []
+        for i, test_case in enumerate(test_cases):
+            test_case = dict(test_case)
+            # Test cases whose driver run failed are left to the executor
+            if i < len(outputs) and outputs[i] is not None:
+                test_case['expected_ref'] = outputs[i]
+            if i < len(inputs) and inputs[i] is not None:
+                test_case['input_ref'] = inputs[i]
+            attached.append(test_case)
+        return attached
@@ -0,0 +1,234 @@
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from executor_pool import ExecutionTimeout, WORKER_LINE_LIMIT
+from dataset_store import store_id
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How often every judge worker is asked for its health and load
+HEALTH_INTERVAL = 5  # seconds
+HEALTH_TIMEOUT = 3  # seconds
+CONNECT_TIMEOUT = 3  # seconds
+
+# Time a worker may take on top of the job timeout: waiting for one of its
+# slots and sending the results back
+RESPONSE_MARGIN = 40  # seconds
+
+
+class WorkerBusy(Exception):
+    """Raised when every judge worker rejected a job; retry_after is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RemoteWorker:
+    """A judge worker process (judge_worker.py) and what we last heard from it"""
+
+    def __init__(self, address: str):
+        self.address = address
+        host, _, port = address.split("://")[-1].rpartition(":")
+        self.host = host or "127.0.0.1"
+        self.port = int(port)
+        self.healthy = False
+        # Jobs this API process currently has on the worker
+        self.in_flight = 0
+        # runner -> readiness, slots and queue depth reported by the worker
+        self.runners: Dict[str, dict] = {}
+        self.checked_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        # Whether the worker's executors mount the API's dataset store, and so
+        # can read its datasets and stored references
+        self.shares_store = False
+
+    def serves(self, runner: str) -> bool:
+        return self.healthy and bool(self.runners.get(runner, {}).get("ready"))
+
+    def load(self, runner: str) -> float:
+        """Jobs per slot, counting the ones sent since the last health check"""
+        info = self.runners.get(runner, {})
+        queued = info.get("running", 0) + info.get("waiting", 0)
+        return (max(queued, self.in_flight) + 1) / max(1, info.get("slots", 1))
+
+    def to_dict(self) -> dict:
+        return {
+            "address": self.address,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "runners": self.runners,
+            "shares_store": self.shares_store,
+            "checked_at": self.checked_at,
+            "error": self.error
+        }
+
+
+class RemoteJudgePool:
+    """
+    Sends judge jobs to judge worker processes instead of the local executor pool.
+
+    Workers are listed in JUDGE_WORKER_URLS (`host:port`, comma separated). Each
+    job goes to the least loaded healthy worker that has the runner's image ready.
+    A worker that cannot be reached is marked unhealthy and the job fails over to
+    the next one; a worker with a full queue is skipped. Health and load are
+    polled in the background every HEALTH_INTERVAL seconds, along with the id
+    of the dataset store the worker sees.
+    """
+
+    def __init__(self):
+        load_dotenv()
+        addresses = [address.strip() for address in os.getenv("JUDGE_WORKER_URLS", "").split(",") if address.strip()]
+        self.workers: List[RemoteWorker] = [RemoteWorker(address) for address in addresses]
+        self.token = os.getenv("JUDGE_WORKER_TOKEN", "")
+        # Id of the API's dataset store, set on start
+        self.store_id: Optional[str] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+        if self.workers:
+            logger.info(f"Remote judge workers configured: {', '.join(addresses)}")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.workers)
+
+    async def _request(self, worker: RemoteWorker, request: dict, timeout: float) -> dict:
+        """Send one request line to a worker and read its one response line"""
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(worker.host, worker.port, limit=WORKER_LINE_LIMIT),
+                timeout=CONNECT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"Timed out connecting to {worker.address}")
+        try:
+            writer.write(json.dumps({**request, "token": self.token}).encode("utf-8") + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+        finally:
+            writer.close()
+        if not line:
+            raise ConnectionError(f"{worker.address} closed the connection without a response")
+        response = json.loads(line)
+        if response.get("error") == "unauthorized":
+            raise ConnectionError(f"{worker.address} rejected the judge worker token")
+        return response
+
+    async def check(self, worker: RemoteWorker):
+        try:
+            response = await self._request(worker, {"op": "health"}, HEALTH_TIMEOUT)
+            worker.runners = response.get("runners", {})
+            if not worker.healthy:
+                logger.info(f"Judge worker {worker.address} is healthy")
+            shares_store = self.store_id is not None and response.get("dataset_store") == self.store_id
+            if not shares_store and (worker.shares_store or not worker.healthy):
+                logger.warning(
+                    f"Judge worker {worker.address} does not share DATASET_STORE_PATH; "
+                    "its jobs are sent without stored references"
+                )
+            worker.shares_store = shares_store
+            worker.healthy = True
+            worker.error = None
+        except Exception as e:
+            if worker.healthy:
+                logger.warning(f"Judge worker {worker.address} is unhealthy: {str(e)}")
+            worker.healthy = False
+            worker.error = str(e)
+        finally:
+            worker.checked_at = datetime.now(timezone.utc)
+
+    async def check_all(self):
+        await asyncio.gather(*[self.check(worker) for worker in self.workers])
+
+    def is_ready(self, runner: str) -> bool:
+        return any(worker.serves(runner) for worker in self.workers)
+
+    def shares_store(self, runner: str) -> bool:
+        """Whether every worker a job of the runner may go to can read the API's dataset store"""
+        return all(worker.shares_store for worker in self.workers if worker.serves(runner))
+
+    async def run(self, runner: str, input_bytes: bytes, timeout: float) -> Tuple[int, bytes, bytes]:
+        """
+        Run one job on the least loaded worker and return (returncode, stdout, stderr).
+
+        Raises ExecutionTimeout if the job exceeds `timeout` seconds on the worker
+        and WorkerBusy if every available worker rejected it.
+        """
+        candidates = sorted(
+            (worker for worker in self.workers if worker.serves(runner)),
+            key=lambda worker: worker.load(runner)
+        )
+        if not candidates:
+            raise RuntimeError(f"No judge worker is available for {runner}")
+
+        request = {"op": "run", "runner": runner, "job": input_bytes.decode("utf-8"), "timeout": timeout}
+        retry_after = None
+        for worker in candidates:
+            worker.in_flight += 1
+            try:
+                response = await self._request(worker, request, timeout + RESPONSE_MARGIN)
+            except asyncio.TimeoutError:
+                raise ExecutionTimeout(f"Judge worker {worker.address} did not answer within {timeout + RESPONSE_MARGIN} seconds")
+            except (OSError, ValueError) as e:
+                # Jobs have no side effects, so it is safe to run this one elsewhere
+                logger.warning(f"Judge worker {worker.address} failed, failing over: {str(e)}")
+                worker.healthy = False
+                worker.error = str(e)
+                continue
+            finally:
+                worker.in_flight -= 1
+
+            error = response.get("error")
+            if error == "busy":
+                retry_after = min(retry_after or response["retry_after"], response["retry_after"])
+                continue
+            if error == "timeout":
+                raise ExecutionTimeout(response.get("detail") or f"Execution exceeded {timeout} seconds")
+            if error:
+                raise RuntimeError(f"Judge worker {worker.address}: {response.get('detail') or error}")
+            return (
+                response["returncode"],
+                response["stdout"].encode("utf-8"),
+                response["stderr"].encode("utf-8")
+            )
+
+        if retry_after is not None:
+            raise WorkerBusy(f"All judge workers for {runner} are busy", retry_after)
+        raise RuntimeError(f"No judge worker could run the {runner} job")
+
+    async def _health_loop(self):
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"Error checking judge workers: {str(e)}")
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    def start(self):
+        """Start the background health checks"""
+        self.store_id = store_id(create=True)
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+            logger.info("Remote judge pool started")
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        logger.info("Remote judge pool stopped")
+
+    def status(self) -> List[dict]:
+        return [worker.to_dict() for worker in self.workers]
+
+
+remote_judges = RemoteJudgePool()
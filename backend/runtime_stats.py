@@ -0,0 +1,73 @@
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Weight of the newest measurement in the moving average
+RUNTIME_SMOOTHING = 0.3
+
+
+class RuntimeStats:
+    """
+    Moving average of the wall time of each test case, per question.
+
+    Runtimes are keyed by a hash of the test input (its literal, dataset and
+    dtypes), so editing a question keeps the measurements of test cases that did
+    not change. Fail-fast submissions use them to run the cheapest test cases first.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @staticmethod
+    def key(test_case: dict) -> str:
+        payload = json.dumps(
+            [str(test_case.get('input', '')), test_case.get('dataset'), test_case.get('dtypes')],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    async def load(self, question_id: str) -> Dict[str, float]:
+        document = await self.collection.find_one({'_id': question_id})
+        return document.get('runtimes', {}) if document else {}
+
+    def cheapest_first(self, test_cases: List[dict], runtimes: Dict[str, float]) -> List[int]:
+        """Indices of the test cases ordered by average runtime; unmeasured ones go first"""
+        return sorted(
+            range(len(test_cases)),
+            key=lambda i: runtimes.get(self.key(test_cases[i]), 0.0)
+        )
+
+    @staticmethod
+    def in_question_order(results: List[dict], run_order: List[int]) -> List[dict]:
+        """Put the results of test cases run in `run_order` back in question order and renumber them"""
+        ordered_results = [None] * len(run_order)
+        for position, result in zip(run_order, results):
+            if 'test_case_number' in result:
+                result['test_case_number'] = position + 1
+            ordered_results[position] = result
+        return ordered_results
+
+    async def record(self, question_id: str, test_cases: List[dict], results: List[dict], runtimes: Dict[str, float]):
+        """Fold the wall times of a finished job into the averages"""
+        updates = {}
+        for test_case, result in zip(test_cases, results):
+            wall_time = result.get('wall_time')
+            if result.get('skipped') or wall_time is None:
+                continue
+            key = self.key(test_case)
+            previous = runtimes.get(key)
+            average = wall_time if previous is None else RUNTIME_SMOOTHING * wall_time + (1 - RUNTIME_SMOOTHING) * previous
+            updates[f'runtimes.{key}'] = round(average, 4)
+        if not updates:
+            return
+        updates['updated_at'] = datetime.now(timezone.utc)
+        try:
+            await self.collection.update_one({'_id': question_id}, {'$set': updates}, upsert=True)
+        except Exception as e:
+            logger.error(f"Failed to record test runtimes for question {question_id}: {str(e)}")
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How often the in-memory indexes are rebuilt from the collection, picking up
+# changes made by other API processes and by the rebuild script
+RELOAD_INTERVAL = 600  # seconds
+
+
+class ScoreIndex:
+    """
+    Number of users per integer score, in a Fenwick tree.
+
+    Adding, moving and counting users below or above a score are O(log n) in
+    the highest score. The tree doubles in size when a higher score comes in.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.total = 0
+
+    def _grow(self, score: int):
+        size = self.size
+        while score >= size:
+            size *= 2
+        counts = [self.count_between(value, value) for value in range(self.size)]
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.total = 0
+        for value, count in enumerate(counts):
+            if count:
+                self.add(value, count)
+
+    def add(self, score: int, count: int = 1):
+        score = max(0, int(score))
+        if score >= self.size:
+            self._grow(score)
+        self.total += count
+        position = score + 1
+        while position <= self.size:
+            self.tree[position] += count
+            position += position & -position
+
+    def move(self, old_score: int, new_score: int):
+        if old_score != new_score:
+            self.add(old_score, -1)
+            self.add(new_score, 1)
+
+    def count_at_most(self, score: int) -> int:
+        """Users with a score of at most `score`"""
+        if score < 0:
+            return 0
+        position = min(int(score), self.size - 1) + 1
+        count = 0
+        while position > 0:
+            count += self.tree[position]
+            position -= position & -position
+        return count
+
+    def count_between(self, low: int, high: int) -> int:
+        return self.count_at_most(high) - self.count_at_most(low - 1)
+
+    def count_below(self, score: int) -> int:
+        return self.count_at_most(score - 1)
+
+    def count_above(self, score: int) -> int:
+        return self.total - self.count_at_most(score)
+
+    def rank(self, score: int) -> int:
+        """1-based rank of a score; users with equal scores share a rank"""
+        return self.count_above(score) + 1
+
+
+class ReloadedScores:
+    """
+    Base for in-memory score indexes that are loaded from a collection at startup
+    and reloaded every RELOAD_INTERVAL seconds. Subclasses implement `load`.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._reload_task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        pass
+
+    async def load(self):
+        raise NotImplementedError
+
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Error reloading {type(self).__name__}: {str(e)}")
+
+    async def start(self):
+        """Load the indexes and keep reloading them in the background"""
+        await self.ensure_indexes()
+        await self.load()
+        if self._reload_task is None:
+            self._reload_task = asyncio.create_task(self._reload_loop())
+
+    async def stop(self):
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            try:
+                await self._reload_task
+            except asyncio.CancelledError:
+                pass
+            self._reload_task = None
+
+
+class ModuleScores(ReloadedScores):
+    """
+    Each user's score per module (the sum of their best question scores in it),
+    persisted in the module_scores collection with a ScoreIndex per module in memory.
+
+    Submissions change a module score with an atomic `$inc` by the improvement of
+    the best score, and the index moves the user in O(log n), so percentile and
+    rank lookups do not aggregate over users or submissions. The indexes are
+    loaded at startup and reloaded every RELOAD_INTERVAL seconds;
+    scripts/rebuild_module_scores.py rebuilds the collection from best_scores.
+    """
+
+    def __init__(self, collection):
+        super().__init__(collection)
+        self.indexes: Dict[str, ScoreIndex] = {}
+
+    @staticmethod
+    def key(module: str, user_id: str) -> str:
+        return f"{module}:{user_id}"
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("user_id", ASCENDING)])
+
+    async def load(self):
+        """Rebuild the in-memory indexes from the collection"""
+        indexes: Dict[str, ScoreIndex] = {}
+        async for document in self.collection.find({}, {"module": 1, "score": 1}):
+            indexes.setdefault(document["module"], ScoreIndex()).add(document.get("score", 0))
+        self.indexes = indexes
+        logger.info(f"Loaded module score indexes for {len(indexes)} modules")
+
+    async def add(self, module: str, user_id: str, delta: int):
+        """Change a user's score in a module by `delta`"""
+        before = await self.collection.find_one_and_update(
+            {"_id": self.key(module, user_id)},
+            {
+                "$inc": {"score": delta},
+                "$setOnInsert": {"module": module, "user_id": ObjectId(user_id)}
+            },
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        index = self.indexes.setdefault(module, ScoreIndex())
+        if before is None:
+            index.add(delta)
+        else:
+            previous = before.get("score", 0)
+            index.move(previous, previous + delta)
+
+    async def scores_of(self, user_id: str) -> Dict[str, int]:
+        documents = await self.collection.find({"user_id": ObjectId(user_id)}).to_list(length=None)
+        return {document["module"]: document.get("score", 0) for document in documents}
+
+    def percentile(self, module: str, score: int, total_users: int) -> float:
+        """Share of all users whose module score is not below `score`, as a percentage"""
+        if total_users <= 0:
+            return 100.0
+        index = self.indexes.get(module) or ScoreIndex()
+        # Users without an entry in the module have a score of 0
+        lower = total_users - index.total + index.count_below(score) if score > 0 else 0
+        lower = min(max(lower, 0), total_users)
+        return 100 - (lower / total_users) * 100
+
+    def rank(self, module: str, score: int) -> int:
+        index = self.indexes.get(module) or ScoreIndex()
+        return index.rank(score)
+
+
+class ProfileScores(ReloadedScores):
+    """
+    Total score of every profile in User_info, with one ScoreIndex over all of them.
+
+    The top percentage shown on profiles is the rank of the user's total score
+    among all profiles, which the index answers in O(log n) instead of loading
+    and sorting every profile's score per request. Profile writes update the
+    index through `set`; other processes' writes are picked up on reload.
+    """
+
+    def __init__(self, collection):
+        super().__init__(collection)
+        self.index = ScoreIndex()
+        self.scores: Dict[str, int] = {}
+
+    async def load(self):
+        """Rebuild the in-memory index from the profiles"""
+        index = ScoreIndex()
+        scores: Dict[str, int] = {}
+        async for profile in self.collection.find({}, {"user_id": 1, "total_score": 1}):
+            user_id = profile.get("user_id")
+            score = max(0, int(profile.get("total_score") or 0))
+            if user_id is None or user_id in scores:
+                continue
+            scores[user_id] = score
+            index.add(score)
+        self.index = index
+        self.scores = scores
+        logger.info(f"Loaded profile score index for {len(scores)} profiles")
+
+    def set(self, user_id: str, score: int):
+        """Record the current total score of a profile"""
+        score = max(0, int(score or 0))
+        previous = self.scores.get(user_id)
+        if previous is None:
+            self.index.add(score)
+        else:
+            self.index.move(previous, score)
+        self.scores[user_id] = score
+
+    def top_percentage(self, score: int) -> float:
+        """Rank of `score` among all profiles, as a percentage of the number of profiles"""
+        total_users = self.index.total
+        if total_users <= 0:
+            return 100.0
+        return round((self.index.rank(max(0, int(score or 0))) / total_users) * 100, 2)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime, timezone
+import os
+from dotenv import load_dotenv
+import logging
+from pymongo import ReplaceOne, UpdateOne
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection settings
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "alterhire")
+
+# Documents written per bulk request
+BATCH_SIZE = 1000
+
+async def rebuild_best_scores():
+    """
+    Rebuild the best_scores ledger and the total_score / question_ids of user_progress
+    from the submissions collection.
+
+    Run once before deploying the incremental ledger, and whenever submissions were
+    changed outside the API.
+    """
+    client = AsyncIOMotorClient(
+        MONGODB_URI,
+        serverSelectionTimeoutMS=5000,
+        connectTimeoutMS=10000,
+        socketTimeoutMS=45000
+    )
+    try:
+        db = client[DB_NAME]
+        submissions = db['submissions']
+        best_scores = db['best_scores']
+        user_progress = db['user_progress']
+
+        # Best successful score per user and question
+        pipeline = [
+            {"$match": {"status": "success"}},
+            {"$group": {
+                "_id": {"user_id": "$candidate_id", "question_id": "$question_id"},
+                "score": {"$max": "$score"}
+            }}
+        ]
+        now = datetime.now(timezone.utc)
+        ledger_count = 0
+        totals = {}
+        operations = []
+        async for row in submissions.aggregate(pipeline, allowDiskUse=True):
+            user_id = row["_id"]["user_id"]
+            question_id = row["_id"]["question_id"]
+            score = row["score"] or 0
+            ledger_id = f"{user_id}:{question_id}"
+            ledger_count += 1
+            operations.append(ReplaceOne(
+                {"_id": ledger_id},
+                {"_id": ledger_id, "user_id": user_id, "question_id": question_id, "score": score, "updated_at": now},
+                upsert=True
+            ))
+            total = totals.setdefault(user_id, {"total_score": 0, "question_ids": []})
+            total["total_score"] += score
+            total["question_ids"].append(question_id)
+            if len(operations) >= BATCH_SIZE:
+                await best_scores.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await best_scores.bulk_write(operations, ordered=False)
+
+        # Everything the rebuild did not write is stale
+        removed = await best_scores.delete_many({"updated_at": {"$lt": now}})
+        logger.info(f"Ledger rebuilt: {ledger_count} best scores, {removed.deleted_count} stale entries removed")
+
+        operations = [
+            UpdateOne({"user_id": user_id}, {"$set": total}, upsert=True)
+            for user_id, total in totals.items()
+        ]
+        for start in range(0, len(operations), BATCH_SIZE):
+            await user_progress.bulk_write(operations[start:start + BATCH_SIZE], ordered=False)
+        logger.info(f"User progress updated for {len(totals)} users")
+
+    finally:
+        client.close()
+        logger.info("MongoDB connection closed")
+
+def run_rebuild():
+    """Run the rebuild script"""
+    try:
+        asyncio.run(rebuild_best_scores())
+    except KeyboardInterrupt:
+        logger.info("Rebuild interrupted by user")
+    except Exception as e:
+        logger.error(f"Rebuild failed: {str(e)}")
+
+if __name__ == "__main__":
+    run_rebuild()
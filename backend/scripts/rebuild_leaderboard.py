@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+import logging
+from pymongo import ReplaceOne
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection settings
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "alterhire")
+
+# Documents written per bulk request
+BATCH_SIZE = 1000
+
+async def rebuild_leaderboard():
+    """
+    Rebuild the leaderboard read model from user_progress and candidate_login.
+
+    Run after scripts/rebuild_best_scores.py. The version bump makes running API
+    processes drop their cached pages.
+    """
+    client = AsyncIOMotorClient(
+        MONGODB_URI,
+        serverSelectionTimeoutMS=5000,
+        connectTimeoutMS=10000,
+        socketTimeoutMS=45000
+    )
+    try:
+        db = client[DB_NAME]
+        user_progress = db['user_progress']
+        leaderboard = db['leaderboard']
+        leaderboard_meta = db['leaderboard_meta']
+
+        # Progress joined with the user's name in one pass; users that no longer exist are left out
+        pipeline = [
+            {"$lookup": {
+                "from": "candidate_login",
+                "localField": "user_id",
+                "foreignField": "_id",
+                "as": "user"
+            }},
+            {"$unwind": "$user"},
+            {"$project": {
+                "user_id": 1,
+                "total_score": {"$ifNull": ["$total_score", 0]},
+                "questions_solved": {"$size": {"$ifNull": ["$question_ids", []]}},
+                "first_name": {"$ifNull": ["$user.firstName", ""]},
+                "last_name": {"$ifNull": ["$user.lastName", ""]}
+            }}
+        ]
+        user_ids = []
+        operations = []
+        async for row in user_progress.aggregate(pipeline, allowDiskUse=True):
+            user_ids.append(row["user_id"])
+            operations.append(ReplaceOne(
+                {"_id": row["user_id"]},
+                {
+                    "_id": row["user_id"],
+                    "user_name": f"{row['first_name']} {row['last_name']}".strip(),
+                    "total_score": row["total_score"],
+                    "questions_solved": row["questions_solved"]
+                },
+                upsert=True
+            ))
+            if len(operations) >= BATCH_SIZE:
+                await leaderboard.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await leaderboard.bulk_write(operations, ordered=False)
+
+        removed = await leaderboard.delete_many({"_id": {"$nin": user_ids}})
+        await leaderboard_meta.update_one({"_id": "leaderboard"}, {"$inc": {"version": 1}}, upsert=True)
+        logger.info(f"Leaderboard rebuilt: {len(user_ids)} entries, {removed.deleted_count} stale entries removed")
+
+    finally:
+        client.close()
+        logger.info("MongoDB connection closed")
+
+def run_rebuild():
+    """Run the rebuild script"""
+    try:
+        asyncio.run(rebuild_leaderboard())
+    except KeyboardInterrupt:
+        logger.info("Rebuild interrupted by user")
+    except Exception as e:
+        logger.error(f"Rebuild failed: {str(e)}")
+
+if __name__ == "__main__":
+    run_rebuild()
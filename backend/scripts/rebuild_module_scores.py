@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+import logging
+from pymongo import ReplaceOne
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection settings
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "alterhire")
+
+# Documents written per bulk request
+BATCH_SIZE = 1000
+
+async def rebuild_module_scores():
+    """
+    Rebuild the module_scores collection from the best_scores ledger.
+
+    Run after scripts/rebuild_best_scores.py, and after questions were moved to
+    another module. Running API processes pick the result up on their next reload.
+    """
+    client = AsyncIOMotorClient(
+        MONGODB_URI,
+        serverSelectionTimeoutMS=5000,
+        connectTimeoutMS=10000,
+        socketTimeoutMS=45000
+    )
+    try:
+        db = client[DB_NAME]
+        best_scores = db['best_scores']
+        module_scores = db['module_scores']
+
+        # Sum of best scores per module (Q_type) and user
+        pipeline = [
+            {"$lookup": {
+                "from": "Q_bank",
+                "localField": "question_id",
+                "foreignField": "_id",
+                "as": "question"
+            }},
+            {"$unwind": "$question"},
+            {"$match": {"question.Q_type": {"$nin": [None, ""]}}},
+            {"$group": {
+                "_id": {"module": "$question.Q_type", "user_id": "$user_id"},
+                "score": {"$sum": "$score"}
+            }}
+        ]
+        keys = []
+        operations = []
+        async for row in best_scores.aggregate(pipeline, allowDiskUse=True):
+            module = row["_id"]["module"]
+            user_id = row["_id"]["user_id"]
+            key = f"{module}:{user_id}"
+            keys.append(key)
+            operations.append(ReplaceOne(
+                {"_id": key},
+                {"_id": key, "module": module, "user_id": user_id, "score": row["score"]},
+                upsert=True
+            ))
+            if len(operations) >= BATCH_SIZE:
+                await module_scores.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await module_scores.bulk_write(operations, ordered=False)
+
+        removed = await module_scores.delete_many({"_id": {"$nin": keys}})
+        logger.info(f"Module scores rebuilt: {len(keys)} entries, {removed.deleted_count} stale entries removed")
+
+    finally:
+        client.close()
+        logger.info("MongoDB connection closed")
+
+def run_rebuild():
+    """Run the rebuild script"""
+    try:
+        asyncio.run(rebuild_module_scores())
+    except KeyboardInterrupt:
+        logger.info("Rebuild interrupted by user")
+    except Exception as e:
+        logger.error(f"Rebuild failed: {str(e)}")
+
+if __name__ == "__main__":
+    run_rebuild()
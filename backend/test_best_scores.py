@@ -0,0 +1,122 @@
+import asyncio
+from bson import ObjectId
+from best_scores import BestScoreLedger, ScoreChange, best_submissions
+
+USER_ID = str(ObjectId())
+QUESTION_ID = str(ObjectId())
+
+
+def test_first_submission_is_a_first_solve(database):
+    ledger = BestScoreLedger(database['best_scores'])
+    change = asyncio.run(ledger.record(USER_ID, QUESTION_ID, 40))
+    assert change.first_solve
+    assert change.previous is None
+    assert change.best == 40
+    assert change.delta == 40
+
+
+def test_higher_resubmission_adds_only_the_improvement(database):
+    ledger = BestScoreLedger(database['best_scores'])
+
+    async def submit():
+        await ledger.record(USER_ID, QUESTION_ID, 40)
+        return await ledger.record(USER_ID, QUESTION_ID, 70)
+
+    change = asyncio.run(submit())
+    assert not change.first_solve
+    assert (change.previous, change.best, change.delta) == (40, 70, 30)
+    stored = asyncio.run(database['best_scores'].find_one({'_id': ledger.key(USER_ID, QUESTION_ID)}))
+    assert stored['score'] == 70
+
+
+def test_lower_resubmission_keeps_the_best_and_adds_nothing(database):
+    ledger = BestScoreLedger(database['best_scores'])
+
+    async def submit():
+        await ledger.record(USER_ID, QUESTION_ID, 70)
+        return await ledger.record(USER_ID, QUESTION_ID, 20)
+
+    change = asyncio.run(submit())
+    assert not change.first_solve
+    assert (change.previous, change.best, change.delta) == (70, 70, 0)
+    stored = asyncio.run(database['best_scores'].find_one({'_id': ledger.key(USER_ID, QUESTION_ID)}))
+    assert stored['score'] == 70
+
+
+def test_equal_resubmission_is_not_a_first_solve():
+    change = ScoreChange(50, 50)
+    assert not change.first_solve
+    assert change.delta == 0
+
+
+def test_deltas_sum_to_the_best_score(database):
+    ledger = BestScoreLedger(database['best_scores'])
+
+    async def submit(scores):
+        return [await ledger.record(USER_ID, QUESTION_ID, score) for score in scores]
+
+    scores = [10, 5, 30, 30, 25, 60, 0]
+    changes = asyncio.run(submit(scores))
+    assert sum(change.delta for change in changes) == max(scores)
+    assert sum(1 for change in changes if change.first_solve) == 1
+
+
+def add_submissions(database, user_id: ObjectId, rows: list):
+    """rows: (question_id, score, status, day)"""
+    async def insert():
+        for question_id, score, status, day in rows:
+            await database['submissions'].insert_one({
+                'candidate_id': user_id,
+                'question_id': question_id,
+                'score': score,
+                'status': status,
+                'submitted_at': f"2026-01-{day:02d}"
+            })
+
+    asyncio.run(insert())
+
+
+def test_best_submissions_takes_the_best_successful_one_per_question(database):
+    user_id, other_user = ObjectId(), ObjectId()
+    first, second, unsolved = ObjectId(), ObjectId(), ObjectId()
+    add_submissions(database, user_id, [
+        (first, 40, 'success', 1),
+        (first, 90, 'success', 2),
+        (first, 100, 'failed', 3),
+        (second, 10, 'success', 4),
+        (unsolved, 50, 'failed', 5),
+    ])
+    add_submissions(database, other_user, [(first, 100, 'success', 6)])
+
+    best = asyncio.run(best_submissions(database['submissions'], user_id, [str(first), str(second), str(unsolved)]))
+    assert set(best) == {str(first), str(second)}
+    assert (best[str(first)]['score'], best[str(first)]['submitted_at']) == (90, "2026-01-02")
+    assert (best[str(second)]['score'], best[str(second)]['submitted_at']) == (10, "2026-01-04")
+
+
+def test_best_submissions_only_looks_at_the_given_questions(database):
+    user_id = ObjectId()
+    asked, other = ObjectId(), ObjectId()
+    add_submissions(database, user_id, [(asked, 5, 'success', 1), (other, 7, 'success', 2)])
+
+    best = asyncio.run(best_submissions(database['submissions'], user_id, [asked]))
+    assert list(best) == [str(asked)]
+    assert asyncio.run(best_submissions(database['submissions'], user_id, [])) == {}
+
+
+def test_best_submissions_joins_question_details(database):
+    user_id = ObjectId()
+    kept, deleted = ObjectId(), ObjectId()
+
+    async def add_question():
+        await database['Q_bank'].insert_one({
+            '_id': kept, 'title': 'Drop nulls', 'category': ['cleaning'], 'points': 100, 'working_driver': 'def f(df): ...'
+        })
+
+    asyncio.run(add_question())
+    add_submissions(database, user_id, [(kept, 60, 'success', 1), (deleted, 30, 'success', 2)])
+
+    best = asyncio.run(best_submissions(database['submissions'], user_id, [kept, deleted], with_questions=True))
+    assert list(best) == [str(kept)]
+    assert best[str(kept)]['score'] == 60
+    assert best[str(kept)]['question'] == {'title': 'Drop nulls', 'category': ['cleaning'], 'points': 100}
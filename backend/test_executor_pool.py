@@ -0,0 +1,94 @@
+import json
+import pytest
+from executor_pool import RUNNERS, ExecutorConfig, JOB_OVERHEAD, job_id_prefix, memory_mb, with_job_id
+
+PREFIX = RUNNERS["pandas"]["env_prefix"]
+SETTINGS = ("MEMORY", "CPUS", "PARALLELISM", "TEST_TIME_LIMIT", "TEST_CPU_LIMIT", "TEST_MEMORY_MB")
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """Builds the pandas config from the given settings, ignoring any set in the environment"""
+    for setting in SETTINGS:
+        monkeypatch.delenv(f"{PREFIX}_{setting}", raising=False)
+
+    def build(**settings) -> ExecutorConfig:
+        for setting, value in settings.items():
+            monkeypatch.setenv(f"{PREFIX}_{setting.upper()}", str(value))
+        return ExecutorConfig("pandas", RUNNERS["pandas"])
+    return build
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("512m", 512), ("2g", 2048), ("1.5g", 1536), ("786432k", 768), ("268435456", 256), (" 1G ", 1024)
+])
+def test_memory_values(value, expected):
+    assert memory_mb(value) == expected
+
+
+def test_defaults(config):
+    executor = config()
+    assert executor.parallelism == 1
+    assert executor.memory == "512m"
+    assert executor.cpus == "1"
+    assert executor.limits() == {"time": 10.0, "cpu": 10.0, "memory_mb": 256}
+
+
+def test_memory_and_cpus_grow_with_parallelism(config):
+    executor = config(parallelism=4, test_memory_mb=300, cpus=0.5)
+    assert executor.memory == f"{256 + 4 * 300}m"
+    assert executor.cpus == "2"
+
+
+def test_a_set_memory_caps_parallelism(config):
+    executor = config(memory="1g", parallelism=8, test_memory_mb=256)
+    assert executor.memory == "1g"
+    # 1024 MB holds the executor's 256 MB and three test cases of 256 MB
+    assert executor.parallelism == 3
+    assert executor.cpus == "3"
+
+
+def test_a_set_memory_that_fits_keeps_parallelism(config):
+    executor = config(memory="2g", parallelism=2, test_memory_mb=256)
+    assert (executor.memory, executor.parallelism) == ("2g", 2)
+
+
+def test_a_set_memory_too_small_for_one_test_case_still_runs_one(config):
+    assert config(memory="300m", parallelism=4, test_memory_mb=256).parallelism == 1
+
+
+def test_parallelism_is_at_least_one(config):
+    executor = config(parallelism=0)
+    assert executor.parallelism == 1
+    assert executor.memory == "512m"
+
+
+def test_job_timeout_without_parallelism(config):
+    executor = config(test_time_limit=2)
+    assert executor.job_timeout(1) == 2 + JOB_OVERHEAD
+    assert executor.job_timeout(5) == 5 * 2 + JOB_OVERHEAD
+    # A job without test cases still gets one round
+    assert executor.job_timeout(0) == 2 + JOB_OVERHEAD
+
+
+def test_job_timeout_counts_rounds_of_parallel_test_cases(config):
+    executor = config(test_time_limit=3, parallelism=4)
+    assert executor.job_timeout(1) == 3 + JOB_OVERHEAD
+    assert executor.job_timeout(4) == 3 + JOB_OVERHEAD
+    assert executor.job_timeout(5) == 2 * 3 + JOB_OVERHEAD
+    assert executor.job_timeout(9) == 3 * 3 + JOB_OVERHEAD
+
+
+def test_job_timeout_uses_the_capped_parallelism(config):
+    executor = config(memory="768m", parallelism=4, test_memory_mb=256, test_time_limit=1)
+    assert executor.parallelism == 2
+    assert executor.job_timeout(4) == 2 + JOB_OVERHEAD
+
+
+def test_job_ids_are_added_in_front():
+    job = with_job_id(b'{"code": "x", "test_cases": []}\n', "abc")
+    assert job.startswith(job_id_prefix("abc"))
+    assert json.loads(job) == {"job_id": "abc", "code": "x", "test_cases": []}
+    assert json.loads(with_job_id(b'{ }', "abc")) == {"job_id": "abc"}
+    with pytest.raises(ValueError):
+        with_job_id(b'[]', "abc")
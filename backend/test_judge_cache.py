@@ -0,0 +1,137 @@
+import pytest
+import judge_cache as judge_cache_module
+from executor_images import executor_images
+from judge_cache import JudgeCache, normalize_code
+
+CODE = """def solve(df):
+    # keep the positive rows
+    return df[df['a'] > 0]
+"""
+
+QUESTION = {
+    'docker_runner': 'pandas',
+    'testCases': [{'input': "{'a': [1, -1]}", 'output': '', 'is_hidden': False}],
+    'working_driver': "def solve(df):\n    return df[df['a'] > 0]\n",
+    'comparison': {'rtol': 1e-9},
+    'fail_fast': 0,
+}
+
+LIMITS = {'time_s': 10, 'cpu_s': 10, 'memory_mb': 256}
+
+
+@pytest.fixture
+def image_hash(monkeypatch):
+    """Pin the content hash of the pandas image; returns a setter"""
+    monkeypatch.setattr(executor_images.images['pandas'], 'content_hash', 'image-a')
+
+    def set_hash(content_hash: str):
+        monkeypatch.setattr(executor_images.images['pandas'], 'content_hash', content_hash)
+    return set_hash
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setenv("JUDGE_CACHE_SIZE", "3")
+    monkeypatch.setenv("JUDGE_CACHE_TTL", "60")
+    return JudgeCache()
+
+
+def key(code=CODE, question=QUESTION, is_submission=True, limits=LIMITS) -> str:
+    return JudgeCache.key(code, question, is_submission, limits)
+
+
+def test_comments_blank_lines_and_spacing_do_not_change_the_code():
+    edited = """
+
+def solve( df ):   # filter
+        # a comment on its own line
+
+        return df[ df['a']>0 ]
+"""
+    assert normalize_code(edited) == normalize_code(CODE)
+
+
+def test_changes_that_matter_change_the_code():
+    assert normalize_code(CODE.replace("> 0", ">= 0")) != normalize_code(CODE)
+    # A string is not a comment, and its spacing is part of the value
+    assert normalize_code("print('a  b')") != normalize_code("print('a b')")
+    # Indentation decides which block a statement is in
+    nested = "if x:\n    a()\n    b()\n"
+    dedented = "if x:\n    a()\nb()\n"
+    assert normalize_code(nested) != normalize_code(dedented)
+
+
+def test_code_that_does_not_tokenize_is_kept():
+    assert normalize_code("def f(:\n    '''open   \n") == "def f(:\n    '''open"
+
+
+def test_whitespace_and_comment_edits_keep_the_key(image_hash):
+    assert key(code="def solve(df):\n    return df[df['a']>0]  # same\n") == key()
+
+
+@pytest.mark.parametrize('change', [
+    lambda q: {**q, 'testCases': q['testCases'] + [{'input': "{'a': [2]}", 'output': '', 'is_hidden': True}]},
+    lambda q: {**q, 'testCases': [{**q['testCases'][0], 'dtypes': {'a': 'Int64'}}]},
+    lambda q: {**q, 'testCases': [{'dataset': 'f' * 64, 'output': '', 'is_hidden': False}]},
+    lambda q: {**q, 'working_driver': q['working_driver'].replace('> 0', '>= 0')},
+    lambda q: {**q, 'comparison': {'rtol': 1e-6}},
+    lambda q: {**q, 'comparison': {'rtol': 1e-9, 'check_dtype': True}},
+    lambda q: {**q, 'fail_fast': 1},
+    lambda q: {**q, 'docker_runner': 'only_python'},
+])
+def test_every_part_of_the_question_changes_the_key(image_hash, change):
+    assert key(question=change(QUESTION)) != key()
+
+
+def test_code_submission_limits_and_image_change_the_key(image_hash):
+    original = key()
+    assert key(code=CODE.replace("> 0", "< 0")) != original
+    assert key(is_submission=False) != original
+    assert key(limits={**LIMITS, 'memory_mb': 512}) != original
+    assert key(limits={**LIMITS, 'time_s': 5}) != original
+    image_hash('image-b')
+    assert key() != original
+
+
+def test_results_are_copies(cache):
+    cache.put("k", "q1", {'results': [{'passed': True}]})
+    cache.get("k")['results'][0]['passed'] = False
+    assert cache.get("k") == {'results': [{'passed': True}]}
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_entries_expire_after_the_ttl(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(judge_cache_module.time, 'monotonic', lambda: now[0])
+    cache.put("k", "q1", {'results': []})
+    now[0] += 60
+    assert cache.get("k") is not None
+    now[0] += 0.5
+    assert cache.get("k") is None
+    assert cache.metrics()['entries'] == 0
+    assert cache.misses == 1
+
+
+def test_the_least_recently_used_entry_is_evicted(cache):
+    for name in ("a", "b", "c"):
+        cache.put(name, "q1", {'results': [name]})
+    cache.get("a")
+    cache.put("d", "q1", {'results': ['d']})
+    assert cache.get("b") is None
+    assert [cache.get(name) is not None for name in ("a", "c", "d")] == [True, True, True]
+
+
+def test_invalidate_drops_only_that_question(cache):
+    cache.put("a", "q1", {'results': []})
+    cache.put("b", "q2", {'results': []})
+    cache.put("c", "q1", {'results': []})
+    cache.invalidate("q1")
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.get("b") is not None
+
+
+def test_a_disabled_cache_stores_nothing(monkeypatch):
+    monkeypatch.setenv("JUDGE_CACHE_SIZE", "0")
+    cache = JudgeCache()
+    cache.put("k", "q1", {'results': []})
+    assert cache.get("k") is None
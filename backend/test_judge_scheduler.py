@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from executor_pool import ExecutionTimeout
+from judge_scheduler import JudgeQueueFull, JudgeScheduler, RunnerQueue, summarize
+from remote_judges import WorkerBusy
+
+RUNNER = "pandas"
+
+
+class FakeRunner:
+    """Stands in for the executors: each job runs until `finish` is set, or raises `error`"""
+
+    def __init__(self):
+        self.finish = asyncio.Event()
+        self.started = 0
+        self.error = None
+
+    async def run(self, runner: str, input_bytes: bytes, timeout: float):
+        self.started += 1
+        if self.error is not None:
+            raise self.error
+        await self.finish.wait()
+        return 0, input_bytes, b""
+
+    async def wait_started(self, count: int):
+        while self.started < count:
+            await asyncio.sleep(0)
+
+
+def make_scheduler(slots: int = 2, max_queue: int = 1, queue_timeout: float = 30) -> JudgeScheduler:
+    scheduler = JudgeScheduler()
+    scheduler.queues = {RUNNER: RunnerQueue(RUNNER, slots, max_queue, queue_timeout)}
+    scheduler.remote = FakeRunner()
+    return scheduler
+
+
+def test_jobs_beyond_the_slots_and_queue_are_rejected():
+    async def fill():
+        scheduler = make_scheduler(slots=2, max_queue=1)
+        queue = scheduler.queues[RUNNER]
+        jobs = [asyncio.create_task(scheduler.run(RUNNER, f"job {i}".encode(), timeout=5)) for i in range(3)]
+        await scheduler.remote.wait_started(2)
+        await asyncio.sleep(0)
+        assert (queue.running, queue.waiting) == (2, 1)
+
+        with pytest.raises(JudgeQueueFull) as rejected:
+            await scheduler.run(RUNNER, b"one too many", timeout=5)
+        # No run times yet: 5 seconds per job, for the waiting job and this one, over 2 slots
+        assert rejected.value.retry_after == 5
+        assert scheduler.remote.started == 2
+
+        scheduler.remote.finish.set()
+        results = await asyncio.gather(*jobs)
+        return queue, results
+
+    queue, results = asyncio.run(fill())
+    assert [stdout for _, stdout, _ in results] == [b"job 0", b"job 1", b"job 2"]
+    snapshot = queue.snapshot()
+    assert (snapshot["running"], snapshot["waiting"]) == (0, 0)
+    assert (snapshot["completed"], snapshot["rejected"], snapshot["failed"]) == (3, 1, 0)
+    assert len(queue.queue_times) == len(queue.run_times) == 3
+
+
+def test_a_job_that_waits_too_long_for_a_slot_is_rejected():
+    async def wait_for_slot():
+        scheduler = make_scheduler(slots=1, max_queue=5, queue_timeout=0.05)
+        queue = scheduler.queues[RUNNER]
+        holding = asyncio.create_task(scheduler.run(RUNNER, b"slow", timeout=5))
+        await scheduler.remote.wait_started(1)
+        with pytest.raises(JudgeQueueFull, match="Timed out waiting"):
+            await scheduler.run(RUNNER, b"waiting", timeout=5)
+        assert queue.waiting == 0
+        scheduler.remote.finish.set()
+        await holding
+        return queue
+
+    queue = asyncio.run(wait_for_slot())
+    assert (queue.completed, queue.rejected) == (1, 1)
+    assert not queue.semaphore.locked()
+
+
+def test_retry_after_follows_recent_run_times():
+    queue = RunnerQueue(RUNNER, slots=2, max_queue=10, queue_timeout=30)
+    assert queue.retry_after() == 3
+    queue.run_times.extend([2.0, 4.0])
+    queue.waiting = 3
+    assert queue.retry_after() == 6
+    queue.run_times.clear()
+    queue.run_times.append(0.01)
+    queue.waiting = 0
+    assert queue.retry_after() == 1
+
+
+@pytest.mark.parametrize('error, raised, counter', [
+    (ExecutionTimeout("too slow"), ExecutionTimeout, "timed_out"),
+    (RuntimeError("broken"), RuntimeError, "failed"),
+    (WorkerBusy("all busy", 7), JudgeQueueFull, "rejected"),
+])
+def test_failures_are_counted_and_free_their_slot(error, raised, counter):
+    async def fail():
+        scheduler = make_scheduler(slots=1)
+        scheduler.remote.error = error
+        with pytest.raises(raised) as e:
+            await scheduler.run(RUNNER, b"job", timeout=5)
+        scheduler.remote.error = None
+        scheduler.remote.finish.set()
+        await scheduler.run(RUNNER, b"next", timeout=5)
+        return scheduler.queues[RUNNER], e.value
+
+    queue, e = asyncio.run(fail())
+    snapshot = queue.snapshot()
+    assert snapshot[counter] == 1
+    assert snapshot["completed"] == 1
+    assert snapshot["running"] == 0
+    if isinstance(e, JudgeQueueFull):
+        # Busy judge workers pass their own retry hint on to the 503
+        assert e.retry_after == 7
+
+
+def test_unknown_runners_are_refused():
+    with pytest.raises(ValueError):
+        asyncio.run(make_scheduler().run("cobol", b"job", timeout=5))
+
+
+def test_summarize():
+    assert summarize([]) == {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    assert summarize(list(range(1, 101))) == {"avg": 50.5, "p50": 50, "p95": 95, "max": 100}
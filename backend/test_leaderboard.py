@@ -0,0 +1,102 @@
+import asyncio
+import random
+import pytest
+from bson import ObjectId
+from leaderboard import Leaderboard, LeaderboardCursorError
+
+
+def make_leaderboard(database, scores: list) -> Leaderboard:
+    leaderboard = Leaderboard(database['leaderboard'], database['leaderboard_meta'])
+
+    async def fill():
+        for i, score in enumerate(scores):
+            await leaderboard.record(str(ObjectId()), f"user {i}", score, True)
+
+    asyncio.run(fill())
+    return leaderboard
+
+
+def expected_ranks(scores: list) -> list:
+    """Competition ranks of the scores in leaderboard order"""
+    ordered = sorted(scores, reverse=True)
+    return [sum(1 for s in ordered if s > score) + 1 for score in ordered]
+
+
+def test_pages_rank_ties_together(database):
+    rng = random.Random(5)
+    scores = [rng.choice([0, 10, 20, 30, 40]) for _ in range(37)]
+    leaderboard = make_leaderboard(database, scores)
+
+    async def all_pages():
+        rankings = []
+        for page in range(1, 6):
+            rankings += (await leaderboard.page(page=page, limit=8))['rankings']
+        return rankings
+
+    rankings = asyncio.run(all_pages())
+    assert [entry['total_score'] for entry in rankings] == sorted(scores, reverse=True)
+    assert [entry['rank'] for entry in rankings] == expected_ranks(scores)
+
+
+def test_cursor_pages_match_numbered_pages(database):
+    rng = random.Random(9)
+    scores = [rng.choice([5, 15, 25]) for _ in range(23)]
+    leaderboard = make_leaderboard(database, scores)
+
+    async def walk():
+        pages = []
+        result = await leaderboard.page(limit=5)
+        pages.append(result)
+        while result['next_cursor']:
+            result = await leaderboard.page(limit=5, cursor=result['next_cursor'])
+            pages.append(result)
+        numbered = [await leaderboard.page(page=i, limit=5) for i in range(1, len(pages) + 1)]
+        return pages, numbered
+
+    pages, numbered = asyncio.run(walk())
+    assert len(pages) == 5
+    assert [result['page'] for result in pages] == [1, 2, 3, 4, 5]
+    for by_cursor, by_number in zip(pages, numbered):
+        assert by_cursor['rankings'] == by_number['rankings']
+    assert pages[-1]['next_cursor'] is None
+
+
+def test_a_write_invalidates_cached_pages(database):
+    leaderboard = make_leaderboard(database, [30, 20, 10])
+    user_id = str(ObjectId())
+
+    async def read_write_read():
+        first = await leaderboard.page(limit=10)
+        again = await leaderboard.page(limit=10)
+        version = await leaderboard.version()
+        await leaderboard.record(user_id, "newcomer", 25, True)
+        after = await leaderboard.page(limit=10)
+        return first, again, version, await leaderboard.version(), after
+
+    first, again, version, new_version, after = asyncio.run(read_write_read())
+    assert again is first
+    assert new_version == version + 1
+    assert after is not first
+    assert [entry['user_name'] for entry in after['rankings']][:2] == ["user 0", "newcomer"]
+    assert [entry['rank'] for entry in after['rankings']] == [1, 2, 3, 4]
+
+
+def test_record_adds_deltas_and_counts_first_solves(database):
+    leaderboard = make_leaderboard(database, [])
+    user_id = str(ObjectId())
+
+    async def submit():
+        await leaderboard.record(user_id, "user", 10, True)
+        await leaderboard.record(user_id, "user", 15, False)
+        await leaderboard.record(user_id, "user", 40, True)
+        return await leaderboard.page()
+
+    entry, = asyncio.run(submit())['rankings']
+    assert entry['total_score'] == 65
+    assert entry['questions_solved'] == 2
+
+
+def test_a_malformed_cursor_is_rejected(database):
+    leaderboard = make_leaderboard(database, [10])
+    with pytest.raises(LeaderboardCursorError):
+        asyncio.run(leaderboard.page(cursor="not-a-cursor"))
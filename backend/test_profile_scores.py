@@ -0,0 +1,53 @@
+import asyncio
+import random
+from score_index import ProfileScores
+
+
+def brute_force_top_percentage(scores: list, score: int) -> float:
+    """The old computation: position of the score in the sorted list of all profile scores"""
+    ordered = sorted(scores, reverse=True)
+    rank = ordered.index(score) + 1 if score in ordered else len(ordered)
+    return round((rank / len(ordered)) * 100, 2) if ordered else 100.0
+
+
+def test_top_percentage_matches_the_sorted_list():
+    rng = random.Random(13)
+    profile_scores = ProfileScores(None)
+    scores = {}
+    for _ in range(2000):
+        user_id = str(rng.randrange(150))
+        scores[user_id] = rng.randrange(0, 500)
+        profile_scores.set(user_id, scores[user_id])
+
+    for score in scores.values():
+        assert profile_scores.top_percentage(score) == brute_force_top_percentage(list(scores.values()), score)
+
+
+def test_no_profiles_is_top_100_percent():
+    assert ProfileScores(None).top_percentage(50) == 100.0
+
+
+def test_setting_the_same_user_again_moves_them(database):
+    profile_scores = ProfileScores(database['User_info'])
+    profile_scores.set("a", 10)
+    profile_scores.set("b", 20)
+    profile_scores.set("a", 30)
+    assert profile_scores.index.total == 2
+    assert profile_scores.top_percentage(30) == 50.0
+    assert profile_scores.top_percentage(20) == 100.0
+
+
+def test_load_reads_every_profile_once(database):
+    profiles = database['User_info']
+
+    async def load():
+        for user_id, score in [("a", 10), ("b", None), ("c", 40), ("a", 99)]:
+            await profiles.insert_one({"user_id": user_id, "total_score": score})
+        profile_scores = ProfileScores(profiles)
+        await profile_scores.load()
+        return profile_scores
+
+    profile_scores = asyncio.run(load())
+    assert profile_scores.scores == {"a": 10, "b": 0, "c": 40}
+    assert profile_scores.top_percentage(40) == round(1 / 3 * 100, 2)
+    assert profile_scores.top_percentage(0) == 100.0
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import pytest
+import dataset_store
+from executor_pool import ExecutionTimeout
+from judge_worker import JudgeWorkerServer
+from remote_judges import RemoteJudgePool, RemoteWorker, WorkerBusy
+
+
+def make_pool(responses: dict) -> RemoteJudgePool:
+    """A pool whose workers answer from `responses`: address -> response or exception"""
+    pool = RemoteJudgePool()
+    pool.workers = [RemoteWorker(address) for address in responses]
+    # Addresses of the workers asked, in order
+    pool.asked = []
+
+    async def request(worker, request, timeout):
+        pool.asked.append(worker.address)
+        response = responses[worker.address]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    pool._request = request
+    return pool
+
+
+def health(store: str = None, **runners) -> dict:
+    return {"status": "ok", "dataset_store": store, "runners": runners}
+
+
+READY = {"ready": True, "slots": 2, "running": 0, "waiting": 0}
+
+
+def test_store_id_is_created_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, 'DATASET_DIR', tmp_path)
+    monkeypatch.setattr(dataset_store, 'STORE_ID_FILE', tmp_path / ".store_id")
+    assert dataset_store.store_id() is None
+    created = dataset_store.store_id(create=True)
+    assert created
+    assert dataset_store.store_id() == dataset_store.store_id(create=True) == created
+    assert [path.name for path in tmp_path.iterdir()] == [".store_id"]
+
+
+def test_workers_that_see_another_store_do_not_share_it():
+    pool = make_pool({
+        "a:1": health("store", pandas=READY),
+        "b:1": health("elsewhere", pandas=READY),
+        "c:1": health(None, only_python=READY),
+    })
+    pool.store_id = "store"
+    asyncio.run(pool.check_all())
+    assert [worker.shares_store for worker in pool.workers] == [True, False, False]
+    assert not pool.shares_store("pandas")
+    # Only the workers that serve the runner count
+    assert pool.shares_store("sql")
+
+    pool.workers[1].healthy = False
+    assert pool.shares_store("pandas")
+
+
+def ready_pool(responses: dict, loads: dict = None) -> RemoteJudgePool:
+    """A pool of healthy pandas workers with `running` jobs each from `loads`"""
+    pool = make_pool(responses)
+    for worker in pool.workers:
+        worker.healthy = True
+        worker.runners = {"pandas": {**READY, "running": (loads or {}).get(worker.address, 0)}}
+    return pool
+
+
+def result(stdout: str) -> dict:
+    return {"returncode": 0, "stdout": stdout, "stderr": ""}
+
+
+def test_jobs_go_to_the_least_loaded_worker():
+    pool = ready_pool({"a:1": result("a"), "b:1": result("b"), "c:1": result("c")}, {"a:1": 3, "b:1": 1, "c:1": 2})
+    assert asyncio.run(pool.run("pandas", b"{}", timeout=5)) == (0, b"b", b"")
+    assert pool.asked == ["b:1"]
+
+    # Jobs this process has in flight count even before the next health check
+    pool.workers[1].in_flight = 5
+    pool.asked.clear()
+    asyncio.run(pool.run("pandas", b"{}", timeout=5))
+    assert pool.asked == ["c:1"]
+
+
+def test_workers_without_the_runner_ready_are_skipped():
+    pool = ready_pool({"a:1": result("a"), "b:1": result("b")}, {"b:1": 1})
+    pool.workers[0].runners["pandas"]["ready"] = False
+    assert asyncio.run(pool.run("pandas", b"{}", timeout=5))[1] == b"b"
+    pool.workers[1].healthy = False
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.run("pandas", b"{}", timeout=5))
+
+
+def test_a_connection_error_fails_over_to_the_next_worker():
+    pool = ready_pool({"a:1": ConnectionRefusedError("refused"), "b:1": result("b")}, {"b:1": 1})
+    assert asyncio.run(pool.run("pandas", b"{}", timeout=5)) == (0, b"b", b"")
+    assert pool.asked == ["a:1", "b:1"]
+    assert not pool.workers[0].healthy
+    assert "refused" in pool.workers[0].error
+    assert [worker.in_flight for worker in pool.workers] == [0, 0]
+
+
+def test_a_busy_worker_is_skipped():
+    busy = {"error": "busy", "detail": "full", "retry_after": 4}
+    pool = ready_pool({"a:1": busy, "b:1": result("b")}, {"b:1": 1})
+    assert asyncio.run(pool.run("pandas", b"{}", timeout=5)) == (0, b"b", b"")
+    assert pool.asked == ["a:1", "b:1"]
+    assert pool.workers[0].healthy
+
+
+def test_every_worker_busy_is_reported_with_the_shortest_retry():
+    pool = ready_pool({
+        "a:1": {"error": "busy", "retry_after": 9},
+        "b:1": {"error": "busy", "retry_after": 3},
+        "c:1": ConnectionResetError("reset"),
+    })
+    with pytest.raises(WorkerBusy) as e:
+        asyncio.run(pool.run("pandas", b"{}", timeout=5))
+    assert e.value.retry_after == 3
+
+
+def test_a_timed_out_job_is_not_run_again():
+    pool = ready_pool({"a:1": {"error": "timeout", "detail": "too slow"}, "b:1": result("b")}, {"b:1": 1})
+    with pytest.raises(ExecutionTimeout, match="too slow"):
+        asyncio.run(pool.run("pandas", b"{}", timeout=5))
+    assert pool.asked == ["a:1"]
+
+
+def test_an_oversized_request_line_gets_a_bad_request():
+    async def send(line: bytes) -> dict:
+        server = await asyncio.start_server(JudgeWorkerServer("token").handle, "127.0.0.1", 0, limit=64)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(line)
+            await writer.drain()
+            response = await reader.readline()
+            writer.close()
+            return json.loads(response)
+
+    assert asyncio.run(send(b"x" * 200 + b"\n"))["error"] == "bad_request"
+    assert asyncio.run(send(b"not json\n"))["error"] == "bad_request"
+    assert asyncio.run(send(b'{"token": "wrong", "op": "health"}\n')) == {"error": "unauthorized"}
@@ -0,0 +1,90 @@
+import asyncio
+from runtime_stats import RuntimeStats, RUNTIME_SMOOTHING
+
+QUESTION_ID = "question"
+
+
+def literal_cases(count: int) -> list:
+    return [{'input': f"{{'a': [{i}]}}"} for i in range(count)]
+
+
+def test_every_part_of_the_input_changes_the_key():
+    base = {'input': "{'a': [1]}"}
+    keys = {
+        RuntimeStats.key(base),
+        RuntimeStats.key({**base, 'input': "{'a': [2]}"}),
+        RuntimeStats.key({**base, 'dataset': 'f' * 64}),
+        RuntimeStats.key({**base, 'dtypes': {'a': 'Int64'}}),
+    }
+    assert len(keys) == 4
+    # Only the input decides the key, not the expected output or visibility
+    assert RuntimeStats.key(base) == RuntimeStats.key({**base, 'output': 'x', 'is_hidden': True})
+
+
+def test_unmeasured_test_cases_run_first_in_question_order():
+    stats = RuntimeStats(None)
+    test_cases = literal_cases(5)
+    assert stats.cheapest_first(test_cases, {}) == [0, 1, 2, 3, 4]
+
+    runtimes = {
+        stats.key(test_cases[0]): 2.0,
+        stats.key(test_cases[1]): 0.5,
+        stats.key(test_cases[3]): 0.5,
+        stats.key(test_cases[4]): 1.0,
+    }
+    assert stats.cheapest_first(test_cases, runtimes) == [2, 1, 3, 4, 0]
+
+
+def test_record_folds_wall_times_into_the_average(database):
+    stats = RuntimeStats(database['test_runtimes'])
+    test_cases = literal_cases(3)
+
+    async def record_twice():
+        await stats.record(QUESTION_ID, test_cases, [
+            {'wall_time': 1.0}, {'wall_time': 2.0}, {'skipped': True, 'wall_time': 0.0}
+        ], {})
+        first = await stats.load(QUESTION_ID)
+        await stats.record(QUESTION_ID, test_cases, [{'wall_time': 2.0}, {}, {'wall_time': 0.25}], first)
+        return first, await stats.load(QUESTION_ID)
+
+    first, second = asyncio.run(record_twice())
+    keys = [stats.key(test_case) for test_case in test_cases]
+    assert first == {keys[0]: 1.0, keys[1]: 2.0}
+    assert second == {
+        keys[0]: round(RUNTIME_SMOOTHING * 2.0 + (1 - RUNTIME_SMOOTHING) * 1.0, 4),
+        keys[1]: 2.0,
+        keys[2]: 0.25,
+    }
+
+
+def test_record_writes_nothing_without_measurements(database):
+    stats = RuntimeStats(database['test_runtimes'])
+    asyncio.run(stats.record(QUESTION_ID, literal_cases(1), [{'skipped': True}], {}))
+    assert asyncio.run(database['test_runtimes'].count_documents({})) == 0
+
+
+def test_fail_fast_results_come_back_in_question_order():
+    stats = RuntimeStats(None)
+    test_cases = literal_cases(4)
+    runtimes = {stats.key(test_cases[i]): runtime for i, runtime in enumerate([3.0, 1.0, 2.0, 0.5])}
+    run_order = stats.cheapest_first(test_cases, runtimes)
+    assert run_order == [3, 1, 2, 0]
+
+    # The executor numbers results in the order it ran them and, with
+    # fail_fast=1, skips everything after the first failure
+    results = [
+        {'test_case_number': 1, 'passed': True, 'input': test_cases[3]['input']},
+        {'test_case_number': 2, 'passed': False, 'input': test_cases[1]['input']},
+        {'test_case_number': 3, 'passed': False, 'skipped': True, 'input': test_cases[2]['input']},
+        {'test_case_number': 4, 'passed': False, 'skipped': True, 'input': test_cases[0]['input']},
+    ]
+    ordered = stats.in_question_order(results, run_order)
+    assert [result['input'] for result in ordered] == [test_case['input'] for test_case in test_cases]
+    assert [result['test_case_number'] for result in ordered] == [1, 2, 3, 4]
+    assert [result['passed'] for result in ordered] == [False, False, False, True]
+    assert [bool(result.get('skipped')) for result in ordered] == [True, False, True, False]
+
+
+def test_results_without_a_number_are_left_unnumbered():
+    ordered = RuntimeStats.in_question_order([{'error': 'a'}, {'error': 'b'}], [1, 0])
+    assert ordered == [{'error': 'b'}, {'error': 'a'}]
@@ -0,0 +1,99 @@
+import asyncio
+import random
+from bson import ObjectId
+from score_index import ModuleScores, ScoreIndex
+
+
+def test_counts_match_a_brute_force_count():
+    rng = random.Random(7)
+    index = ScoreIndex(size=8)
+    scores = []
+    for _ in range(500):
+        score = rng.randrange(0, 3000)
+        index.add(score)
+        scores.append(score)
+
+    assert index.total == len(scores)
+    for score in list(range(-1, 40)) + rng.sample(range(3000), 100) + [2999, 3000, 10000]:
+        assert index.count_at_most(score) == sum(1 for s in scores if s <= score)
+        assert index.count_below(score) == sum(1 for s in scores if s < score)
+        assert index.count_above(score) == sum(1 for s in scores if s > score)
+        assert index.rank(score) == sum(1 for s in scores if s > score) + 1
+
+
+def test_moves_keep_the_counts_right():
+    rng = random.Random(11)
+    index = ScoreIndex(size=4)
+    scores = [rng.randrange(0, 50) for _ in range(200)]
+    for score in scores:
+        index.add(score)
+    for _ in range(1000):
+        i = rng.randrange(len(scores))
+        new_score = scores[i] + rng.randrange(0, 100)
+        index.move(scores[i], new_score)
+        scores[i] = new_score
+
+    assert index.total == len(scores)
+    for score in range(0, max(scores) + 2, 7):
+        assert index.count_between(score, score + 10) == sum(1 for s in scores if score <= s <= score + 10)
+        assert index.count_above(score) == sum(1 for s in scores if s > score)
+
+
+def test_negative_scores_count_as_zero():
+    index = ScoreIndex()
+    index.add(-5)
+    assert index.count_at_most(0) == 1
+    assert index.count_below(0) == 0
+
+
+def brute_force_percentile(scores: list, score: int, total_users: int) -> float:
+    """The old scan: share of all users (missing ones at 0) whose score is not below `score`"""
+    everyone = scores + [0] * (total_users - len(scores))
+    lower = sum(1 for s in everyone if s < score)
+    return 100 - (lower / total_users) * 100
+
+
+def test_module_percentile_matches_the_old_scan(database):
+    rng = random.Random(3)
+    module_scores = ModuleScores(database['module_scores'])
+    users = [str(ObjectId()) for _ in range(60)]
+    scores = {}
+
+    async def submit():
+        for _ in range(300):
+            user_id = rng.choice(users)
+            delta = rng.randrange(0, 40)
+            await module_scores.add('pandas', user_id, delta)
+            scores[user_id] = scores.get(user_id, 0) + delta
+
+    asyncio.run(submit())
+    total_users = 100
+    for user_id in users:
+        score = scores.get(user_id, 0)
+        if score == 0:
+            continue
+        expected = brute_force_percentile(list(scores.values()), score, total_users)
+        assert abs(module_scores.percentile('pandas', score, total_users) - expected) < 1e-9
+        assert module_scores.rank('pandas', score) == sum(1 for s in scores.values() if s > score) + 1
+
+    assert module_scores.percentile('pandas', 10, 0) == 100.0
+    # Nobody has a score in a module without entries, so every user is below 10
+    assert module_scores.percentile('sql', 10, total_users) == 0.0
+
+
+def test_reload_rebuilds_the_same_index(database):
+    module_scores = ModuleScores(database['module_scores'])
+    user_id = str(ObjectId())
+
+    async def submit_and_reload():
+        await module_scores.add('pandas', user_id, 30)
+        await module_scores.add('pandas', user_id, 20)
+        await module_scores.add('pandas', str(ObjectId()), 10)
+        before = module_scores.rank('pandas', 50), module_scores.rank('pandas', 10)
+        await module_scores.load()
+        after = module_scores.rank('pandas', 50), module_scores.rank('pandas', 10)
+        return before, after, await module_scores.scores_of(user_id)
+
+    before, after, user_scores = asyncio.run(submit_and_reload())
+    assert before == after == (1, 2)
+    assert user_scores == {'pandas': 50}